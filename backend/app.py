@@ -1,16 +1,52 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import Any, Dict, Optional
+import asyncio
+import hashlib
 import json
-from pathlib import Path
+from contextlib import asynccontextmanager
 
-from backend.executor import run_template, run_custom_code, TemplateExecutionError
-from backend.registry import load_registry
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Literal, Optional
+
+from backend.asset_cache import ASSET_CACHE
+from backend.capture import RequestCaptureMiddleware
+from backend.circuit import UpstreamUnavailable, breaker, guarded, snapshot as circuit_snapshot
+from backend.concurrency import limiter, snapshot as concurrency_snapshot
+from backend.estimates import estimate_render
+from backend.hedging import HEDGER
+from backend.executor import create_connection, record_auth_failure, run_template, run_custom_code, TemplateExecutionError
+from backend.ratelimit import RENDER_SLOTS, FairScheduler, RateLimiter, RateLimitExceeded, hash_api_key, run_job
+from backend.negative_cache import AUTH_FAILURES, is_auth_failure
+from backend.registry import get_registry
+from backend.sessions import EditSession
+from backend.responses import CompressionMiddleware, FastJSONResponse
+from backend.meme_bank import get_meme_bank
+from backend.preview_proxy import (
+    PREVIEW_MANIFEST_TTL, PREVIEW_PROXY_ENABLED, PREVIEW_PROXY_PREFIX, PreviewProxyError,
+    decode_token, get_preview_cache, rewrite_manifest,
+)
+from backend.ledger import UPLOAD_LEDGER, file_sha256, normalize_url
+from backend.uploads import (
+    BULK_UPLOAD_CONCURRENCY, BULK_UPLOAD_MAX_ITEMS, MEDIA_TYPES, UploadError, append_chunk, create_session,
+    get_session,
+)
 from backend.validator import validate_params
+from backend.warmup import WARMUP, warm_up
 
-app = FastAPI(title="VideoDB Meme Templates")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Warm up in the background: /health answers immediately, /ready once warm
+    warmup_task = asyncio.create_task(run_in_threadpool(warm_up))
+    yield
+    WARMUP.stopping.set()
+    if not warmup_task.done():
+        warmup_task.cancel()
+
+
+app = FastAPI(title="VideoDB Meme Templates", default_response_class=FastJSONResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,47 +61,80 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestCaptureMiddleware)
 
-TEMPLATES = load_registry()
-MEME_BANK_PATH = Path(__file__).parent / "meme_bank.json"
+RATE_LIMITER = RateLimiter()
+# Render slots follow the adaptive limit on render calls, starting at RENDER_SLOTS.
+# Custom code has its own limit (see backend.circuit), so its own scheduler.
+RENDER_SCHEDULER = FairScheduler(limiter=limiter("render", initial=RENDER_SLOTS))
+CUSTOM_RENDER_SCHEDULER = FairScheduler(limiter=limiter("render_custom", initial=RENDER_SLOTS))
 
 def load_meme_bank():
     """Load meme bank from JSON file"""
-    if not MEME_BANK_PATH.exists():
-        return []
-    return json.loads(MEME_BANK_PATH.read_text(encoding="utf-8"))["meme_sources"]
+    return get_meme_bank().sources
 
 
 def get_memes_collection(conn):
     """Get or create the 'Memes' collection"""
     # Try to find existing collection by name
-    collections = conn.get_collections()
+    try:
+        collections = guarded("collections", conn.get_collections)
+    except Exception as e:
+        # videodb.connect doesn't check the key; this is usually the first call that does
+        if is_auth_failure(e):
+            raise record_auth_failure(conn.api_key)
+        raise
+    # The key works, whatever was remembered about it
+    AUTH_FAILURES.invalidate(hash_api_key(conn.api_key))
     for temp_coll in collections:
         # Check for name 'Memes' (case-insensitive)
         if temp_coll.name and temp_coll.name.strip().lower() == "memes":
-            return conn.get_collection(temp_coll.id)
+            return guarded("collections", conn.get_collection, temp_coll.id)
         
     # If not found, try to create it
-    return conn.create_collection(name="Memes", description="Collection for memes from makememes.site")
+    return guarded("collections", conn.create_collection, name="Memes", description="Collection for memes from makememes.site")
 
 
 class RunRequest(BaseModel):
     params: Dict[str, Any]
+    mode: Literal["final", "draft"] = "final"  # draft: short, low-resolution preview
 
 
 class RunCustomRequest(BaseModel):
     code: str
     params: Dict[str, Any]
+    mode: Literal["final", "draft"] = "final"
 
 
 class UploadFromUrlRequest(BaseModel):
     url: str
     name: str
     media_type: str = "video"  # video, image, or audio
+    force: bool = False  # upload again even if this URL was already ingested
+
+
+class BulkUploadFromUrlRequest(BaseModel):
+    items: List[UploadFromUrlRequest]
 
 
 class SyncMemeRequest(BaseModel):
     meme_id: str
+    force: bool = False  # upload again even if this meme was already ingested
+
+
+class CreateUploadRequest(BaseModel):
+    name: str
+    media_type: str = "video"  # video, image, or audio
+    size: Optional[int] = None  # total bytes, if known up front
+
+
+def upload_media(coll, media_type: str, name: str, url: str = None, file_path: str = None):
+    """Upload a URL or local file into a collection"""
+    source = {"url": url} if url else {"file_path": file_path}
+    if media_type == "video":
+        return guarded("upload", coll.upload, name=name, **source)
+    return guarded("upload", coll.upload, media_type=media_type, name=name, **source)
 
 
 @app.exception_handler(HTTPException)
@@ -76,6 +145,37 @@ async def http_exception_handler(_: Request, exc: HTTPException):
     )
 
 
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exception_handler(_: Request, exc: RateLimitExceeded):
+    return JSONResponse(
+        status_code=429,
+        content={"error": {"code": "rate_limited", "message": exc.message, "retry_after": exc.retry_after}},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(UploadError)
+async def upload_exception_handler(_: Request, exc: UploadError):
+    error = {"code": exc.code, "message": exc.message}
+    if exc.offset is not None:
+        error["offset"] = exc.offset
+    return JSONResponse(status_code=exc.status_code, content={"error": error})
+
+
+@app.exception_handler(PreviewProxyError)
+async def preview_proxy_exception_handler(_: Request, exc: PreviewProxyError):
+    return JSONResponse(status_code=exc.status_code, content={"error": {"code": exc.code, "message": exc.message}})
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_exception_handler(_: Request, exc: UpstreamUnavailable):
+    return JSONResponse(
+        status_code=503,
+        content={"error": {"code": exc.code, "message": exc.message, "operation": exc.operation, "retry_after": exc.retry_after}},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(_: Request, exc: Exception):
     return JSONResponse(
@@ -90,14 +190,38 @@ async def health_check():
     return {"status": "healthy", "service": "makememes-backend"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 503 until startup warm-up has finished"""
+    if not WARMUP.ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming_up", "service": "makememes-backend", "warmup": WARMUP.to_dict()},
+        )
+    return {
+        "status": "ready",
+        "service": "makememes-backend",
+        "warmup": WARMUP.to_dict(),
+        "upstream": circuit_snapshot(),
+        "concurrency": concurrency_snapshot(),
+        "hedging": HEDGER.snapshot(),
+    }
+
+
 @app.get("/api/templates")
-async def list_templates():
-    return {"templates": [tmpl.to_list_item() for tmpl in TEMPLATES.values()]}
+async def list_templates(tag: Optional[List[str]] = Query(None), difficulty: Optional[str] = None, q: str = ""):
+    """List templates having every given tag and the difficulty, ranked by q when given"""
+    registry = get_registry()
+    matches = registry.filter(tags=tag, difficulty=difficulty, query=q)
+    return {
+        "templates": [tmpl.to_list_item() for tmpl in matches["templates"]],
+        "facets": {**matches["facets"], "tag": registry.tag_counts()},
+    }
 
 
 @app.get("/api/templates/{template_id}")
 async def get_template(template_id: str):
-    template = TEMPLATES.get(template_id)
+    template = get_registry().get(template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     return template.to_detail()
@@ -105,7 +229,7 @@ async def get_template(template_id: str):
 
 @app.post("/api/run/{template_id}")
 async def run_template_endpoint(template_id: str, request: RunRequest, req: Request):
-    template = TEMPLATES.get(template_id)
+    template = get_registry().get(template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
 
@@ -119,8 +243,13 @@ async def run_template_endpoint(template_id: str, request: RunRequest, req: Requ
     if errors:
         raise HTTPException(status_code=422, detail={"message": "Invalid params", "errors": errors})
 
+    key_id = hash_api_key(api_key)
+    breaker("render").raise_if_open()
+    RATE_LIMITER.check(key_id)
+
     try:
-        result = run_template(template.code_path, template.template_id, api_key, cleaned)
+        async with RENDER_SCHEDULER.slot(key_id, estimate_render(template, cleaned, request.mode)):
+            result = await run_job(run_template, template, api_key, cleaned, request.mode)
         return result
     except TemplateExecutionError as e:
         return JSONResponse(
@@ -135,6 +264,30 @@ async def run_template_endpoint(template_id: str, request: RunRequest, req: Requ
         )
 
 
+@app.post("/api/run/{template_id}/estimate")
+async def estimate_run(template_id: str, request: RunRequest, req: Request):
+    """How long a render would take and how long it would wait for a slot right now"""
+    template = get_registry().get(template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    cleaned, errors = validate_params(template.params_schema, request.params)
+    if errors:
+        raise HTTPException(status_code=422, detail={"message": "Invalid params", "errors": errors})
+
+    api_key = req.headers.get("x-videodb-key") or req.headers.get("authorization") or ""
+    if api_key.lower().startswith("bearer "):
+        api_key = api_key[7:]
+
+    estimate = estimate_render(template, cleaned, request.mode)
+    return {
+        "estimated_seconds": round(estimate.seconds, 1),
+        "estimated_wait": round(RENDER_SCHEDULER.estimated_wait(hash_api_key(api_key), estimate.seconds), 1),
+        "queued": RENDER_SCHEDULER.queued,
+        "active": RENDER_SCHEDULER.active,
+    }
+
+
 @app.post("/api/run-custom")
 async def run_custom_code_endpoint(request: RunCustomRequest, req: Request):
     """Execute user-provided custom code"""
@@ -148,8 +301,13 @@ async def run_custom_code_endpoint(request: RunCustomRequest, req: Request):
     if not request.code or not request.code.strip():
         raise HTTPException(status_code=422, detail="Code cannot be empty")
 
+    key_id = hash_api_key(api_key)
+    breaker("render_custom").raise_if_open()
+    RATE_LIMITER.check(key_id)
+
     try:
-        result = run_custom_code(request.code, api_key, request.params)
+        async with CUSTOM_RENDER_SCHEDULER.slot(key_id, estimate_render(None, request.params, request.mode)):
+            result = await run_job(run_custom_code, request.code, api_key, request.params, request.mode)
         return result
     except TemplateExecutionError as e:
         return JSONResponse(
@@ -164,6 +322,60 @@ async def run_custom_code_endpoint(request: RunCustomRequest, req: Request):
         )
 
 
+@app.websocket("/api/sessions")
+async def editing_session(websocket: WebSocket):
+    """Persistent editing session: warm connection, compiled code and params (see backend.sessions)"""
+    await EditSession(websocket, RATE_LIMITER, RENDER_SCHEDULER, CUSTOM_RENDER_SCHEDULER).serve()
+
+
+# /api/assets keys: (collection method, fallback name)
+ASSET_LISTINGS = {
+    "videos": ("get_videos", "Video"),
+    "images": ("get_images", "Image"),
+    "audio": ("get_audios", "Audio"),
+}
+
+
+def list_collection(coll, kind: str) -> List[Dict[str, Any]]:
+    """One kind of asset in a collection, as listed by /api/assets"""
+    method, label = ASSET_LISTINGS[kind]
+    items = []
+    try:
+        for asset in guarded("list_assets", getattr(coll, method)):
+            item = {"id": asset.id, "name": asset.name or f"{label} {asset.id}"}
+            if kind == "videos":
+                item["duration"] = getattr(asset, 'length', None)
+            items.append(item)
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        print(f"Error fetching {kind}: {e}")
+    return items
+
+
+def meme_availability(user_videos: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Which meme sources the user already has, matched by video name"""
+    availability = {}
+    for meme in load_meme_bank():
+        # Check if user has a video with matching name
+        matching_video = None
+        for video in user_videos:
+            video_name_lower = video["name"].lower()
+            meme_name_lower = meme["name"].lower()
+
+            # Check if video name contains meme name
+            if meme_name_lower in video_name_lower:
+                matching_video = video
+                break
+
+        availability[meme["id"]] = {
+            "available": matching_video is not None,
+            "asset_id": matching_video["id"] if matching_video else None,
+            "asset_name": matching_video["name"] if matching_video else None
+        }
+    return availability
+
+
 @app.get("/api/assets")
 async def list_assets(req: Request, kind: Optional[str] = None):
     api_key = req.headers.get("x-videodb-key") or req.headers.get("authorization")
@@ -172,60 +384,24 @@ async def list_assets(req: Request, kind: Optional[str] = None):
     if api_key.lower().startswith("bearer "):
         api_key = api_key[7:]
 
-    try:
-        import videodb
-        conn = videodb.connect(api_key=api_key)
+    def fetch_assets():
+        conn = create_connection(api_key)
         memes_coll = get_memes_collection(conn)
         print(f"Loading assets from collection: {memes_coll.name} ({memes_coll.id})")
+        return {kind: list_collection(memes_coll, kind) for kind in ASSET_LISTINGS}
 
-        # Fetch videos
-        videos = []
-        try:
-            for video in memes_coll.get_videos():
-                videos.append({
-                    "id": video.id,
-                    "name": video.name or f"Video {video.id}",
-                    "duration": getattr(video, 'length', None)
-                })
-        except Exception as e:
-            print(f"Error fetching videos: {e}")
-            pass
-
-        # Fetch images
-        images = []
-        try:
-            for image in memes_coll.get_images():
-                images.append({
-                    "id": image.id,
-                    "name": image.name or f"Image {image.id}"
-                })
-        except Exception as e:
-            print(f"Error fetching images: {e}")
-            pass
-
-        # Fetch audio
-        audio = []
-        try:
-            for aud in memes_coll.get_audios():
-                audio.append({
-                    "id": aud.id,
-                    "name": aud.name or f"Audio {aud.id}"
-                })
-        except Exception as e:
-            print(f"Error fetching audio: {e}")
-            pass
-
-        assets = {
-            "videos": videos,
-            "images": images,
-            "audio": audio,
-        }
+    try:
+        # SDK calls block, so keep them off the event loop
+        assets = await run_in_threadpool(fetch_assets)
+        ASSET_CACHE.record_listing(hash_api_key(api_key), assets)
 
         if kind:
             return {kind: assets.get(kind, [])}
 
         return assets
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         return JSONResponse(
             status_code=400,
@@ -236,22 +412,40 @@ async def list_assets(req: Request, kind: Optional[str] = None):
 @app.get("/api/meme-bank")
 async def list_meme_sources():
     """List all available meme sources"""
-    meme_sources = load_meme_bank()
-    
-    # Add preview information to each meme
-    for meme in meme_sources:
-        # Use preview_url if available, otherwise fallback to source_url
-        preview_url = meme.get("preview_url") or meme.get("source_url")
-        if preview_url:
-            is_hls = preview_url.endswith(".m3u8") or "manifest" in preview_url
-            meme["preview"] = {
-                "url": preview_url,
-                "type": "hls" if is_hls else "mp4"
-            }
-        else:
-            meme["preview"] = None
-            
-    return {"meme_sources": meme_sources}
+    # Preview information is attached once when the meme bank is loaded
+    return {"meme_sources": get_meme_bank().listing}
+
+
+@app.api_route(PREVIEW_PROXY_PREFIX + "/{token}", methods=["GET", "HEAD"])
+async def proxy_preview(token: str):
+    """Serve a preview manifest or segment from the local cache, fetching it on a miss"""
+    if not PREVIEW_PROXY_ENABLED:
+        raise HTTPException(status_code=404, detail="Preview proxy is disabled")
+    cache = get_preview_cache()
+    url = decode_token(token)
+    entry, hit = await cache.get(url)
+    try:
+        body = cache.body_path(entry.key).read_bytes() if entry.manifest else None
+        cache.body_path(entry.key).stat()
+    except FileNotFoundError:
+        # Evicted between the lookup and the read: treat it as a miss
+        cache.discard(entry.key)
+        entry, hit = await cache.get(url)
+        body = cache.body_path(entry.key).read_bytes() if entry.manifest else None
+    headers = {"X-Cache": "HIT" if hit else "MISS"}
+    if entry.manifest:
+        body = rewrite_manifest(body, entry.url)
+        headers["Cache-Control"] = f"public, max-age={PREVIEW_MANIFEST_TTL}"
+        return Response(body, media_type="application/vnd.apple.mpegurl", headers=headers)
+    # FileResponse answers Range requests with 206 partial content
+    headers["Cache-Control"] = "public, max-age=86400, immutable"
+    return FileResponse(cache.body_path(entry.key), media_type=entry.content_type, headers=headers)
+
+
+@app.get("/api/meme-bank/search")
+async def search_meme_sources(q: str = "", category: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None):
+    """Search meme sources by name, description, category and tags, one page at a time"""
+    return get_meme_bank().search(q, category=category, limit=limit, cursor=cursor)
 
 
 @app.get("/api/meme-bank/check")
@@ -264,45 +458,16 @@ async def check_meme_availability(req: Request):
         api_key = api_key[7:]
 
     try:
-        import videodb
-        conn = videodb.connect(api_key=api_key)
+        conn = create_connection(api_key)
         coll = get_memes_collection(conn)
 
         # Get all videos from user's collection
-        user_videos = []
-        try:
-            for video in coll.get_videos():
-                user_videos.append({
-                    "id": video.id,
-                    "name": video.name or f"Video {video.id}",
-                })
-        except Exception:
-            pass
-
-        # Load meme sources and check availability
-        meme_sources = load_meme_bank()
-        availability = {}
-
-        for meme in meme_sources:
-            # Check if user has a video with matching name
-            matching_video = None
-            for video in user_videos:
-                video_name_lower = video["name"].lower()
-                meme_name_lower = meme["name"].lower()
-
-                # Check if video name contains meme name
-                if meme_name_lower in video_name_lower:
-                    matching_video = video
-                    break
-
-            availability[meme["id"]] = {
-                "available": matching_video is not None,
-                "asset_id": matching_video["id"] if matching_video else None,
-                "asset_name": matching_video["name"] if matching_video else None
-            }
-
+        user_videos = list_collection(coll, "videos")
+        availability = meme_availability(user_videos)
         return {"availability": availability}
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         return JSONResponse(
             status_code=400,
@@ -310,6 +475,70 @@ async def check_meme_availability(req: Request):
         )
 
 
+def section_etag(name: str, data: Any) -> str:
+    digest = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f'"{name}-{digest[:16]}"'
+
+
+BOOTSTRAP_SECTIONS = ("templates", "meme_bank", "assets", "availability")
+
+
+@app.get("/api/bootstrap")
+async def bootstrap(req: Request, sections: Optional[str] = None):
+    """Everything a page load needs, in one round trip.
+
+    Sections are the responses of /api/templates, /api/meme-bank and, with an
+    API key, /api/assets and /api/meme-bank/check, fetched over one VideoDB
+    connection. `sections` (comma separated) limits the response to the ones
+    a page shows, so pages that don't need VideoDB don't wait on it. Each
+    carries its own ETag; sections whose ETag is listed in If-None-Match come
+    back as {"etag", "not_modified": true} without data.
+    """
+    api_key = req.headers.get("x-videodb-key") or req.headers.get("authorization") or ""
+    if api_key.lower().startswith("bearer "):
+        api_key = api_key[7:]
+    wanted = {name.strip() for name in sections.split(",") if name.strip()} if sections else set(BOOTSTRAP_SECTIONS)
+    unknown = wanted - set(BOOTSTRAP_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown bootstrap sections: {', '.join(sorted(unknown))}")
+
+    async def fetch_user_sections() -> Dict[str, Any]:
+        coll = await run_in_threadpool(lambda: get_memes_collection(create_connection(api_key)))
+        # The listings are independent, so fetch them side by side
+        listings = await asyncio.gather(*(run_in_threadpool(list_collection, coll, kind) for kind in ASSET_LISTINGS))
+        assets = dict(zip(ASSET_LISTINGS, listings))
+        ASSET_CACHE.record_listing(hash_api_key(api_key), assets)
+        return {"assets": assets, "availability": {"availability": meme_availability(assets["videos"])}}
+
+    user_wanted = wanted & {"assets", "availability"}
+    user_sections = asyncio.create_task(fetch_user_sections()) if api_key and user_wanted else None
+    found: Dict[str, Any] = {}
+    if "templates" in wanted:
+        found["templates"] = await list_templates(tag=None, difficulty=None, q="")
+    if "meme_bank" in wanted:
+        found["meme_bank"] = {"meme_sources": get_meme_bank().listing}
+    if user_sections is not None:
+        try:
+            user_data = await user_sections
+        except Exception as e:
+            if isinstance(e, (UpstreamUnavailable, TemplateExecutionError)):
+                error = {"code": e.code, "message": e.message}
+            else:
+                error = {"code": "fetch_error", "message": "Failed to fetch assets from VideoDB", "details": str(e)}
+            user_data = {name: {"error": error} for name in user_wanted}
+        found.update({name: user_data[name] for name in user_wanted})
+
+    known = {tag.strip().removeprefix("W/") for tag in req.headers.get("if-none-match", "").split(",")}
+    response = {}
+    for name, data in found.items():
+        if isinstance(data, dict) and set(data) == {"error"}:
+            response[name] = data
+            continue
+        etag = section_etag(name, data)
+        response[name] = {"etag": etag, "not_modified": True} if etag in known else {"etag": etag, "data": data}
+    return response
+
+
 @app.post("/api/meme-bank/sync")
 async def sync_meme_to_collection(request: SyncMemeRequest, req: Request):
     """Sync (upload) a meme source to user's VideoDB collection with one click"""
@@ -319,9 +548,7 @@ async def sync_meme_to_collection(request: SyncMemeRequest, req: Request):
     if api_key.lower().startswith("bearer "):
         api_key = api_key[7:]
 
-    # Load meme sources
-    meme_sources = load_meme_bank()
-    meme = next((m for m in meme_sources if m["id"] == request.meme_id), None)
+    meme = get_meme_bank().by_id.get(request.meme_id)
 
     if not meme:
         raise HTTPException(status_code=404, detail=f"Meme source '{request.meme_id}' not found in meme bank")
@@ -329,36 +556,37 @@ async def sync_meme_to_collection(request: SyncMemeRequest, req: Request):
     if not meme.get("source_url"):
         raise HTTPException(status_code=400, detail=f"Meme source '{request.meme_id}' has no configured source URL.")
 
-    try:
-        import videodb
-        conn = videodb.connect(api_key=api_key)
-        memes_coll = get_memes_collection(conn)
-        print(memes_coll.name)
-
-        # Upload based on media type
-        media_type = meme.get("media_type", "video")
-        source_url = meme["source_url"]
-        name = meme["name"]
-
-        if media_type == "video":
-            asset = memes_coll.upload(url=source_url, name=name)
-            print(asset)
-        elif media_type == "image":
-            asset = memes_coll.upload(url=source_url, media_type="image", name=name)
-        elif media_type == "audio":
-            asset = memes_coll.upload(url=source_url, media_type="audio", name=name)
-        else:
-            raise HTTPException(status_code=400, detail=f"Invalid media_type '{media_type}'")
+    media_type = meme.get("media_type", "video")
+    if media_type not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid media_type '{media_type}'")
 
+    def upload():
+        conn = create_connection(api_key)
+        memes_coll = get_memes_collection(conn)
+        asset = upload_media(memes_coll, media_type, meme["name"], url=meme["source_url"])
         return {
             "asset_id": asset.id,
             "name": asset.name,
-            "media_type": media_type,
-            "meme_id": request.meme_id,
             "collection_name": memes_coll.name,
             "collection_id": memes_coll.id
         }
 
+    try:
+        key = UPLOAD_LEDGER.key(hash_api_key(api_key), media_type, normalize_url(meme["source_url"]))
+        record, deduplicated = await run_in_threadpool(UPLOAD_LEDGER.upload, key, upload, request.force)
+        ASSET_CACHE.record(hash_api_key(api_key), media_type, record["asset_id"])
+        return {
+            "asset_id": record["asset_id"],
+            "name": record["name"],
+            "media_type": media_type,
+            "meme_id": request.meme_id,
+            "collection_name": record.get("collection_name"),
+            "collection_id": record.get("collection_id"),
+            "deduplicated": deduplicated
+        }
+
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         return JSONResponse(
             status_code=400,
@@ -367,8 +595,12 @@ async def sync_meme_to_collection(request: SyncMemeRequest, req: Request):
 
 
 @app.post("/api/meme-bank/sync-all")
-async def sync_all_memes_to_collection(req: Request):
-    """Sync all missing meme sources to user's VideoDB collection"""
+async def sync_all_memes_to_collection(req: Request, force: bool = False):
+    """Sync all missing meme sources to user's VideoDB collection.
+
+    With force, memes the upload ledger has on record are uploaded again
+    unless the collection still has them.
+    """
     api_key = req.headers.get("x-videodb-key") or req.headers.get("authorization")
     if not api_key:
         raise HTTPException(status_code=401, detail="Missing VideoDB API key")
@@ -376,15 +608,16 @@ async def sync_all_memes_to_collection(req: Request):
         api_key = api_key[7:]
 
     try:
-        import videodb
-        conn = videodb.connect(api_key=api_key)
+        conn = create_connection(api_key)
         coll = get_memes_collection(conn)
 
         # Get existing videos to avoid duplicates
         existing_videos = []
         try:
-            for video in coll.get_videos():
+            for video in guarded("list_assets", coll.get_videos):
                 existing_videos.append(video.name.lower() if video.name else "")
+        except UpstreamUnavailable:
+            raise
         except Exception:
             pass
 
@@ -392,6 +625,7 @@ async def sync_all_memes_to_collection(req: Request):
         meme_sources = load_meme_bank()
         synced = []
         skipped = []
+        account = hash_api_key(api_key)
 
         for meme in meme_sources:
             meme_name = meme["name"]
@@ -402,18 +636,21 @@ async def sync_all_memes_to_collection(req: Request):
             if not meme.get("source_url"):
                 continue
 
-            # Upload based on media type
             media_type = meme.get("media_type", "video")
-            source_url = meme["source_url"]
+            if media_type not in MEDIA_TYPES:
+                continue
 
-            if media_type == "video":
-                coll.upload(url=source_url, name=meme_name)
-            elif media_type == "image":
-                coll.upload(url=source_url, media_type="image", name=meme_name)
-            elif media_type == "audio":
-                coll.upload(url=source_url, media_type="audio", name=meme_name)
-            
-            synced.append(meme["id"])
+            def upload(meme=meme, media_type=media_type):
+                asset = upload_media(coll, media_type, meme["name"], url=meme["source_url"])
+                return {"asset_id": asset.id, "name": asset.name}
+
+            key = UPLOAD_LEDGER.key(account, media_type, normalize_url(meme["source_url"]))
+            record, deduplicated = await run_in_threadpool(UPLOAD_LEDGER.upload, key, upload, force)
+            ASSET_CACHE.record(account, media_type, record["asset_id"])
+            if deduplicated:
+                skipped.append(meme["id"])
+            else:
+                synced.append(meme["id"])
 
         return {
             "synced": synced,
@@ -422,6 +659,8 @@ async def sync_all_memes_to_collection(req: Request):
             "total_skipped": len(skipped)
         }
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         return JSONResponse(
             status_code=400,
@@ -438,42 +677,214 @@ async def upload_from_url(request: UploadFromUrlRequest, req: Request):
     if api_key.lower().startswith("bearer "):
         api_key = api_key[7:]
 
-    try:
-        import videodb
-        conn = videodb.connect(api_key=api_key)
+    if request.media_type not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid media_type. Must be 'video', 'image', or 'audio'")
+
+    def upload():
+        conn = create_connection(api_key)
         coll = get_memes_collection(conn)
+        asset = upload_media(coll, request.media_type, request.name, url=request.url)
+        return {"asset_id": asset.id, "name": asset.name}
 
-        # Upload based on media type
-        if request.media_type == "video":
-            asset = coll.upload(url=request.url, name=request.name)
-            return {
-                "asset_id": asset.id,
-                "name": asset.name,
-                "media_type": "video"
-            }
-        elif request.media_type == "image":
-            asset = coll.upload(url=request.url, media_type="image", name=request.name)
-            return {
-                "asset_id": asset.id,
-                "name": asset.name,
-                "media_type": "image"
-            }
-        elif request.media_type == "audio":
-            asset = coll.upload(url=request.url, media_type="audio", name=request.name)
-            return {
-                "asset_id": asset.id,
-                "name": asset.name,
-                "media_type": "audio"
-            }
-        else:
-            raise HTTPException(status_code=400, detail="Invalid media_type. Must be 'video', 'image', or 'audio'")
+    try:
+        key = UPLOAD_LEDGER.key(hash_api_key(api_key), request.media_type, normalize_url(request.url))
+        record, deduplicated = await run_in_threadpool(UPLOAD_LEDGER.upload, key, upload, request.force)
+        ASSET_CACHE.record(hash_api_key(api_key), request.media_type, record["asset_id"])
+        return {
+            "asset_id": record["asset_id"],
+            "name": record["name"],
+            "media_type": request.media_type,
+            "deduplicated": deduplicated
+        }
+
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": {"code": "upload_error", "message": "Failed to upload media to VideoDB", "details": str(e)}}
+        )
+
+
+@app.post("/api/upload-from-url/bulk")
+async def bulk_upload_from_url(request: BulkUploadFromUrlRequest, req: Request):
+    """Upload many URLs over one connection, streaming a JSON line per item as it finishes"""
+    api_key = req.headers.get("x-videodb-key") or req.headers.get("authorization")
+    if not api_key:
+        raise HTTPException(status_code=401, detail="Missing VideoDB API key")
+    if api_key.lower().startswith("bearer "):
+        api_key = api_key[7:]
+
+    if not request.items:
+        raise HTTPException(status_code=422, detail="No items to upload")
+    if len(request.items) > BULK_UPLOAD_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_UPLOAD_MAX_ITEMS} items per request")
+
+    def connect():
+        conn = create_connection(api_key)
+        return get_memes_collection(conn)
+
+    # Connect and resolve the collection once, before anything is streamed, so
+    # a bad key or an unavailable VideoDB still gets a normal error response
+    try:
+        coll = await run_in_threadpool(connect)
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": {"code": "upload_error", "message": "Failed to connect to VideoDB", "details": str(e)}}
+        )
 
+    account = hash_api_key(api_key)
+    semaphore = asyncio.Semaphore(BULK_UPLOAD_CONCURRENCY)
+
+    async def upload_item(index: int, item: UploadFromUrlRequest) -> Dict[str, Any]:
+        line = {"index": index, "url": item.url, "name": item.name, "media_type": item.media_type}
+        if item.media_type not in MEDIA_TYPES:
+            return {**line, "status": "error",
+                    "error": {"code": "invalid_media_type", "message": "Must be 'video', 'image', or 'audio'"}}
+
+        def upload():
+            asset = upload_media(coll, item.media_type, item.name, url=item.url)
+            return {"asset_id": asset.id, "name": asset.name}
+
+        async with semaphore:
+            try:
+                key = UPLOAD_LEDGER.key(account, item.media_type, normalize_url(item.url))
+                record, deduplicated = await run_in_threadpool(UPLOAD_LEDGER.upload, key, upload, item.force)
+            except UpstreamUnavailable as e:
+                return {**line, "status": "error",
+                        "error": {"code": e.code, "message": e.message, "retry_after": e.retry_after}}
+            except Exception as e:
+                return {**line, "status": "error",
+                        "error": {"code": "upload_error", "message": "Failed to upload media to VideoDB", "details": str(e)}}
+        ASSET_CACHE.record(account, item.media_type, record["asset_id"])
+        return {**line, "status": "ok", "asset_id": record["asset_id"], "name": record["name"],
+                "deduplicated": deduplicated}
+
+    async def results():
+        tasks = [asyncio.create_task(upload_item(index, item)) for index, item in enumerate(request.items)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                succeeded += line["status"] == "ok"
+                yield json.dumps(line) + "\n"
+        finally:
+            # Client went away: don't start the uploads that are still waiting
+            for task in tasks:
+                task.cancel()
+        yield json.dumps({"summary": {"total": len(tasks), "succeeded": succeeded, "failed": len(tasks) - succeeded}}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+@app.post("/api/uploads")
+async def create_upload(request: CreateUploadRequest, req: Request):
+    """Start a resumable upload of a local file"""
+    api_key = req.headers.get("x-videodb-key") or req.headers.get("authorization")
+    if not api_key:
+        raise HTTPException(status_code=401, detail="Missing VideoDB API key")
+    if api_key.lower().startswith("bearer "):
+        api_key = api_key[7:]
+
+    session = create_session(hash_api_key(api_key), request.name, request.media_type, request.size)
+    return session.to_status()
+
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload(upload_id: str, req: Request):
+    """Report how many bytes of an upload have been received, to resume from"""
+    api_key = req.headers.get("x-videodb-key") or req.headers.get("authorization")
+    if not api_key:
+        raise HTTPException(status_code=401, detail="Missing VideoDB API key")
+    if api_key.lower().startswith("bearer "):
+        api_key = api_key[7:]
+
+    return get_session(upload_id, hash_api_key(api_key)).to_status()
+
+
+@app.put("/api/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, req: Request, offset: int = 0):
+    """Append the raw request body to an upload, starting at `offset`"""
+    api_key = req.headers.get("x-videodb-key") or req.headers.get("authorization")
+    if not api_key:
+        raise HTTPException(status_code=401, detail="Missing VideoDB API key")
+    if api_key.lower().startswith("bearer "):
+        api_key = api_key[7:]
+
+    session = get_session(upload_id, hash_api_key(api_key))
+    content_length = req.headers.get("content-length")
+    new_offset = await append_chunk(
+        session,
+        offset,
+        req.stream(),
+        content_length=int(content_length) if content_length and content_length.isdigit() else None,
+    )
+    return {**session.to_status(), "offset": new_offset}
+
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, req: Request, force: bool = False):
+    """Hand a fully received upload to VideoDB; force skips the ledger's deduplication"""
+    api_key = req.headers.get("x-videodb-key") or req.headers.get("authorization")
+    if not api_key:
+        raise HTTPException(status_code=401, detail="Missing VideoDB API key")
+    if api_key.lower().startswith("bearer "):
+        api_key = api_key[7:]
+
+    session = get_session(upload_id, hash_api_key(api_key))
+    if not session.complete:
+        raise UploadError(
+            f"Upload is incomplete: received {session.offset} of {session.size} bytes",
+            code="upload_incomplete",
+            status_code=409,
+            offset=session.offset,
+        )
+    if session.offset == 0:
+        raise UploadError("Upload is empty", code="upload_incomplete", status_code=409, offset=0)
+
+    def upload_file():
+        conn = create_connection(api_key)
+        coll = get_memes_collection(conn)
+        asset = upload_media(coll, session.media_type, session.name, file_path=str(session.part_path))
+        return {"asset_id": asset.id, "name": asset.name}
+
+    try:
+        content_hash = await run_in_threadpool(file_sha256, session.part_path)
+        key = UPLOAD_LEDGER.key(hash_api_key(api_key), session.media_type, f"sha256:{content_hash}")
+        record, deduplicated = await run_in_threadpool(UPLOAD_LEDGER.upload, key, upload_file, force)
+        ASSET_CACHE.record(hash_api_key(api_key), session.media_type, record["asset_id"])
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         return JSONResponse(
             status_code=400,
             content={"error": {"code": "upload_error", "message": "Failed to upload media to VideoDB", "details": str(e)}}
         )
 
+    session.discard()
+    return {
+        "asset_id": record["asset_id"],
+        "name": record["name"],
+        "media_type": session.media_type,
+        "deduplicated": deduplicated
+    }
+
+
+@app.delete("/api/uploads/{upload_id}")
+async def cancel_upload(upload_id: str, req: Request):
+    """Abandon an upload and delete what was received"""
+    api_key = req.headers.get("x-videodb-key") or req.headers.get("authorization")
+    if not api_key:
+        raise HTTPException(status_code=401, detail="Missing VideoDB API key")
+    if api_key.lower().startswith("bearer "):
+        api_key = api_key[7:]
+
+    get_session(upload_id, hash_api_key(api_key)).discard()
+    return {"upload_id": upload_id, "cancelled": True}
+
 
 # Static files removed - frontend is now a separate Next.js app
 # Run frontend with: cd frontend && npm run dev
@@ -0,0 +1,158 @@
+"""Per-account cache of asset metadata (id, type, length).
+
+Filled from /api/assets listings and, on a miss, by looking the asset up in
+the account's collections. The run path uses it to reject unknown asset ids and
+clips longer than their source before a timeline is built, instead of finding
+out from a failed remote render.
+
+Lookups only answer "missing" when every collection was searched; if anything
+goes wrong, or the account has too many collections to search, the asset is
+treated as unknown and the render goes ahead as before. The same goes for
+lookups that run past their deadline, which also caps how long they queue
+for a VideoDB call slot; the run path additionally bounds the whole lookup,
+slow HTTP calls included, to ASSET_LOOKUP_BUDGET seconds. An asset found
+missing is also dropped from the upload ledger, so uploading its source again
+creates a new asset instead of returning the deleted one.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+from backend.circuit import guarded
+from backend.ledger import UPLOAD_LEDGER
+from backend.negative_cache import MISSING_ASSETS, is_auth_failure
+
+ASSET_CACHE_TTL = int(os.environ.get("ASSET_CACHE_TTL", "600"))
+ASSET_CACHE_MAX_ACCOUNTS = int(os.environ.get("ASSET_CACHE_MAX_ACCOUNTS", "256"))
+ASSET_CACHE_MAX_PER_ACCOUNT = int(os.environ.get("ASSET_CACHE_MAX_PER_ACCOUNT", "2000"))
+ASSET_LOOKUP_MAX_COLLECTIONS = int(os.environ.get("ASSET_LOOKUP_MAX_COLLECTIONS", "20"))
+# Seconds a render may spend looking up uncached assets before it goes ahead without
+ASSET_LOOKUP_BUDGET = float(os.environ.get("ASSET_LOOKUP_BUDGET", "5"))
+
+ASSET_PARAM_TYPES = {"video_asset_id": "video", "image_asset_id": "image", "audio_asset_id": "audio"}
+# Listing keys in /api/assets responses
+LISTING_TYPES = {"videos": "video", "images": "image", "audio": "audio"}
+GETTERS = {"video": "get_video", "image": "get_image", "audio": "get_audio"}
+
+
+class AssetInfo(NamedTuple):
+    asset_id: str
+    media_type: str
+    length: Optional[float]
+    cached_at: float
+
+
+# Returned by lookup() when the asset is in none of the account's collections
+MISSING = AssetInfo("", "", None, 0.0)
+
+
+def _length(value) -> Optional[float]:
+    try:
+        length = float(value)
+    except (TypeError, ValueError):
+        return None
+    return length if length > 0 else None
+
+
+def _is_not_found(exc: Exception) -> bool:
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 404
+    message = str(exc).lower()
+    return "not found" in message or "404" in message
+
+
+def _until(deadline: Optional[float]) -> Dict[str, float]:
+    """guarded() arguments that stop queueing for a call slot at deadline"""
+    if deadline is None:
+        return {}
+    return {"queue_timeout": max(0.0, deadline - time.monotonic())}
+
+
+class AssetMetadataCache:
+    def __init__(self, ttl: int = ASSET_CACHE_TTL, max_accounts: int = ASSET_CACHE_MAX_ACCOUNTS):
+        self.ttl = ttl
+        self.max_accounts = max_accounts
+        self._accounts: "OrderedDict[str, OrderedDict[str, AssetInfo]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, account: str, media_type: str, asset_id: str, length=None):
+        MISSING_ASSETS.invalidate((account, asset_id))
+        info = AssetInfo(asset_id, media_type, _length(length), time.time())
+        with self._lock:
+            assets = self._accounts.get(account)
+            if assets is None:
+                assets = self._accounts[account] = OrderedDict()
+                while len(self._accounts) > self.max_accounts:
+                    self._accounts.popitem(last=False)
+            self._accounts.move_to_end(account)
+            assets[asset_id] = info
+            assets.move_to_end(asset_id)
+            while len(assets) > ASSET_CACHE_MAX_PER_ACCOUNT:
+                assets.popitem(last=False)
+
+    def record_listing(self, account: str, listing: Dict[str, List[dict]]):
+        """Remember every asset in an /api/assets response"""
+        for key, media_type in LISTING_TYPES.items():
+            for asset in listing.get(key, []):
+                self.record(account, media_type, asset["id"], asset.get("duration"))
+
+    def forget(self, account: str, asset_id: str):
+        with self._lock:
+            assets = self._accounts.get(account)
+            if assets is not None:
+                assets.pop(asset_id, None)
+
+    def get(self, account: str, asset_id: str) -> Optional[AssetInfo]:
+        with self._lock:
+            info = self._accounts.get(account, {}).get(asset_id)
+        if info is None or time.time() - info.cached_at > self.ttl:
+            return None
+        return info
+
+    def lookup(self, account: str, conn, media_type: str, asset_id: str,
+               deadline: Optional[float] = None) -> Optional[AssetInfo]:
+        """Cached metadata, fetching it on a miss.
+
+        Returns MISSING if no collection has the asset, None if that couldn't
+        be established, including when time.monotonic() passes deadline
+        before every collection was searched. Rejected API keys raise.
+        """
+        info = self.get(account, asset_id)
+        if info is not None:
+            return info
+        if not MISSING_ASSETS.admit((account, asset_id)):
+            return MISSING
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+
+        try:
+            collections = guarded("collections", conn.get_collections, **_until(deadline))
+        except Exception as e:
+            if is_auth_failure(e):
+                raise
+            return None
+        if len(collections) > ASSET_LOOKUP_MAX_COLLECTIONS:
+            return None
+
+        for collection in collections:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            try:
+                asset = guarded("assets", getattr(collection, GETTERS[media_type]), asset_id, **_until(deadline))
+            except Exception as e:
+                if _is_not_found(e):
+                    continue
+                if is_auth_failure(e):
+                    raise
+                return None
+            self.record(account, media_type, asset_id, getattr(asset, "length", None))
+            return self.get(account, asset_id)
+        MISSING_ASSETS.add((account, asset_id))
+        UPLOAD_LEDGER.forget_asset(account, asset_id)
+        return MISSING
+
+
+ASSET_CACHE = AssetMetadataCache()
@@ -0,0 +1,250 @@
+"""Render a template once per row of a CSV or JSONL parameter file.
+
+    python -m backend.batch TEMPLATE_ID ROWS.csv|ROWS.jsonl [--output results.jsonl]
+        [--workers 4] [--mode final|draft] [--retries 2] [--dry-run]
+
+Each row is validated against the template's params schema and rendered with
+the VideoDB key in VIDEODB_API_KEY, several rows at a time on a thread pool.
+CSV cells are strings: number params are converted, and empty cells are left
+out so schema defaults apply. JSONL rows are JSON objects of params.
+
+Every finished row is appended to the results file as one JSON line, with its
+stream URLs (or error) and timing. The results file doubles as the
+checkpoint: run the same command again after a crash and rows that already
+rendered are skipped, while failed rows are tried again. Rows are recognized
+by their params, not their position, so adding or reordering rows doesn't
+render the others again; a row whose params changed counts as new, and
+identical rows are told apart by how many came before them.
+
+Renders that fail because VideoDB is unavailable or that time out are retried
+up to --retries times.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent import futures
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from backend.validator import validate_params
+
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "4"))
+
+
+def _number(value: str):
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def read_rows(path: Path, schema: List[Dict[str, Any]]) -> Iterator[Tuple[int, Dict[str, Any], Optional[str]]]:
+    """(row number, params, parse error) for each row; row numbers start at 1"""
+    number_fields = {field["name"] for field in schema if field["type"] == "number"}
+    with path.open(encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            for index, row in enumerate(csv.DictReader(f), start=1):
+                params = {}
+                for name, value in row.items():
+                    if name is None or value is None or value == "":
+                        continue
+                    if name in number_fields:
+                        try:
+                            value = _number(value)
+                        except ValueError:
+                            pass  # reported by validate_params
+                    params[name] = value
+                yield index, params, None
+        else:
+            index = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                index += 1
+                try:
+                    params = json.loads(line)
+                except ValueError as e:
+                    yield index, {}, f"invalid JSON: {e}"
+                    continue
+                if not isinstance(params, dict):
+                    yield index, {}, "each line must be a JSON object of params"
+                    continue
+                yield index, params, None
+
+
+def params_digest(params: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def keyed_rows(path: Path, schema: List[Dict[str, Any]]) -> Iterator[Tuple[int, str, Dict[str, Any], Optional[str]]]:
+    """read_rows() with each row's key: (row number, key, params, parse error).
+
+    The key is the params digest plus how many earlier rows had the same params.
+    """
+    seen: Dict[str, int] = {}
+    for index, params, parse_error in read_rows(path, schema):
+        if parse_error is not None:
+            # No params to go by; these never render, so the key is never matched
+            yield index, f"line:{index}", params, parse_error
+            continue
+        digest = params_digest(params)
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        yield index, f"{digest}:{occurrence}", params, None
+
+
+def completed_keys(output: Path) -> Set[str]:
+    """Keys of rows that rendered successfully in an earlier run"""
+    done = set()
+    if not output.exists():
+        return done
+    with output.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if result.get("status") == "ok":
+                done.add(result["key"])
+    return done
+
+
+class ResultWriter:
+    """Appends results as JSON lines, flushed to disk one at a time"""
+
+    def __init__(self, path: Path):
+        self._file = path.open("a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, result: Dict[str, Any]):
+        with self._lock:
+            self._file.write(json.dumps(result, default=str) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def render_row(template, api_key: str, index: int, key: str, params: Dict[str, Any], parse_error: Optional[str],
+               mode: str, retries: int) -> Dict[str, Any]:
+    from backend.circuit import UpstreamUnavailable
+    from backend.executor import TemplateExecutionError, run_template
+
+    result = {"row": index, "key": key, "params": params, "mode": mode}
+    cleaned, errors = validate_params(template.params_schema, params) if parse_error is None else ({}, [parse_error])
+    if errors:
+        return {**result, "status": "invalid", "errors": errors, "seconds": 0.0}
+
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    start = time.perf_counter()
+    for attempt in range(retries + 1):
+        try:
+            rendered = run_template(template, api_key, cleaned, mode)
+        except UpstreamUnavailable as e:
+            # VideoDB is struggling; wait as long as the breaker asks
+            if attempt < retries:
+                time.sleep(e.retry_after)
+                continue
+            error = {"code": e.code, "message": e.message}
+        except TemplateExecutionError as e:
+            # A timed-out render may well finish on a second try
+            if e.code == "timeout_error" and attempt < retries:
+                continue
+            error = {"code": e.code, "message": e.message, "details": e.details}
+        else:
+            return {
+                **result,
+                "status": "ok",
+                "stream_url": rendered["stream_url"],
+                "player_url": rendered["player_url"],
+                "started_at": started_at,
+                "seconds": round(time.perf_counter() - start, 3),
+                "attempts": attempt + 1,
+            }
+        break
+    return {
+        **result,
+        "status": "error",
+        "error": error,
+        "started_at": started_at,
+        "seconds": round(time.perf_counter() - start, 3),
+        "attempts": attempt + 1,
+    }
+
+
+def run_batch(template, api_key: str, rows: Path, output: Path, workers: int = BATCH_WORKERS,
+              mode: str = "final", retries: int = 2, dry_run: bool = False) -> Dict[str, int]:
+    """Render every row not already in output; returns counts by status"""
+    done = completed_keys(output)
+    pending = []
+    counts = {"ok": 0, "invalid": 0, "error": 0, "skipped": 0}
+    for index, key, params, parse_error in keyed_rows(rows, template.params_schema):
+        if key in done:
+            counts["skipped"] += 1
+        else:
+            pending.append((index, key, params, parse_error))
+
+    print(f"{template.template_id}: {len(pending)} rows to render, {counts['skipped']} already done")
+    if dry_run:
+        for index, _, params, parse_error in pending:
+            _, errors = validate_params(template.params_schema, params) if parse_error is None else ({}, [parse_error])
+            if errors:
+                counts["invalid"] += 1
+            print(f"row {index}: {'invalid: ' + '; '.join(errors) if errors else 'would render'}")
+        return counts
+
+    writer = ResultWriter(output)
+    try:
+        with futures.ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch") as pool:
+            jobs = [pool.submit(render_row, template, api_key, index, key, params, parse_error, mode, retries)
+                    for index, key, params, parse_error in pending]
+            for job in futures.as_completed(jobs):
+                result = job.result()
+                writer.write(result)
+                counts[result["status"]] += 1
+                if result["status"] == "ok":
+                    print(f"row {result['row']}: rendered in {result['seconds']:.1f}s")
+                else:
+                    reason = result.get("error", {}).get("message") or "; ".join(result.get("errors", []))
+                    print(f"row {result['row']}: {result['status']}: {reason}")
+    finally:
+        writer.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("template_id")
+    parser.add_argument("rows", type=Path, help="CSV with a header row, or JSONL of param objects")
+    parser.add_argument("--output", type=Path, help="results file (default: ROWS.results.jsonl)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="rows rendered at once")
+    parser.add_argument("--mode", choices=["final", "draft"], default="final")
+    parser.add_argument("--retries", type=int, default=2, help="retries while VideoDB is unavailable or renders time out")
+    parser.add_argument("--dry-run", action="store_true", help="validate rows and list what would be rendered")
+    args = parser.parse_args()
+
+    from backend.registry import get_registry
+
+    template = get_registry().get(args.template_id)
+    if template is None:
+        parser.error(f"unknown template: {args.template_id}")
+    if not args.rows.exists():
+        parser.error(f"no such file: {args.rows}")
+    api_key = os.environ.get("VIDEODB_API_KEY")
+    if not api_key and not args.dry_run:
+        parser.error("set VIDEODB_API_KEY to the account to render with")
+
+    output = args.output or args.rows.with_suffix(".results.jsonl")
+    counts = run_batch(template, api_key, args.rows, output, args.workers, args.mode, args.retries, args.dry_run)
+    if not args.dry_run:
+        print(f"{counts['ok']} rendered, {counts['error']} failed, {counts['invalid']} invalid, "
+              f"{counts['skipped']} skipped; results in {output}")
+    sys.exit(1 if counts["error"] or counts["invalid"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare JSON encoders and compression on the API's largest payloads.
+
+    python -m backend.benchmarks.payloads [--assets 500] [--repeat 200]
+
+Payloads are the real meme bank and template details from this checkout,
+plus an /api/assets response of the given size shaped like a real account's.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import time
+
+from backend import responses
+from backend.app import list_meme_sources
+from backend.registry import get_registry
+
+
+def build_payloads(asset_count: int):
+    meme_bank = asyncio.run(list_meme_sources())
+    names = [meme["name"] for meme in meme_bank["meme_sources"]] or ["Meme"]
+    assets = {
+        "videos": [
+            {"id": f"m-{i:08x}-5b5a-7cb2-8da5-1e6d508d325b", "name": f"{names[i % len(names)]} {i}", "duration": 9.5 + i % 20}
+            for i in range(asset_count)
+        ],
+        "images": [
+            {"id": f"img-{i:08x}-466d-7d50-b791", "name": f"Image {i}"}
+            for i in range(asset_count // 4)
+        ],
+        "audio": [
+            {"id": f"a-{i:08x}-9b3d-7690-b823", "name": f"Audio {i}"}
+            for i in range(asset_count // 10)
+        ],
+    }
+    payloads = {"/api/meme-bank": meme_bank, "/api/assets": assets}
+    for template in get_registry().values():
+        payloads[f"/api/templates/{template.template_id}"] = template.to_detail()
+    return payloads
+
+
+def time_per_call(func, arg, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def stdlib_dumps(content):
+    return json.dumps(content).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, default=500, help="videos in the synthetic /api/assets payload")
+    parser.add_argument("--repeat", type=int, default=200, help="iterations per timing")
+    args = parser.parse_args()
+
+    encoder = "orjson" if responses.orjson is not None else "json (compact)"
+    print(f"encoder: {encoder}, brotli: {'yes' if responses.brotli is not None else 'not installed'}")
+    print(f"{'payload':<44} {'default':>9} {'fast':>9} {'speedup':>8} {'raw B':>9} {'gzip B':>9} {'br B':>9} {'gzip us':>9} {'br us':>9}")
+
+    for path, content in build_payloads(args.assets).items():
+        default_us = time_per_call(stdlib_dumps, content, args.repeat)
+        fast_us = time_per_call(responses.dumps, content, args.repeat)
+        body = responses.dumps(content)
+        gzipped = gzip.compress(body, compresslevel=responses.GZIP_LEVEL)
+        gzip_us = time_per_call(lambda b: gzip.compress(b, compresslevel=responses.GZIP_LEVEL), body, args.repeat)
+        if responses.brotli is not None:
+            br_size = str(len(responses.compress(body, "br")))
+            br_us = f"{time_per_call(lambda b: responses.compress(b, 'br'), body, args.repeat):.1f}"
+        else:
+            br_size = br_us = "-"
+        print(
+            f"{path:<44} {default_us:>8.1f}u {fast_us:>8.1f}u {default_us / fast_us:>7.1f}x "
+            f"{len(stdlib_dumps(content)):>9} {len(gzipped):>9} {br_size:>9} {gzip_us:>9.1f} {br_us:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
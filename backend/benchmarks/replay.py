@@ -0,0 +1,200 @@
+"""Re-drive captured API traffic against a backend, at its recorded pace or faster.
+
+    python -m backend.benchmarks.replay CAPTURE.jsonl [--target http://127.0.0.1:8000]
+        [--speed 1.0] [--concurrency 64] [--route /api/run/{template_id} ...]
+
+CAPTURE.jsonl is written by the backend with CAPTURE_PATH set (see
+backend.capture). Each record is sent again at its original offset from the
+first one, divided by --speed, so --speed 4 replays an hour of traffic in 15
+minutes with the same mix and burstiness. Bodies are rebuilt from their
+shapes: strings become random text of the recorded length, custom code
+becomes the registered template with the closest params padded to the
+recorded size. Each captured key hash gets its own synthetic API key, so
+per-key rate limits and fair queuing see the same tenants as production.
+
+Run the target backend with VIDEODB_BASE_URL pointing at
+backend.benchmarks.standin so no real VideoDB account is involved. Chunked
+upload calls (which need an upload session from an earlier response) are
+skipped. At the end, latency percentiles and status codes are printed per
+route next to the captured ones.
+"""
+import argparse
+import json
+import random
+import string
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent import futures
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+
+from backend.capture import STRING_SHAPE
+
+REPLAYABLE_PATH_PARAMS = {"template_id"}
+# Starts further behind schedule than this mean the replay itself couldn't keep up
+LATE_SECONDS = 0.1
+
+_sessions = threading.local()
+
+
+def read_capture(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # a line cut short when the backend stopped
+
+
+def replayable(record: Dict[str, Any]) -> bool:
+    params = {part[1:-1] for part in record["route"].split("/") if part.startswith("{")}
+    return params <= REPLAYABLE_PATH_PARAMS
+
+
+def _text(length: int) -> str:
+    return "".join(random.choices(string.ascii_lowercase, k=length))
+
+
+class BodyBuilder:
+    """Turns recorded shapes back into request bodies"""
+
+    def __init__(self):
+        from backend.registry import get_registry
+
+        self.templates = [t for t in get_registry().values() if t.code_path.exists()]
+
+    def code_for(self, params: Dict[str, Any], length: int) -> str:
+        """Template code with the params closest to the recorded ones, padded to length"""
+        names = set(params)
+        template = max(self.templates, key=lambda t: len(names & {f["name"] for f in t.params_schema}))
+        code = template.read_code()
+        padding = length - len(code) - 2
+        return code + ("\n#" + "x" * padding if padding > 0 else "")
+
+    def build(self, value: Any, name: Optional[str] = None) -> Any:
+        if isinstance(value, dict) and set(value) == {STRING_SHAPE}:
+            length = value[STRING_SHAPE]
+            if name == "url":
+                return "https://replay.invalid/" + _text(max(8, length - 23))
+            return _text(length)
+        if isinstance(value, dict):
+            built = {key: self.build(item, key) for key, item in value.items() if key != "code"}
+            if isinstance(value.get("code"), dict):
+                built["code"] = self.code_for(built.get("params") or {}, value["code"].get(STRING_SHAPE, 0))
+            return built
+        if isinstance(value, list):
+            return [self.build(item, name) for item in value]
+        return value
+
+
+def api_key_for(record: Dict[str, Any]) -> Optional[str]:
+    """A synthetic key per captured key; keys that were rejected are rejected by the stand-in too"""
+    if not record.get("key"):
+        return None
+    prefix = "rejected-" if record.get("key_rejected") else "replay-"
+    return prefix + record["key"]
+
+
+def send(target: str, record: Dict[str, Any], builder: BodyBuilder, scheduled: float) -> Dict[str, Any]:
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+
+    path = record["route"].replace("{template_id}", record.get("template_id") or "")
+    headers = {}
+    api_key = api_key_for(record)
+    if api_key:
+        headers["x-videodb-key"] = api_key
+    body = builder.build(record["body"]) if record.get("body") is not None else None
+
+    started = time.monotonic()
+    try:
+        response = session.request(record["method"], target + path, params=builder.build(record.get("query") or {}),
+                                   json=body, headers=headers, timeout=300)
+        status = response.status_code
+    except requests.RequestException as e:
+        status = f"error: {type(e).__name__}"
+    return {
+        "route": f"{record['method']} {record['route']}",
+        "status": status,
+        "seconds": time.monotonic() - started,
+        "late": started - scheduled,
+    }
+
+
+def percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def report(results: List[Dict[str, Any]], captured: Dict[str, List[Dict[str, Any]]], elapsed: float):
+    by_route = defaultdict(list)
+    for result in results:
+        by_route[result["route"]].append(result)
+
+    print(f"\n{'route':<40} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'was p50':>9} {'was p95':>9}  statuses")
+    for route in sorted(by_route):
+        latencies = [r["seconds"] * 1000 for r in by_route[route]]
+        before = [c["duration_ms"] for c in captured[route]]
+        statuses = Counter(str(r["status"]) for r in by_route[route])
+        print(f"{route:<40} {len(latencies):>6} {percentile(latencies, 0.5):>9.1f} {percentile(latencies, 0.95):>9.1f} "
+              f"{percentile(latencies, 0.99):>9.1f} {percentile(before, 0.5):>9.1f} {percentile(before, 0.95):>9.1f}  "
+              + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+
+    late = [r["late"] for r in results if r["late"] > LATE_SECONDS]
+    print(f"\n{len(results)} requests in {elapsed:.1f}s ({len(results) / elapsed:.1f}/s)")
+    if late:
+        print(f"{len(late)} started more than {LATE_SECONDS * 1000:.0f}ms late (worst {max(late):.2f}s); "
+              f"raise --concurrency for a faithful replay")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", type=Path, help="JSONL written by the backend with CAPTURE_PATH set")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="backend to replay against")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay this many times faster than recorded")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at most")
+    parser.add_argument("--route", action="append", dest="routes", help="only this route template (repeatable)")
+    args = parser.parse_args()
+
+    if not args.capture.exists():
+        parser.error(f"no such file: {args.capture}")
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    records = [r for r in read_capture(args.capture) if not args.routes or r["route"] in args.routes]
+    skipped = [r for r in records if not replayable(r)]
+    records = sorted((r for r in records if replayable(r)), key=lambda r: r["t"])
+    if not records:
+        print("Nothing to replay")
+        sys.exit(1)
+    captured = defaultdict(list)
+    for record in records:
+        captured[f"{record['method']} {record['route']}"].append(record)
+
+    span = (records[-1]["t"] - records[0]["t"]) / args.speed
+    print(f"Replaying {len(records)} requests over {span:.1f}s at {args.speed:g}x against {args.target}"
+          + (f" ({len(skipped)} upload-session calls skipped)" if skipped else ""))
+
+    builder = BodyBuilder()
+    target = args.target.rstrip("/")
+    first = records[0]["t"]
+    start = time.monotonic()
+    with futures.ThreadPoolExecutor(max_workers=max(1, args.concurrency), thread_name_prefix="replay") as pool:
+        jobs = []
+        for record in records:
+            scheduled = start + (record["t"] - first) / args.speed
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            jobs.append(pool.submit(send, target, record, builder, scheduled))
+        results = [job.result() for job in jobs]
+    report(results, captured, time.monotonic() - start)
+
+
+if __name__ == "__main__":
+    main()
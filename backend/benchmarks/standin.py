@@ -0,0 +1,200 @@
+"""A local stand-in for the VideoDB API, for load tests that shouldn't touch VideoDB.
+
+    python -m backend.benchmarks.standin [--port 8900] [--latency-scale 1.0]
+        [--jitter 0.3] [--seed-assets 20]
+
+Point the backend at it with VIDEODB_BASE_URL=http://localhost:8900. It
+answers the calls the backend makes through the SDK: collections, asset
+listings and lookups, uploads and timeline submissions. Every asset id
+exists, so replayed params never fail asset validation. Each API key gets
+its own in-memory account with a Memes collection of --seed-assets videos,
+so listings have a realistic size; keys starting with "rejected-" get a 401, like a revoked
+key.
+
+Latency is simulated per call: a timeline submission takes as long as the
+render scheduler's base estimate for the timeline it describes, other calls
+a fixed time. All of it is multiplied by --latency-scale and by lognormal
+noise with sigma --jitter, so there is a tail to hedge and shed.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from backend.estimates import base_estimate, timeline_features
+
+# Simulated seconds per call, before --latency-scale and jitter
+API_LATENCY = 0.05
+UPLOAD_LATENCY = 1.0
+
+KINDS = {"video": ("videos", "m-"), "image": ("images", "img-"), "audio": ("audios", "a-")}
+REJECTED_PREFIX = "rejected-"
+UPLOAD_TARGET = "upload-target"
+
+
+class Account:
+    """One API key's collections and assets"""
+
+    def __init__(self, seed_assets: int):
+        self.collections = {
+            "default": {"id": "default", "name": "default", "description": "", "is_public": False},
+            "c-memes": {"id": "c-memes", "name": "Memes", "description": "", "is_public": False},
+        }
+        self.assets: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in KINDS}
+        for i in range(seed_assets):
+            self.add("video", "c-memes", f"Seeded video {i + 1}")
+
+    def add(self, kind: str, collection_id: str, name: Optional[str]) -> Dict[str, Any]:
+        _, prefix = KINDS[kind]
+        asset = {
+            "id": f"{prefix}{uuid.uuid4().hex[:20]}",
+            "collection_id": collection_id,
+            "name": name or "",
+            "length": 30.0 if kind != "image" else None,
+            "stream_url": "https://stream.standin.local/asset.m3u8",
+        }
+        self.assets[kind].append(asset)
+        return asset
+
+
+class StandIn:
+    def __init__(self, latency_scale: float = 1.0, jitter: float = 0.3, seed_assets: int = 20):
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self.seed_assets = seed_assets
+        self.calls = 0
+        self._accounts: Dict[str, Account] = {}
+        self._lock = threading.Lock()
+
+    def account(self, api_key: str) -> Account:
+        with self._lock:
+            self.calls += 1
+            if api_key not in self._accounts:
+                self._accounts[api_key] = Account(self.seed_assets)
+            return self._accounts[api_key]
+
+    def wait(self, seconds: float):
+        noise = random.lognormvariate(0, self.jitter) if self.jitter > 0 else 1.0
+        time.sleep(seconds * self.latency_scale * noise)
+
+    def handle(self, method: str, path: str, query: Dict[str, str], body: Dict[str, Any],
+               api_key: str, host: str) -> Tuple[int, Dict[str, Any]]:
+        parts = [part for part in path.split("/") if part]
+        if parts == [UPLOAD_TARGET]:
+            # Where the SDK posts local files; it sends no key
+            self.wait(UPLOAD_LATENCY)
+            return 200, {}
+        if not api_key or api_key.startswith(REJECTED_PREFIX):
+            return 401, {"success": False, "message": "Invalid API key"}
+        account = self.account(api_key)
+
+        if parts == ["editor"]:
+            self.wait(base_estimate(timeline_features(body)))
+            stream_id = uuid.uuid4().hex[:16]
+            return 200, {"stream_url": f"https://stream.standin.local/{stream_id}.m3u8",
+                         "player_url": f"https://player.standin.local/{stream_id}"}
+
+        if parts[:1] == ["collection"] and len(parts) == 3 and parts[2] in ("upload", "upload_url"):
+            collection_id = parts[1]
+            if parts[2] == "upload_url":
+                self.wait(API_LATENCY)
+                return 200, {"upload_url": f"http://{host}/{UPLOAD_TARGET}"}
+            self.wait(UPLOAD_LATENCY)
+            kind = body.get("media_type") or "video"
+            if kind not in KINDS:
+                return 400, {"success": False, "message": f"Unsupported media_type: {kind}"}
+            return 200, account.add(kind, collection_id, body.get("name"))
+
+        self.wait(API_LATENCY)
+        if parts == ["collection"]:
+            if method == "POST":
+                collection = {"id": f"c-{uuid.uuid4().hex[:20]}", "name": body.get("name", ""),
+                              "description": body.get("description", ""), "is_public": False}
+                account.collections[collection["id"]] = collection
+                return 200, collection
+            return 200, {"collections": list(account.collections.values())}
+        if parts[:1] == ["collection"] and len(parts) == 2:
+            collection = account.collections.get(parts[1])
+            if collection is None:
+                return 404, {"success": False, "message": "Collection not found"}
+            return 200, collection
+        if parts[:1] and parts[0] in KINDS:
+            listing, _ = KINDS[parts[0]]
+            collection_id = query.get("collection_id", "default")
+            if len(parts) == 1:
+                return 200, {listing: [a for a in account.assets[parts[0]] if a["collection_id"] == collection_id]}
+            # Any id exists, so replayed asset params always resolve
+            return 200, {"id": parts[1], "collection_id": collection_id, "name": "",
+                         "length": 30.0 if parts[0] != "image" else None}
+        return 404, {"success": False, "message": f"Stand-in has no {method} /{path}"}
+
+
+class Handler(BaseHTTPRequestHandler):
+    standin: StandIn = None
+
+    def _respond(self, method: str):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        body = {}
+        if raw and self.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                pass
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        status, data = self.standin.handle(method, url.path, query, body, self.headers.get("x-access-token", ""),
+                                            self.headers.get("Host", ""))
+        payload = data if status >= 400 else {"success": True, "data": data}
+        encoded = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def do_GET(self):
+        self._respond("GET")
+
+    def do_POST(self):
+        self._respond("POST")
+
+    def log_message(self, format, *args):
+        pass  # one line per call would drown out the replay's own output
+
+
+def serve(port: int, standin: StandIn) -> ThreadingHTTPServer:
+    """Start the stand-in on a background thread"""
+    handler = type("StandInHandler", (Handler,), {"standin": standin})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="standin", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier on every simulated latency")
+    parser.add_argument("--jitter", type=float, default=0.3, help="sigma of the lognormal latency noise")
+    parser.add_argument("--seed-assets", type=int, default=20, help="videos each new account starts with")
+    args = parser.parse_args()
+
+    standin = StandIn(args.latency_scale, args.jitter, args.seed_assets)
+    server = serve(args.port, standin)
+    print(f"VideoDB stand-in on http://127.0.0.1:{args.port} (VIDEODB_BASE_URL)")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"{standin.calls} calls served")
+
+
+if __name__ == "__main__":
+    main()
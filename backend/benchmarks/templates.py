@@ -0,0 +1,181 @@
+"""Measure what each template's render() costs before its network call.
+
+    python -m backend.benchmarks.templates [--template ID ...] [--repeat 200]
+        [--threshold 0.25] [--time-threshold 1.0] [--update-baseline]
+
+Every registered template is rendered with its demo inputs against a fake
+connection, with Timeline.generate_stream() stubbed to build the request
+payload and return without calling VideoDB. Templates that have both a layout
+and a Python module are measured both ways. Reported per render:
+
+- wall time (median of --repeat renders, after a warm-up render)
+- peak memory allocated while rendering, via tracemalloc (largest of a few)
+- objects in the timeline graph handed to generate_stream()
+
+Results are compared with template_baseline.json next to this file: the run
+fails if peak memory or object counts grow by more than --threshold, or wall
+time by more than --time-threshold (looser, since it depends on the machine).
+Pass --update-baseline after an intended change to record the new numbers.
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+from backend.demo_renders import demo_params
+from backend.executor import load_render_function, load_template_module
+from backend.registry import get_registry
+
+BASELINE_PATH = Path(__file__).parent / "template_baseline.json"
+ALLOCATION_RUNS = 5
+
+
+class FakeConnection:
+    """Stands in for a VideoDB connection; nothing should reach it"""
+
+    api_key = "benchmark"
+
+    def __getattr__(self, name):
+        raise AssertionError(f"template called conn.{name} while building its timeline")
+
+
+class StubbedStreams:
+    """Replaces Timeline.generate_stream, keeping the last timeline it was given"""
+
+    def __init__(self):
+        self.last_timeline = None
+
+    @contextmanager
+    def installed(self) -> Iterator["StubbedStreams"]:
+        from videodb.editor import Timeline
+
+        original = Timeline.generate_stream
+        stub = self
+
+        def generate_stream(timeline):
+            # Building and serializing the payload is part of the template's cost
+            json.dumps(timeline.to_json())
+            stub.last_timeline = timeline
+            timeline.stream_url = timeline.player_url = "https://stream.example/benchmark.m3u8"
+            return timeline.stream_url
+
+        Timeline.generate_stream = generate_stream
+        try:
+            yield self
+        finally:
+            Timeline.generate_stream = original
+
+
+def count_objects(root, exclude) -> int:
+    """Distinct objects reachable from root through attributes and containers"""
+    seen = set()
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if obj is exclude or id(obj) in seen or isinstance(obj, (str, bytes, int, float, bool, Enum, type(None))):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.extend(vars(obj).values())
+    return len(seen)
+
+
+def render_variants(template) -> Iterator[Tuple[str, Any]]:
+    """(variant, render function) pairs: the one the app uses, plus the module if a layout shadows it"""
+    render = load_render_function(template)
+    yield ("layout" if template.layout else "module"), render
+    if template.layout and template.code_path.exists():
+        yield "module", load_template_module(template.code_path).render
+
+
+def measure(render, params: Dict[str, Any], repeat: int, streams: StubbedStreams) -> Dict[str, float]:
+    conn = FakeConnection()
+    render(conn, params)  # warm-up: compiled layouts, interned objects, lazy imports
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(conn, params)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(ALLOCATION_RUNS):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            render(conn, params)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_us": round(statistics.median(timings) * 1e6, 1),
+        "peak_kib": round(max(peaks) / 1024, 1),
+        "objects": count_objects(streams.last_timeline, conn),
+    }
+
+
+def regressions(name: str, result: Dict[str, float], baseline: Dict[str, float],
+                threshold: float, time_threshold: float):
+    limits = {"wall_us": time_threshold, "peak_kib": threshold, "objects": threshold}
+    for metric, limit in limits.items():
+        before = baseline.get(metric)
+        if before and result[metric] > before * (1 + limit):
+            yield f"{name}: {metric} {result[metric]} is more than {limit:.0%} above the baseline {before}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--template", action="append", dest="templates", help="only this template id (repeatable)")
+    parser.add_argument("--repeat", type=int, default=200, help="timed renders per template")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed growth of memory and object counts")
+    parser.add_argument("--time-threshold", type=float, default=1.0, help="allowed growth of wall time")
+    parser.add_argument("--update-baseline", action="store_true", help=f"write results to {BASELINE_PATH.name}")
+    args = parser.parse_args()
+
+    baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8")) if BASELINE_PATH.exists() else {}
+    results = {}
+    failures = []
+    print(f"{'template':<36} {'wall us':>10} {'peak KiB':>10} {'objects':>8}")
+    with StubbedStreams().installed() as streams:
+        for template in get_registry().values():
+            if args.templates and template.template_id not in args.templates:
+                continue
+            params, errors = demo_params(template)
+            if errors:
+                failures.append(f"{template.template_id}: invalid demo_inputs: {'; '.join(errors)}")
+                continue
+            for variant, render in render_variants(template):
+                name = f"{template.template_id}/{variant}"
+                result = results[name] = measure(render, params, args.repeat, streams)
+                print(f"{name:<36} {result['wall_us']:>10.1f} {result['peak_kib']:>10.1f} {result['objects']:>8}")
+                if not args.update_baseline:
+                    failures.extend(regressions(name, result, baseline.get(name, {}),
+                                                args.threshold, args.time_threshold))
+
+    if args.update_baseline:
+        baseline.update(results)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Baseline written to {BASELINE_PATH}")
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Record the shape of API traffic, for replaying it against a test backend.
+
+With CAPTURE_PATH set, every API request (or a CAPTURE_SAMPLE_RATE share of
+them) is appended to that file as one JSON line: when it arrived, its route
+and template, a hash of its API key, its status, duration and sizes, and the
+shape of its query and JSON body. Shapes keep the structure, numbers and
+booleans but replace strings with their length, so texts, asset ids, URLs
+and custom code are never written down. A string is only kept when it is a
+member of a known vocabulary for its field (render modes, media types, meme
+ids and categories, template tags and difficulties, listing cursors), and
+inside a template's params only when it is one of that param's enum options.
+API keys are hashed the same way the rate limiter does, so a replay can tell
+keys apart without knowing them, and keys VideoDB rejected are flagged.
+
+Records are written by a background thread, so requests never wait on the
+disk; if it falls CAPTURE_QUEUE_SIZE records behind, new ones are dropped.
+Chunked upload bodies are counted but never buffered, and WebSocket sessions
+are not captured. backend.benchmarks.replay re-drives a capture file.
+"""
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.asset_cache import LISTING_TYPES
+from backend.meme_bank import decode_cursor, encode_cursor, get_meme_bank
+from backend.negative_cache import AUTH_FAILURES
+from backend.ratelimit import hash_api_key
+from backend.uploads import MEDIA_TYPES
+
+CAPTURE_PATH = os.environ.get("CAPTURE_PATH", "")
+CAPTURE_SAMPLE_RATE = float(os.environ.get("CAPTURE_SAMPLE_RATE", "1.0"))
+# JSON bodies larger than this are recorded by size only
+CAPTURE_MAX_BODY_BYTES = int(os.environ.get("CAPTURE_MAX_BODY_BYTES", str(256 * 1024)))
+CAPTURE_QUEUE_SIZE = int(os.environ.get("CAPTURE_QUEUE_SIZE", "10000"))
+
+RENDER_MODES = {"final", "draft"}
+STRING_SHAPE = "$str"
+
+
+def _registry():
+    from backend.registry import get_registry
+
+    return get_registry()
+
+
+# field name -> whether a value is one of the field's known values
+VOCABULARIES = {
+    "mode": lambda value: value in RENDER_MODES,
+    "media_type": lambda value: value in MEDIA_TYPES,
+    "kind": lambda value: value in LISTING_TYPES,
+    "meme_id": lambda value: value in get_meme_bank().by_id,
+    "category": lambda value: value.lower() in get_meme_bank().categories,
+    "tag": lambda value: value.lower() in _registry().by_tag,
+    "difficulty": lambda value: value.lower() in _registry().by_difficulty,
+    "limit": str.isdigit,
+    "cursor": lambda value: encode_cursor(decode_cursor(value)) == value,
+}
+
+
+def known_value(name: Optional[str], value: str) -> bool:
+    check = VOCABULARIES.get(name)
+    try:
+        return check is not None and check(value)
+    except Exception:
+        return False  # e.g. the meme bank failed to load
+
+
+def shape(value: Any, name: Optional[str] = None, enums: Optional[Dict[str, list]] = None) -> Any:
+    """value with every string replaced by {"$str": length}, except known vocabulary values.
+
+    Everything under "params" is shaped by shape_params() against enums.
+    """
+    if isinstance(value, str):
+        return value if known_value(name, value) else {STRING_SHAPE: len(value)}
+    if isinstance(value, dict):
+        return {
+            key: shape_params(item, enums or {}) if key == "params" else shape(item, key, enums)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [shape(item, name, enums) for item in value]
+    return value
+
+
+def shape_params(value: Any, enums: Dict[str, list], name: Optional[str] = None) -> Any:
+    """A template's params, keeping only strings that are one of the param's enum options"""
+    if isinstance(value, str):
+        return value if value in enums.get(name, ()) else {STRING_SHAPE: len(value)}
+    if isinstance(value, dict):
+        return {key: shape_params(item, enums, key) for key, item in value.items()}
+    if isinstance(value, list):
+        return [shape_params(item, enums, name) for item in value]
+    return value
+
+
+def template_enums(template_id: Optional[str]) -> Dict[str, list]:
+    from backend.registry import get_registry
+
+    template = get_registry().get(template_id) if template_id else None
+    if template is None:
+        return {}
+    return {field["name"]: field.get("options", []) for field in template.params_schema if field["type"] == "enum"}
+
+
+def request_key_id(headers: Headers) -> Optional[str]:
+    api_key = headers.get("x-videodb-key") or headers.get("authorization")
+    if not api_key:
+        return None
+    if api_key.lower().startswith("bearer "):
+        api_key = api_key[7:]
+    return hash_api_key(api_key)
+
+
+class CaptureWriter:
+    """Appends records as JSON lines from a background thread"""
+
+    def __init__(self, path: str, queue_size: int = CAPTURE_QUEUE_SIZE):
+        self.path = path
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]):
+        """Queue record to be written; never blocks"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                # Flush once the backlog is written rather than after every line
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self):
+        """Write everything queued so far and stop the thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+class RequestCaptureMiddleware:
+    """Record the shape of each /api/ request handled by the app"""
+
+    def __init__(self, app: ASGIApp, path: str = CAPTURE_PATH, sample_rate: float = CAPTURE_SAMPLE_RATE):
+        self.app = app
+        self.writer = CaptureWriter(path) if path else None
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            self.writer is None
+            or scope["type"] != "http"
+            or not scope["path"].startswith("/api/")
+            or random.random() >= self.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        keep_body = headers.get("content-type", "").startswith("application/json")
+        body = bytearray()
+        request_bytes = 0
+        response_bytes = 0
+        status = None
+
+        async def receive_counted() -> Message:
+            nonlocal request_bytes, keep_body
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                request_bytes += len(chunk)
+                if keep_body:
+                    if len(body) + len(chunk) > CAPTURE_MAX_BODY_BYTES:
+                        keep_body = False
+                        body.clear()
+                    else:
+                        body.extend(chunk)
+            return message
+
+        async def send_counted(message: Message):
+            nonlocal response_bytes, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        arrived = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            duration = time.perf_counter() - start
+            # The router leaves the matched route in scope; unmatched paths aren't replayable
+            route = scope.get("route")
+            if route is not None:
+                template_id = scope.get("path_params", {}).get("template_id")
+                key_id = request_key_id(headers)
+                record = {
+                    "t": round(arrived, 3),
+                    "method": scope["method"],
+                    "route": route.path,
+                    "template_id": template_id,
+                    "key": key_id,
+                    # VideoDB turned the key down, whatever status the endpoint made of it
+                    "key_rejected": key_id is not None and key_id in AUTH_FAILURES,
+                    "status": status or 500,
+                    "duration_ms": round(duration * 1000, 1),
+                    "request_bytes": request_bytes,
+                    "response_bytes": response_bytes,
+                    "query": shape(_query_params(scope)),
+                    "body": _body_shape(bytes(body) if keep_body else b"", template_enums(template_id)),
+                }
+                self.writer.write(record)
+
+
+def _query_params(scope: Scope) -> Dict[str, Any]:
+    params = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return {name: values if len(values) > 1 else values[0] for name, values in params.items()}
+
+
+def _body_shape(raw: bytes, enums: Dict[str, list]):
+    if not raw:
+        return None
+    try:
+        return shape(json.loads(raw), enums=enums)
+    except ValueError:
+        return None
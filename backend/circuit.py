@@ -0,0 +1,244 @@
+"""Circuit breakers around VideoDB calls.
+
+Each operation (connect, render, collections, ...) has its own breaker that
+tracks outcomes and latency over a sliding window. When too many recent calls
+failed or were slow, the breaker opens and calls fail fast with
+UpstreamUnavailable instead of tying up a worker until they time out. After
+CIRCUIT_OPEN_SECONDS one probe call is let through (half-open): if it succeeds
+the breaker closes, otherwise it opens again.
+
+Only upstream trouble counts as failure: timeouts, connection errors and 5xx
+responses. Client errors such as a missing asset or a bad API key are
+successful calls as far as the breaker is concerned. For user code
+("render_custom") only errors raised by the VideoDB SDK or its HTTP transport
+count, and slowness doesn't: a module that loops or raises TimeoutError is the
+user's problem, not VideoDB's, and must not open the breaker for everyone.
+
+Calls also wait for a slot from the operation's adaptive concurrency limiter
+(backend.concurrency); a call that can't get one in time fails with
+UpstreamUnavailable too. Render calls were admitted by the render scheduler
+against that limit already and don't wait again. A call that timed out while
+its worker thread keeps running holds its limiter slot until the worker ends.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+from backend.concurrency import ADAPTIVE_QUEUE_TIMEOUT, limiter
+
+CIRCUIT_WINDOW_SECONDS = float(os.environ.get("CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_MIN_CALLS = int(os.environ.get("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_ERROR_RATE = float(os.environ.get("CIRCUIT_ERROR_RATE", "0.5"))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.environ.get("CIRCUIT_SLOW_CALL_SECONDS", "10"))
+
+# Operations that are legitimately slower than CIRCUIT_SLOW_CALL_SECONDS
+SLOW_CALL_SECONDS = {
+    "render": 25.0,
+    "upload": 60.0,
+}
+
+# Modules whose exceptions come from talking to VideoDB
+SDK_MODULES = ("videodb", "requests", "urllib3")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+UPSTREAM_ERROR_MARKERS = ("timed out", "timeout", "connection error", "max retries", "bad gateway",
+                          "service unavailable", "gateway timeout", "internal server error")
+
+
+class UpstreamUnavailable(Exception):
+    def __init__(self, operation: str, retry_after: int):
+        self.operation = operation
+        self.retry_after = retry_after
+        self.code = "upstream_unavailable"
+        self.message = f"VideoDB is not responding ({operation}). Please try again in {retry_after}s."
+        super().__init__(self.message)
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """Whether an exception means VideoDB itself is struggling"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        code = getattr(exc, "code", None)
+        if code in ("timeout_error", "connection_error"):
+            return True
+        if isinstance(exc, OSError) or type(exc).__name__ == "RequestTimeoutError":
+            return True
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+        if isinstance(status, int):
+            return status >= 500
+        message = str(exc).lower()
+        if any(marker in message for marker in UPSTREAM_ERROR_MARKERS):
+            return True
+        # Follow wrapped errors, e.g. TemplateExecutionError raised while
+        # handling the SDK exception
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def is_sdk_failure(exc: BaseException) -> bool:
+    """Whether an upstream failure was raised by the VideoDB SDK or its transport, not the code calling it"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if type(exc).__module__.split(".")[0] in SDK_MODULES:
+            return is_upstream_failure(exc)
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+# Operations that run user code around their VideoDB calls
+USER_CODE_OPERATIONS = {"render_custom"}
+# Operations only run inside a slot of a render scheduler sized from their own
+# limiter (RENDER_SCHEDULER and CUSTOM_RENDER_SCHEDULER in app.py)
+SCHEDULED_OPERATIONS = {"render", "render_custom"}
+
+
+class CircuitBreaker:
+    def __init__(self, operation: str, slow_call_seconds: float = None):
+        self.operation = operation
+        self.slow_call_seconds = slow_call_seconds or SLOW_CALL_SECONDS.get(operation, CIRCUIT_SLOW_CALL_SECONDS)
+        self.user_code = operation in USER_CODE_OPERATIONS
+        self.is_failure = is_sdk_failure if self.user_code else is_upstream_failure
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        # (finished_at, failed, latency) for calls within the window
+        self.calls = deque()
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        while self.calls and now - self.calls[0][0] > CIRCUIT_WINDOW_SECONDS:
+            self.calls.popleft()
+
+    def _retry_after(self, now: float) -> int:
+        return max(1, math.ceil(self.opened_at + CIRCUIT_OPEN_SECONDS - now))
+
+    def raise_if_open(self):
+        """Fail fast while open, without using up the half-open probe"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at < CIRCUIT_OPEN_SECONDS:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.operation, self._retry_after(now))
+
+    def before_call(self):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                if now - self.opened_at < CIRCUIT_OPEN_SECONDS:
+                    self.rejected += 1
+                    raise UpstreamUnavailable(self.operation, self._retry_after(now))
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == HALF_OPEN:
+                if self.probing:
+                    self.rejected += 1
+                    raise UpstreamUnavailable(self.operation, 1)
+                self.probing = True
+
+    def record(self, failed: bool, latency: float):
+        now = time.monotonic()
+        # User code decides how long it takes
+        failed = failed or (not self.user_code and latency > self.slow_call_seconds)
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probing = False
+                if failed:
+                    self.state, self.opened_at = OPEN, now
+                    print(f"Circuit '{self.operation}' re-opened after a failed probe")
+                else:
+                    self.state = CLOSED
+                    self.calls.clear()
+                    print(f"Circuit '{self.operation}' closed")
+                return
+
+            self.calls.append((now, failed, latency))
+            self._trim(now)
+            if self.state == CLOSED and len(self.calls) >= CIRCUIT_MIN_CALLS:
+                failures = sum(1 for _, call_failed, _ in self.calls if call_failed)
+                if failures / len(self.calls) >= CIRCUIT_ERROR_RATE:
+                    self.state, self.opened_at = OPEN, now
+                    print(f"Circuit '{self.operation}' opened: {failures}/{len(self.calls)} calls failed or were slow")
+
+    def call(self, func, *args, queue_timeout: float = ADAPTIVE_QUEUE_TIMEOUT, **kwargs):
+        """func(*args, **kwargs), waiting up to queue_timeout seconds for a limiter slot"""
+        # Don't queue for a concurrency slot just to be rejected
+        self.raise_if_open()
+        slots = limiter(self.operation)
+        if self.operation in SCHEDULED_OPERATIONS:
+            slots.enter()
+        elif not slots.acquire(queue_timeout):
+            raise UpstreamUnavailable(self.operation, slots.retry_after())
+        try:
+            self.before_call()
+        except BaseException:
+            slots.release()
+            raise
+
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            latency, failed = time.monotonic() - start, self.is_failure(e)
+            self.record(failed, latency)
+            pending = getattr(e, "pending", None)
+            if pending is not None and not pending.done():
+                # Timed out, but the worker thread is still talking to VideoDB
+                pending.add_done_callback(lambda _: slots.release(
+                    None if self.user_code else time.monotonic() - start, failed))
+            else:
+                slots.release(None if self.user_code else latency, failed)
+            raise
+        latency = time.monotonic() - start
+        self.record(False, latency)
+        slots.release(None if self.user_code else latency, completed=True)
+        return result
+
+    def snapshot(self) -> Dict[str, object]:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            latencies = sorted(latency for _, _, latency in self.calls)
+            failures = sum(1 for _, failed, _ in self.calls if failed)
+            state = self.state
+            if state == OPEN and now - self.opened_at >= CIRCUIT_OPEN_SECONDS:
+                state = HALF_OPEN
+            return {
+                "state": state,
+                "calls": len(latencies),
+                "error_rate": round(failures / len(latencies), 3) if latencies else 0.0,
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+                "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1) if latencies else None,
+                "rejected": self.rejected,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(operation: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if operation not in _breakers:
+            _breakers[operation] = CircuitBreaker(operation)
+        return _breakers[operation]
+
+
+def guarded(operation: str, func, *args, **kwargs):
+    """Call func through the breaker for operation"""
+    return breaker(operation).call(func, *args, **kwargs)
+
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.operation: b.snapshot() for b in breakers}
@@ -0,0 +1,141 @@
+"""Adaptive limits on in-flight VideoDB calls.
+
+Each operation gets a limiter whose limit follows upstream capacity, AIMD
+style: while calls succeed at their usual speed the limit grows by about one
+per limit's worth of calls, and when calls fail with upstream errors or slow
+down the limit is cut by ADAPTIVE_BACKOFF. "Slow" compares a short-term
+average latency with a long-term one, so a slowdown is noticed without
+needing every call of an operation to take the same time.
+
+Calls over the limit wait (in their worker thread) for up to
+ADAPTIVE_QUEUE_TIMEOUT seconds. Limiters are applied by the circuit breakers
+in backend.circuit, so every guarded call goes through one. Renders are the
+exception: each render scheduler (backend.ratelimit.FairScheduler) sizes its
+slots from its limiter, "render" for templates and "render_custom" for custom
+code, and does the waiting on the event loop, so render calls only take their
+place with enter() and never block a thread.
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+ADAPTIVE_INITIAL_LIMIT = float(os.environ.get("ADAPTIVE_INITIAL_LIMIT", "8"))
+ADAPTIVE_MIN_LIMIT = float(os.environ.get("ADAPTIVE_MIN_LIMIT", "1"))
+ADAPTIVE_MAX_LIMIT = float(os.environ.get("ADAPTIVE_MAX_LIMIT", "32"))
+ADAPTIVE_BACKOFF = float(os.environ.get("ADAPTIVE_BACKOFF", "0.7"))
+# Short-term latency above this multiple of the long-term latency counts as overload
+ADAPTIVE_LATENCY_TOLERANCE = float(os.environ.get("ADAPTIVE_LATENCY_TOLERANCE", "2.0"))
+ADAPTIVE_QUEUE_TIMEOUT = float(os.environ.get("ADAPTIVE_QUEUE_TIMEOUT", "30"))
+
+SHORT_ALPHA = 0.3
+LONG_ALPHA = 0.02
+
+
+class AdaptiveLimiter:
+    def __init__(self, name: str, initial: float = ADAPTIVE_INITIAL_LIMIT,
+                 min_limit: float = ADAPTIVE_MIN_LIMIT, max_limit: float = ADAPTIVE_MAX_LIMIT):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = min(max(initial, min_limit), max_limit)
+        self.in_flight = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.short_latency: Optional[float] = None
+        self.long_latency: Optional[float] = None
+        self._last_backoff = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float = ADAPTIVE_QUEUE_TIMEOUT) -> bool:
+        """Wait for a free slot; False if none freed up within timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self.queued += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self.queued -= 1
+            self.in_flight += 1
+            return True
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now"""
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def enter(self):
+        """Take a slot without waiting, for callers that were admitted against this limit already"""
+        with self._cond:
+            self.in_flight += 1
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False, completed: bool = False):
+        """Free a slot; pass the call's latency (or that it overloaded upstream) to adjust the limit.
+
+        completed without a latency is a call that went fine but whose
+        duration says nothing about upstream (user code): the limit may grow.
+        """
+        with self._cond:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+            if latency is not None or overloaded or completed:
+                self._update(latency, overloaded, in_flight)
+            self._cond.notify_all()
+
+    def _update(self, latency: Optional[float], overloaded: bool, in_flight: int):
+        if not overloaded and latency is not None:
+            self.short_latency = latency if self.short_latency is None else (
+                (1 - SHORT_ALPHA) * self.short_latency + SHORT_ALPHA * latency)
+            self.long_latency = latency if self.long_latency is None else (
+                (1 - LONG_ALPHA) * self.long_latency + LONG_ALPHA * latency)
+            overloaded = self.short_latency > ADAPTIVE_LATENCY_TOLERANCE * self.long_latency
+
+        now = time.monotonic()
+        if overloaded:
+            # Calls that were in flight together fail together; count a burst once
+            if now - self._last_backoff >= (self.short_latency or 0.0):
+                self.limit = max(self.min_limit, self.limit * ADAPTIVE_BACKOFF)
+                self._last_backoff = now
+        elif in_flight * 2 >= self.limit:
+            # Only grow while the limit is actually being used
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def retry_after(self) -> int:
+        return max(1, round(self.short_latency or 1.0))
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "queue_timeouts": self.timeouts,
+                "latency_ms": round(self.short_latency * 1000, 1) if self.short_latency is not None else None,
+                "baseline_ms": round(self.long_latency * 1000, 1) if self.long_latency is not None else None,
+            }
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter(operation: str, initial: float = ADAPTIVE_INITIAL_LIMIT) -> AdaptiveLimiter:
+    """The operation's limiter; initial only applies if this call creates it"""
+    with _limiters_lock:
+        if operation not in _limiters:
+            _limiters[operation] = AdaptiveLimiter(operation, initial=initial)
+        return _limiters[operation]
+
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {l.name: l.snapshot() for l in limiters}
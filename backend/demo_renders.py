@@ -0,0 +1,191 @@
+"""Precomputed demo renders, served as templates' preview_stream_url.
+
+    python -m backend.demo_renders [--template ID ...] [--force] [--dry-run]
+
+Renders every registered template with its demo_inputs, using the VideoDB key
+in VIDEODB_API_KEY, and records the stream URLs in a manifest. A template is
+only rendered again when its demo hash changes: a hash of its code, layout and
+validated demo inputs (so schema defaults count too).
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from backend.validator import validate_params
+
+DEMO_RENDERS_PATH = Path(os.environ.get("DEMO_RENDERS_PATH", Path(__file__).parent / "templates" / "demo_renders.json"))
+# How often the template list looks for a changed manifest
+MANIFEST_CHECK_SECONDS = 1.0
+
+
+def demo_params(template):
+    """demo_inputs validated against the schema, as they would be rendered"""
+    return validate_params(template.params_schema, template.demo_inputs)
+
+
+def demo_hash(template) -> str:
+    cleaned, _ = demo_params(template)
+    digest = hashlib.sha256()
+    digest.update(template.read_code().encode("utf-8"))
+    digest.update(json.dumps(template.layout, sort_keys=True).encode("utf-8"))
+    digest.update(json.dumps(cleaned, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DemoRenders:
+    """The manifest of demo renders, reloaded when it changes on disk"""
+
+    def __init__(self, path: Path = DEMO_RENDERS_PATH):
+        self.path = path
+        self._mtime = None
+        self._checked_at = None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # template_id -> (template, hash); a reloaded registry has new
+        # TemplateDefs, so its templates are hashed again
+        self._hashes: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < MANIFEST_CHECK_SECONDS:
+            return self._entries
+        self._checked_at = now
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            try:
+                entries = json.loads(self.path.read_text(encoding="utf-8"))["templates"] if mtime else {}
+            except (OSError, ValueError, KeyError):
+                print(f"Ignoring unreadable demo render manifest at {self.path}")
+                entries = {}
+            self._entries, self._mtime = entries, mtime
+        return self._entries
+
+    def current_hash(self, template) -> Optional[str]:
+        """The template's demo hash, computed once per loaded registry (see warm())"""
+        with self._lock:
+            cached = self._hashes.get(template.template_id)
+        if cached and cached[0] is template:
+            return cached[1]
+        try:
+            value = demo_hash(template)
+        except FileNotFoundError:
+            value = None
+        with self._lock:
+            self._hashes[template.template_id] = (template, value)
+        return value
+
+    def warm(self, templates):
+        """Hash every template ahead of the first template list"""
+        for template in templates:
+            self.current_hash(template)
+
+    def stream_url(self, template) -> Optional[str]:
+        """The demo render for the template's current code and demo inputs, if any"""
+        entry = self.entries().get(template.template_id)
+        if not entry or entry.get("hash") != self.current_hash(template):
+            return None
+        return entry.get("stream_url")
+
+    def save(self, entries: Dict[str, Dict[str, Any]]):
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"templates": entries}, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+DEMO_RENDERS = DemoRenders()
+
+
+def precompute(api_key: str, template_ids=None, force: bool = False, dry_run: bool = False,
+               retries: int = 2) -> int:
+    """Render stale demos; returns the number of templates that failed.
+
+    A render that finds VideoDB unavailable is retried up to `retries` times,
+    after the wait the circuit breaker asks for.
+    """
+    from backend.circuit import UpstreamUnavailable
+    from backend.executor import TemplateExecutionError, run_template
+    from backend.registry import get_registry
+
+    registry = get_registry()
+    entries = dict(DEMO_RENDERS.entries())
+    failures = 0
+    for template in registry.values():
+        if template_ids and template.template_id not in template_ids:
+            continue
+        current = demo_hash(template)
+        entry = entries.get(template.template_id)
+        if entry and entry.get("hash") == current and not force:
+            print(f"{template.template_id}: up to date")
+            continue
+
+        cleaned, errors = demo_params(template)
+        if errors:
+            print(f"{template.template_id}: invalid demo_inputs: {'; '.join(errors)}")
+            failures += 1
+            continue
+        if dry_run:
+            print(f"{template.template_id}: would render ({'changed' if entry else 'new'})")
+            continue
+
+        start = time.perf_counter()
+        result = None
+        for attempt in range(retries + 1):
+            try:
+                result = run_template(template, api_key, cleaned)
+            except UpstreamUnavailable as e:
+                # VideoDB is struggling; wait as long as the breaker asks
+                if attempt < retries:
+                    print(f"{template.template_id}: {e.message}, retrying in {e.retry_after}s")
+                    time.sleep(e.retry_after)
+                    continue
+                print(f"{template.template_id}: render failed: {e.message}")
+            except TemplateExecutionError as e:
+                print(f"{template.template_id}: render failed: {e.message} {e.details or ''}")
+            break
+        if result is None:
+            failures += 1
+            continue
+        entries[template.template_id] = {
+            "hash": current,
+            "stream_url": result["stream_url"],
+            "player_url": result["player_url"],
+            "rendered_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        # Save as we go, so an interrupted run keeps what it rendered
+        DEMO_RENDERS.save(entries)
+        print(f"{template.template_id}: rendered in {time.perf_counter() - start:.1f}s")
+
+    # Drop entries for templates that are gone from the registry
+    stale = [template_id for template_id in entries if template_id not in registry]
+    if stale and not dry_run:
+        for template_id in stale:
+            del entries[template_id]
+        DEMO_RENDERS.save(entries)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--template", action="append", dest="templates", help="only this template id (repeatable)")
+    parser.add_argument("--force", action="store_true", help="render even if the demo hash is unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="list what would be rendered")
+    parser.add_argument("--retries", type=int, default=2, help="retries while VideoDB is unavailable (default 2)")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("VIDEODB_API_KEY")
+    if not api_key and not args.dry_run:
+        parser.error("set VIDEODB_API_KEY to the account that should own the demo renders")
+    sys.exit(1 if precompute(api_key, args.templates, args.force, args.dry_run, args.retries) else 0)
+
+
+if __name__ == "__main__":
+    main()
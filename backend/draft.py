@@ -0,0 +1,67 @@
+"""Draft renders: a short, low-resolution cut of a timeline for quick checks.
+
+Drafts are applied to the timeline JSON as it is submitted, so they work for
+every template (layouts, modules and custom code) without the template knowing
+about them. Clips starting after DRAFT_MAX_DURATION are dropped and the rest
+are trimmed to end by it; the resolution is scaled down to DRAFT_MAX_HEIGHT,
+keeping the aspect ratio.
+"""
+import os
+from typing import Any, Dict
+
+DRAFT_MAX_DURATION = float(os.environ.get("DRAFT_MAX_DURATION", "5"))
+DRAFT_MAX_HEIGHT = int(os.environ.get("DRAFT_MAX_HEIGHT", "360"))
+
+
+def draft_resolution(resolution: str, max_height: int = DRAFT_MAX_HEIGHT) -> str:
+    """Scale a WIDTHxHEIGHT resolution down so its shorter side is at most max_height"""
+    try:
+        width, height = (int(side) for side in resolution.lower().split("x"))
+    except (AttributeError, ValueError):
+        return resolution
+    scale = max_height / max(1, min(width, height))
+    if scale >= 1:
+        return resolution
+    # Encoders want even dimensions
+    return f"{max(2, round(width * scale / 2) * 2)}x{max(2, round(height * scale / 2) * 2)}"
+
+
+def draft_timeline(data: Dict[str, Any], max_duration: float = DRAFT_MAX_DURATION) -> Dict[str, Any]:
+    """Copy of an editor request with the timeline cut down to a draft"""
+    timeline = data["timeline"]
+    tracks = []
+    for track in timeline.get("tracks", []):
+        clips = []
+        for item in track.get("clips", []):
+            start = item.get("start") or 0
+            if start >= max_duration:
+                continue
+            clip = item["clip"]
+            duration = clip.get("duration")
+            if isinstance(duration, (int, float)) and start + duration > max_duration:
+                clip = {**clip, "duration": max_duration - start}
+            clips.append({**item, "clip": clip})
+        tracks.append({**track, "clips": clips})
+    return {
+        **data,
+        "timeline": {**timeline, "resolution": draft_resolution(timeline.get("resolution", "")), "tracks": tracks},
+    }
+
+
+class DraftConnection:
+    """Wraps a VideoDB connection, turning submitted timelines into drafts"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def post(self, path, data=None, **kwargs):
+        if isinstance(data, dict) and isinstance(data.get("timeline"), dict):
+            data = draft_timeline(data)
+        return self._conn.post(path=path, data=data, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def draft_metadata() -> Dict[str, Any]:
+    return {"max_duration": DRAFT_MAX_DURATION, "max_height": DRAFT_MAX_HEIGHT}
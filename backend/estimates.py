@@ -0,0 +1,134 @@
+"""Render time estimates, used by the scheduler to run quick renders first.
+
+A render's cost is first estimated from what it asks for: output duration,
+number of clips in the layout and output resolution (drafts are estimated
+as the cut-down timeline they render). Each template then learns how far off
+that guess is from its observed render times, as a smoothed ratio, so the
+estimate tracks reality without per-template tuning. Custom code has no
+layout to inspect and shares one learned ratio.
+"""
+import os
+import threading
+from typing import Any, Dict
+
+from backend.draft import DRAFT_MAX_DURATION, draft_resolution
+
+RENDER_ESTIMATE_BASE_SECONDS = float(os.environ.get("RENDER_ESTIMATE_BASE_SECONDS", "3"))
+# Render seconds per second of output for a single 1280x720 clip
+RENDER_ESTIMATE_PER_SECOND = float(os.environ.get("RENDER_ESTIMATE_PER_SECOND", "0.4"))
+# Extra share of that per additional clip
+RENDER_ESTIMATE_CLIP_WEIGHT = float(os.environ.get("RENDER_ESTIMATE_CLIP_WEIGHT", "0.15"))
+
+DEFAULT_DURATION = 10.0
+REFERENCE_PIXELS = 1280 * 720
+LEARNING_RATE = 0.2
+CUSTOM_CODE = "custom"
+
+
+def _resolution_pixels(resolution) -> int:
+    try:
+        width, height = (int(side) for side in str(resolution).lower().split("x"))
+    except ValueError:
+        return REFERENCE_PIXELS
+    return max(1, width * height)
+
+
+def _layout_value(node, params: Dict[str, Any]):
+    if isinstance(node, dict) and "param" in node:
+        return params.get(node["param"], node.get("default"))
+    return node
+
+
+def render_features(template, params: Dict[str, Any], mode: str = "final") -> Dict[str, float]:
+    """What a render asks for: output seconds, clips and pixels per frame"""
+    layout = template.layout if template is not None else None
+    duration = params.get("duration")
+    if not isinstance(duration, (int, float)) or duration <= 0:
+        duration = DEFAULT_DURATION
+    resolution = _layout_value(layout.get("resolution", "1280x720"), params) if layout else "1280x720"
+    clips = 1
+    if layout:
+        from backend.layout import grid_size
+        clips = sum(grid_size(clip) for track in layout.get("tracks", []) for clip in track.get("clips", []))
+
+    if mode == "draft":
+        duration = min(duration, DRAFT_MAX_DURATION)
+        resolution = draft_resolution(str(resolution))
+    return {"duration": float(duration), "clips": max(1, clips), "pixels": _resolution_pixels(resolution)}
+
+
+def timeline_features(payload: Dict[str, Any]) -> Dict[str, float]:
+    """Output seconds, clips and pixels of a submitted timeline payload, as render_features has them"""
+    clips = 0
+    duration = 0.0
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "asset" in node:
+                clips += 1
+            start, length = node.get("start"), node.get("duration")
+            if isinstance(start, (int, float)) and isinstance(length, (int, float)):
+                duration = max(duration, start + length)
+            elif isinstance(length, (int, float)):
+                duration = max(duration, length)
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return {"duration": duration or DEFAULT_DURATION, "clips": max(1, clips),
+            "pixels": _resolution_pixels(payload.get("resolution", "1280x720"))}
+
+
+def base_estimate(features: Dict[str, float]) -> float:
+    per_second = RENDER_ESTIMATE_PER_SECOND * (1 + RENDER_ESTIMATE_CLIP_WEIGHT * (features["clips"] - 1))
+    scale = (features["pixels"] / REFERENCE_PIXELS) ** 0.5
+    return RENDER_ESTIMATE_BASE_SECONDS + features["duration"] * per_second * scale
+
+
+class RenderEstimate:
+    """Estimated seconds for one render; observe() feeds the actual time back"""
+
+    __slots__ = ("estimator", "key", "base", "seconds")
+
+    def __init__(self, estimator: "RenderEstimator", key: str, base: float, seconds: float):
+        self.estimator = estimator
+        self.key = key
+        self.base = base
+        self.seconds = seconds
+
+    def observe(self, elapsed: float):
+        self.estimator.observe(self.key, self.base, elapsed)
+
+    def observe_at_least(self, elapsed: float):
+        """The render ran for elapsed seconds and didn't finish (e.g. it timed out)"""
+        self.estimator.observe(self.key, self.base, elapsed, lower_bound=True)
+
+
+class RenderEstimator:
+    def __init__(self):
+        # key -> smoothed observed / base ratio
+        self._ratios: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def estimate(self, template, params: Dict[str, Any], mode: str = "final") -> RenderEstimate:
+        key = template.template_id if template is not None else CUSTOM_CODE
+        base = base_estimate(render_features(template, params, mode))
+        with self._lock:
+            ratio = self._ratios.get(key, 1.0)
+        return RenderEstimate(self, key, base, base * ratio)
+
+    def observe(self, key: str, base: float, elapsed: float, lower_bound: bool = False):
+        ratio = elapsed / base
+        with self._lock:
+            previous = self._ratios.get(key)
+            if lower_bound and previous is not None and previous >= ratio:
+                return  # Already expected to take at least that long
+            self._ratios[key] = ratio if previous is None else (1 - LEARNING_RATE) * previous + LEARNING_RATE * ratio
+
+
+ESTIMATOR = RenderEstimator()
+
+
+def estimate_render(template, params: Dict[str, Any], mode: str = "final") -> RenderEstimate:
+    """Estimate a render of template (None for custom code) with params"""
+    return ESTIMATOR.estimate(template, params, mode)
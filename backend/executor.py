@@ -1,10 +1,26 @@
 import importlib.util
+import math
+import os
 import signal
+import threading
+import time
+from concurrent import futures
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-import videodb
+from backend.asset_cache import ASSET_CACHE, ASSET_LOOKUP_BUDGET, ASSET_PARAM_TYPES, MISSING
+from backend.draft import DRAFT_MAX_DURATION, DraftConnection, draft_metadata
+from backend.circuit import UpstreamUnavailable, breaker, guarded
+from backend.hedging import HEDGE_ENABLED, HedgedConnection
+from backend.negative_cache import AUTH_FAILURES, is_auth_failure
+from backend.ratelimit import hash_api_key
+from backend.timeline_cache import TimelineCache, submit_timeline
+
+# Another VideoDB API endpoint, e.g. the local stand-in in backend.benchmarks.standin
+VIDEODB_BASE_URL = os.environ.get("VIDEODB_BASE_URL", "")
+# Seconds a render may take, including the asset lookups before it
+RENDER_TIMEOUT = 30
 
 
 class TemplateExecutionError(Exception):
@@ -17,12 +33,16 @@ class TemplateExecutionError(Exception):
 
 
 class TimeoutError(TemplateExecutionError):
-    """Raised when template execution exceeds timeout"""
-    def __init__(self):
+    """Raised when template execution exceeds timeout.
+
+    `pending` is the future of a worker thread that is still running, if any.
+    """
+    def __init__(self, pending: futures.Future = None):
         super().__init__(
             "Template execution timed out. Try with shorter clips or simpler parameters.",
             code="timeout_error"
         )
+        self.pending = pending
 
 
 @contextmanager
@@ -40,6 +60,27 @@ def timeout(seconds: int):
         signal.signal(signal.SIGALRM, original_handler)
 
 
+# Renders dispatched from the request threadpool can't use SIGALRM (it only
+# works on the main thread), so they are watched from a dedicated pool instead.
+_TIMEOUT_POOL = futures.ThreadPoolExecutor(thread_name_prefix="render-timeout")
+
+
+def call_with_timeout(seconds: int, func, *args):
+    """Call func(*args), raising TimeoutError if it takes longer than seconds"""
+    if threading.current_thread() is threading.main_thread():
+        with timeout(seconds):
+            return func(*args)
+
+    future = _TIMEOUT_POOL.submit(func, *args)
+    try:
+        return future.result(timeout=seconds)
+    except futures.TimeoutError:
+        # The worker can't be interrupted; it finishes in the background and
+        # its result is discarded. Whoever holds a slot for it keeps it until then.
+        future.cancel()
+        raise TimeoutError(pending=future)
+
+
 def load_template_module(path: Path):
     """Dynamically load a template Python module"""
     spec = importlib.util.spec_from_file_location(path.stem, path)
@@ -49,18 +90,39 @@ def load_template_module(path: Path):
     return module
 
 
+def invalid_api_key_error(details: str = None) -> TemplateExecutionError:
+    return TemplateExecutionError(
+        "Invalid or expired VideoDB API key. Please check your key and try again.",
+        code="invalid_api_key",
+        details=details
+    )
+
+
+def record_auth_failure(api_key: str) -> TemplateExecutionError:
+    """Remember that VideoDB rejected api_key; returns the error to raise"""
+    AUTH_FAILURES.add(hash_api_key(api_key))
+    return invalid_api_key_error()
+
+
 def create_connection(api_key: str):
     """Create a VideoDB connection with error handling"""
+    # Keys VideoDB rejected moments ago fail without another round trip,
+    # except for an occasional probe whose success clears the entry
+    if not AUTH_FAILURES.admit(hash_api_key(api_key)):
+        raise invalid_api_key_error("This key was rejected by VideoDB moments ago.")
+
+    import videodb
+
     try:
-        conn = videodb.connect(api_key=api_key)
+        endpoint = {"base_url": VIDEODB_BASE_URL.rstrip("/")} if VIDEODB_BASE_URL else {}
+        conn = guarded("connect", videodb.connect, api_key=api_key, **endpoint)
         return conn
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         error_msg = str(e).lower()
         if "api key" in error_msg or "unauthorized" in error_msg or "401" in error_msg:
-            raise TemplateExecutionError(
-                "Invalid or expired VideoDB API key. Please check your key and try again.",
-                code="invalid_api_key"
-            )
+            raise record_auth_failure(api_key)
         raise TemplateExecutionError(
             "Failed to connect to VideoDB. Please check your API key and network connection.",
             code="connection_error",
@@ -68,16 +130,19 @@ def create_connection(api_key: str):
         )
 
 
-def execute_render_function(render_func, conn, params):
+def execute_render_function(render_func, conn, params, operation: str = "render", seconds: int = RENDER_TIMEOUT):
     """Execute the render function with error handling and mapping"""
     try:
-        with timeout(30):
-            result = render_func(conn, params)
-    except TimeoutError:
+        result = breaker(operation).call(call_with_timeout, seconds, render_func, conn, params)
+    except (TimeoutError, UpstreamUnavailable):
         raise
     except Exception as e:
         error_msg = str(e).lower()
 
+        api_key = getattr(conn, "api_key", None)
+        if api_key and is_auth_failure(e):
+            raise record_auth_failure(api_key)
+
         # Map common VideoDB errors to user-friendly messages
         if "not found" in error_msg or "404" in error_msg:
             raise TemplateExecutionError(
@@ -113,7 +178,16 @@ def execute_render_function(render_func, conn, params):
     return result
 
 
-def validate_result(result):
+def connect_for_mode(api_key: str, mode: str, conn=None, operation: str = "render"):
+    """VideoDB connection for a render; drafts have their timelines cut down on submit"""
+    if conn is None:
+        conn = create_connection(api_key)
+    if HEDGE_ENABLED:
+        conn = HedgedConnection(conn, operation)
+    return DraftConnection(conn) if mode == "draft" else conn
+
+
+def validate_result(result, mode: str = "final"):
     """Validate and format the execution result"""
     if not isinstance(result, dict):
         raise TemplateExecutionError(
@@ -134,19 +208,102 @@ def validate_result(result):
         # VideoDB typically provides stream URLs that can be used directly
         player_url = stream_url
 
-    return {
+    formatted = {
         "stream_url": stream_url,
         "player_url": player_url,
         "metadata": result.get("metadata", {}),
     }
+    if mode == "draft":
+        formatted["mode"] = "draft"
+        formatted["draft"] = draft_metadata()
+    return formatted
+
+
+# Allowance for rounding in reported video lengths
+DURATION_TOLERANCE = 0.05
+
+
+def prevalidate_assets(conn, api_key: str, template, params: Dict[str, Any], mode: str = "final",
+                       deadline: Optional[float] = None):
+    """Reject unknown asset ids and clips longer than their source before rendering.
+
+    Uses the account's asset metadata cache; assets it can't vouch for either
+    way, or can't look up before deadline (time.monotonic()), are left for the
+    render to find out about.
+    """
+    account = hash_api_key(api_key)
+    duration = params.get("duration")
+    if mode == "draft" and isinstance(duration, (int, float)):
+        duration = min(duration, DRAFT_MAX_DURATION)
+    video_start = params.get("video_start") or 0
+
+    for field in template.params_schema:
+        media_type = ASSET_PARAM_TYPES.get(field["type"])
+        asset_id = params.get(field["name"])
+        if media_type is None or not isinstance(asset_id, str) or not asset_id:
+            continue
+
+        info = ASSET_CACHE.lookup(account, conn, media_type, asset_id, deadline)
+        if info is MISSING:
+            raise TemplateExecutionError(
+                "One or more video/image/audio assets were not found. Please check your asset IDs.",
+                code="asset_not_found",
+                details=f"{field['name']}: no {media_type} with id {asset_id}"
+            )
+        if (
+            info is not None and media_type == "video" and info.length
+            and isinstance(duration, (int, float)) and isinstance(video_start, (int, float))
+            and video_start + duration > info.length + DURATION_TOLERANCE
+        ):
+            raise TemplateExecutionError(
+                "Requested clip duration exceeds the source video length. Please use a shorter duration.",
+                code="duration_error",
+                details=f"video_start {video_start} + duration {duration} exceeds the {info.length:.2f}s length of {asset_id}"
+            )
+
+
+def _recheck_assets(conn, api_key: str, template, params: Dict[str, Any], deadline: float):
+    account = hash_api_key(api_key)
+    for field in template.params_schema:
+        media_type = ASSET_PARAM_TYPES.get(field["type"])
+        asset_id = params.get(field["name"])
+        if media_type is None or not isinstance(asset_id, str) or not asset_id:
+            continue
+        ASSET_CACHE.forget(account, asset_id)
+        ASSET_CACHE.lookup(account, conn, media_type, asset_id, deadline)
 
 
-def run_template(code_path: Path, template_id: str, api_key: str, params: Dict[str, Any]) -> Dict[str, Any]:
-    """Execute a template with timeout and error handling"""
+def recheck_assets(conn, api_key: str, template, params: Dict[str, Any]):
+    """Look a template's assets up again after the render couldn't find one.
+
+    Their cached metadata may predate a deletion; a fresh lookup that finds an
+    asset missing remembers that and drops it from the upload ledger. Gives
+    up after ASSET_LOOKUP_BUDGET seconds.
+    """
+    deadline = time.monotonic() + ASSET_LOOKUP_BUDGET
+    try:
+        call_with_timeout(math.ceil(ASSET_LOOKUP_BUDGET), _recheck_assets, conn, api_key, template, params, deadline)
+    except Exception:
+        pass  # the render's own error is the one to report
+
+
+def load_render_function(template):
+    """Resolve a template's render function: its compiled layout or its Python module"""
+    if template.layout:
+        from backend.layout import LayoutError
+
+        try:
+            return template.compiled_layout().render
+        except LayoutError as e:
+            raise TemplateExecutionError(
+                "Failed to load template layout.",
+                code="template_load_error",
+                details=str(e)
+            )
 
     # Load template module
     try:
-        module = load_template_module(code_path)
+        module = load_template_module(template.code_path)
     except Exception as e:
         raise TemplateExecutionError(
             "Failed to load template code.",
@@ -159,23 +316,76 @@ def run_template(code_path: Path, template_id: str, api_key: str, params: Dict[s
             "Template is missing the required render() function.",
             code="invalid_template"
         )
+    return module.render
+
+
+TIMELINE_CACHE = TimelineCache()
+
+
+def run_template(template, api_key: str, params: Dict[str, Any], mode: str = "final",
+                 conn=None) -> Dict[str, Any]:
+    """Execute a template with timeout and error handling.
+
+    mode="draft" renders a short, low-resolution cut (see backend.draft).
+    Pass conn to reuse an open VideoDB connection.
+    """
+
+    # Reuse the timeline built for the same layout params if we have one;
+    # only then is the template's own code skipped entirely
+    # Don't bother connecting while renders are failing fast anyway
+    breaker("render").raise_if_open()
+
+    cached = TIMELINE_CACHE.lookup(template, params)
+    render_func = None if cached else load_render_function(template)
+
+    def render(conn, params):
+        description = cached or TIMELINE_CACHE.capture(template, render_func, params)
+        if description is None:
+            return render_func(conn, params)
+        return submit_timeline(conn, *description)
 
     # Create VideoDB connection
-    conn = create_connection(api_key)
+    if conn is None:
+        conn = create_connection(api_key)
+    # Asset lookups count against the render's timeout. They are cut off,
+    # slow VideoDB calls included, once their budget is spent; the render
+    # then finds out about the assets itself.
+    started = time.monotonic()
+    budget = min(ASSET_LOOKUP_BUDGET, RENDER_TIMEOUT - 1)
+    try:
+        call_with_timeout(math.ceil(budget), prevalidate_assets, conn, api_key, template, params, mode,
+                          started + budget)
+    except TimeoutError:
+        pass
+    except Exception as e:
+        if is_auth_failure(e):
+            raise record_auth_failure(api_key)
+        raise
+    lookup_conn = conn
+    conn = connect_for_mode(api_key, mode, conn)
 
-    # Execute template
-    result = execute_render_function(module.render, conn, params)
+    # Execute template, in whatever is left of its timeout
+    remaining = int(RENDER_TIMEOUT - (time.monotonic() - started))
+    if remaining < 1:
+        raise TimeoutError()
+    try:
+        result = execute_render_function(render, conn, params, seconds=remaining)
+    except TemplateExecutionError as e:
+        if e.code == "asset_not_found":
+            recheck_assets(lookup_conn, api_key, template, params)
+        raise
 
-    # Validate and format result
-    return validate_result(result)
+    # A key that just rendered fine is clearly valid again
+    AUTH_FAILURES.invalidate(hash_api_key(api_key))
 
+    # Validate and format result
+    return validate_result(result, mode)
 
-def run_custom_code(code: str, api_key: str, params: Dict[str, Any]) -> Dict[str, Any]:
-    """Execute custom user-provided code with timeout and error handling"""
 
-    # Compile the code
+def check_syntax(code: str):
+    """Compile user-provided code without running any of it"""
     try:
-        compiled_code = compile(code, '<user-code>', 'exec')
+        return compile(code, '<user-code>', 'exec')
     except SyntaxError as e:
         raise TemplateExecutionError(
             f"Syntax error in your code at line {e.lineno}: {e.msg}",
@@ -189,6 +399,13 @@ def run_custom_code(code: str, api_key: str, params: Dict[str, Any]) -> Dict[str
             details=str(e)
         )
 
+
+def compile_custom_code(code: str):
+    """Compile user-provided code and return its render function"""
+    compiled_code = check_syntax(code)
+
+    import videodb
+
     # Create a namespace for execution
     namespace = {
         '__builtins__': __builtins__,
@@ -211,12 +428,28 @@ def run_custom_code(code: str, api_key: str, params: Dict[str, Any]) -> Dict[str
             "Your code must define a render(conn, params) function.",
             code="missing_render_function"
         )
+    return namespace['render']
+
+
+def run_custom_code(code: str, api_key: str, params: Dict[str, Any], mode: str = "final",
+                    render_func=None, conn=None) -> Dict[str, Any]:
+    """Execute custom user-provided code with timeout and error handling.
+
+    render_func and conn let a caller reuse an already compiled function and
+    an open connection (see backend.sessions).
+    """
+    if render_func is None:
+        render_func = compile_custom_code(code)
 
     # Create VideoDB connection
-    conn = create_connection(api_key)
+    breaker("render_custom").raise_if_open()
+    conn = connect_for_mode(api_key, mode, conn, operation="render_custom")
 
-    # Execute the render function
-    result = execute_render_function(namespace['render'], conn, params)
+    # Execute the render function. Custom code has its own breaker, which
+    # only counts errors raised by the SDK, so user code that hangs or raises
+    # can't open it for everyone else
+    result = execute_render_function(render_func, conn, params, operation="render_custom")
+    AUTH_FAILURES.invalidate(hash_api_key(api_key))
 
     # Validate and format result
-    return validate_result(result)
+    return validate_result(result, mode)
@@ -0,0 +1,177 @@
+"""Hedged render submissions, to cut the tail of stream generation latency.
+
+When HEDGE_ENABLED is set, timeline submissions (the editor request behind
+Timeline.generate_stream()) that are slower than usual get a second, identical
+submission. Whichever succeeds first is used. "Usual" is relative to the
+timeline: recent submissions are kept as a ratio of their latency to the base
+estimate for their timeline (backend.estimates), and a submission is hedged
+once it has taken the HEDGE_PERCENTILE ratio times its own estimate, so a long
+final render isn't hedged by the standards of a short draft. Submitting the same timeline
+twice yields the same stream, so this is safe; the slower request can't be
+interrupted mid-flight, so it is abandoned and its result discarded.
+
+Hedges are capped at HEDGE_BUDGET of submissions, so a slow upstream never
+sees more than that much extra load from them, and each takes a slot from the
+render limiter like any other call to VideoDB; with none free, there is no
+hedge.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from typing import Any, Dict, Optional
+
+from backend.concurrency import AdaptiveLimiter, limiter
+from backend.estimates import base_estimate, timeline_features
+
+HEDGE_ENABLED = os.environ.get("HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_DELAY = float(os.environ.get("HEDGE_MIN_DELAY", "2"))
+HEDGE_BUDGET = float(os.environ.get("HEDGE_BUDGET", "0.1"))
+# Submissions seen before hedging starts, and how many recent ones set the threshold
+HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = 200
+
+EDITOR_PATH = "editor"
+
+_HEDGE_POOL = futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+class Hedger:
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, min_delay: float = HEDGE_MIN_DELAY,
+                 budget: float = HEDGE_BUDGET, min_samples: int = HEDGE_MIN_SAMPLES):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.budget = budget
+        self.min_samples = min_samples
+        # Latency / estimate of recent submissions
+        self.ratios = deque(maxlen=HEDGE_WINDOW)
+        self.submissions = 0
+        self.hedged = 0
+        # Hedges whose request answered first, i.e. that actually cut latency
+        self.hedge_wins = 0
+        self.over_budget = 0
+        # Hedges skipped because the limiter had no slot for them
+        self.no_capacity = 0
+        self._lock = threading.Lock()
+
+    def threshold_ratio(self) -> Optional[float]:
+        """Share of its estimate a submission may take before it's hedged; None until enough were seen"""
+        with self._lock:
+            if len(self.ratios) < self.min_samples:
+                return None
+            ordered = sorted(self.ratios)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+
+    def threshold(self, expected: float = 1.0) -> Optional[float]:
+        """Seconds to wait before hedging a submission estimated at expected seconds"""
+        ratio = self.threshold_ratio()
+        return None if ratio is None else max(self.min_delay, ratio * expected)
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.submissions:
+                self.over_budget += 1
+                return False
+            self.hedged += 1
+            return True
+
+    def _timed(self, func, args, kwargs, expected: float):
+        start = time.monotonic()
+        result = func(*args, **kwargs)
+        with self._lock:
+            self.ratios.append((time.monotonic() - start) / expected)
+        return result
+
+    def _hedge(self, func, args, kwargs, expected: float, slots: AdaptiveLimiter):
+        start = time.monotonic()
+        try:
+            result = self._timed(func, args, kwargs, expected)
+        except BaseException:
+            slots.release()
+            raise
+        slots.release(time.monotonic() - start)
+        return result
+
+    def call(self, func, *args, expected: float = 1.0, slots: Optional[AdaptiveLimiter] = None, **kwargs):
+        """Call func, hedging it with a second call if it's slower than usual.
+
+        expected is the call's estimated seconds; the hedge takes a slot from
+        slots, if given, and is skipped when there is none.
+        """
+        with self._lock:
+            self.submissions += 1
+        delay = self.threshold(expected)
+        if delay is None:
+            return self._timed(func, args, kwargs, expected)
+
+        primary = _HEDGE_POOL.submit(self._timed, func, args, kwargs, expected)
+        try:
+            return primary.result(timeout=delay)
+        except futures.TimeoutError:
+            pass
+        if slots is not None and not slots.try_acquire():
+            with self._lock:
+                self.no_capacity += 1
+            return primary.result()
+        if not self._take_budget():
+            if slots is not None:
+                slots.release()
+            return primary.result()
+
+        if slots is None:
+            hedge = _HEDGE_POOL.submit(self._timed, func, args, kwargs, expected)
+        else:
+            hedge = _HEDGE_POOL.submit(self._hedge, func, args, kwargs, expected, slots)
+        attempts = [primary, hedge]
+        for done in futures.as_completed(attempts):
+            if done.exception() is None:
+                if done is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                for attempt in attempts:
+                    if attempt is not done:
+                        attempt.cancel()
+                return done.result()
+        # Both failed; report the original request's error
+        return primary.result()
+
+    def snapshot(self) -> Dict[str, object]:
+        ratio = self.threshold_ratio()
+        with self._lock:
+            return {
+                "enabled": HEDGE_ENABLED,
+                "threshold_ratio": round(ratio, 3) if ratio is not None else None,
+                "submissions": self.submissions,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "over_budget": self.over_budget,
+                "no_capacity": self.no_capacity,
+                "hedge_rate": round(self.hedged / self.submissions, 3) if self.submissions else 0.0,
+            }
+
+
+HEDGER = Hedger()
+
+
+def expected_seconds(data: Any) -> float:
+    return base_estimate(timeline_features(data if isinstance(data, dict) else {}))
+
+
+class HedgedConnection:
+    """Wraps a VideoDB connection, hedging timeline submissions made for operation"""
+
+    def __init__(self, conn, operation: str = "render", hedger: Hedger = HEDGER):
+        self._conn = conn
+        self._operation = operation
+        self._hedger = hedger
+
+    def post(self, path, data=None, **kwargs):
+        if path == EDITOR_PATH:
+            return self._hedger.call(self._conn.post, path=path, data=data, expected=expected_seconds(data),
+                                     slots=limiter(self._operation), **kwargs)
+        return self._conn.post(path=path, data=data, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
@@ -0,0 +1,293 @@
+"""Declarative template layouts.
+
+A layout is a JSON description of a timeline stored alongside the template in
+registry.json. It is compiled once into a render(conn, params) function, so
+built-in templates run without loading or exec'ing any Python.
+
+    "layout": {
+      "background": "#000000",
+      "resolution": {"param": "resolution"},
+      "tracks": [
+        {"clips": [
+          {"start": 0, "duration": {"param": "duration"}, "fit": "contain",
+           "asset": {"type": "video", "id": {"param": "video_id"}}}
+        ]}
+      ],
+      "metadata": {"video_id": {"param": "video_id"}}
+    }
+
+Any value may be a param reference, {"param": "<name>"} with an optional
+"default". Subtrees without param references are built once at compile time
+and shared between renders. Param-dependent style objects (fonts, borders,
+shadows, alignments) are interned through backend.template_runtime, so renders
+with the same style values share them too; assets and clips, which carry user
+text and ids, are built per render.
+
+A track's clip list may hold a 2x2 grid in place of a clip. The grid's clip is
+repeated in each quadrant of template_runtime.grid_2x2(inset), in reading
+order, and {"quadrant": "position" | "alignment" | "offset"} inside it takes
+that quadrant's value. {"quadrant": "cell"} takes the quadrant's entry from
+"cells", which may be param references:
+
+    {"grid": "2x2", "inset": 0.02,
+     "cells": [{"param": "top_left_text"}, ...],
+     "clip": {"duration": {"param": "duration"},
+              "position": {"quadrant": "position"},
+              "asset": {"type": "text", "text": {"quadrant": "cell"},
+                        "alignment": {"quadrant": "alignment"}}}}
+"""
+import hashlib
+import json
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from videodb.editor import (
+    Timeline, Track, Clip, VideoAsset, ImageAsset, AudioAsset, TextAsset,
+    Font, Border, Shadow, Background, Alignment, Offset,
+    Fit, Position, HorizontalAlignment, VerticalAlignment, TextAlignment
+)
+
+from backend.template_runtime import grid_2x2, intern
+
+
+class LayoutError(ValueError):
+    pass
+
+
+ASSET_TYPES = {
+    "video": VideoAsset,
+    "image": ImageAsset,
+    "audio": AudioAsset,
+    "text": TextAsset,
+}
+
+# Nested objects, keyed by the field name they appear under
+STYLE_TYPES = {
+    "font": Font,
+    "border": Border,
+    "shadow": Shadow,
+    "background": Background,
+    "alignment": Alignment,
+    "offset": Offset,
+}
+
+ENUM_FIELDS = {
+    "fit": Fit,
+    "position": Position,
+    "horizontal": HorizontalAlignment,
+    "vertical": VerticalAlignment,
+    "text_alignment": TextAlignment,
+}
+
+CLIP_FIELDS = {"duration", "scale", "opacity", "fit", "position", "offset", "z_index"}
+
+GRIDS = {"2x2": grid_2x2}
+GRID_FIELDS = {"grid", "inset", "cells", "clip"}
+QUADRANT_FIELDS = {"position", "alignment", "offset", "cell"}
+
+
+class _Const:
+    """Compiled value that doesn't depend on params"""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, params):
+        return self.value
+
+
+def _is_param_ref(node: Any) -> bool:
+    return isinstance(node, dict) and "param" in node and set(node) <= {"param", "default"}
+
+
+def _is_quadrant_ref(node: Any) -> bool:
+    return isinstance(node, dict) and set(node) == {"quadrant"}
+
+
+def _is_grid(node: Any) -> bool:
+    return isinstance(node, dict) and "grid" in node
+
+
+def grid_size(spec: Dict[str, Any]) -> int:
+    """Number of clips a grid entry stands for"""
+    return len(GRIDS[spec["grid"]]()) if spec.get("grid") in GRIDS else 1
+
+
+class LayoutCompiler:
+    def __init__(self, param_names: Optional[Iterable[str]] = None):
+        self.param_names = set(param_names) if param_names is not None else None
+        # (quadrant, cell node) while compiling a grid's clip
+        self.quadrant = None
+
+    def value(self, node: Any, enum=None) -> Callable:
+        if _is_quadrant_ref(node):
+            return self.quadrant_value(node["quadrant"], enum)
+        if _is_param_ref(node):
+            name = node["param"]
+            if self.param_names is not None and name not in self.param_names:
+                raise LayoutError(f"Layout references unknown param: {name}")
+            default = node.get("default")
+            if enum is None:
+                return lambda params: params.get(name, default)
+            return lambda params: enum(params.get(name, default))
+        if isinstance(node, dict):
+            items = {key: self.value(child) for key, child in node.items()}
+            if all(isinstance(item, _Const) for item in items.values()):
+                return _Const({key: item.value for key, item in items.items()})
+            return lambda params: {key: item(params) for key, item in items.items()}
+        if isinstance(node, list):
+            items = [self.value(child) for child in node]
+            if all(isinstance(item, _Const) for item in items):
+                return _Const([item.value for item in items])
+            return lambda params: [item(params) for item in items]
+        if enum is not None:
+            try:
+                return _Const(enum(node))
+            except ValueError:
+                raise LayoutError(f"Invalid {enum.__name__} value: {node!r}")
+        return _Const(node)
+
+    def fields(self, spec: Dict[str, Any], allowed: Iterable[str] = None) -> Dict[str, Callable]:
+        compiled = {}
+        for key, node in spec.items():
+            if allowed is not None and key not in allowed:
+                raise LayoutError(f"Unsupported layout field: {key}")
+            if key in STYLE_TYPES and not _is_param_ref(node) and not _is_quadrant_ref(node):
+                compiled[key] = self.object(STYLE_TYPES[key], node)
+            else:
+                compiled[key] = self.value(node, enum=ENUM_FIELDS.get(key))
+        return compiled
+
+    def object(self, cls, spec: Dict[str, Any]) -> Callable:
+        if not isinstance(spec, dict):
+            raise LayoutError(f"{cls.__name__} must be an object")
+        fields = self.fields(spec)
+        if all(isinstance(field, _Const) for field in fields.values()):
+            try:
+                return _Const(cls(**{key: field.value for key, field in fields.items()}))
+            except (TypeError, ValueError) as e:
+                raise LayoutError(f"Invalid {cls.__name__}: {e}")
+        return lambda params: intern(cls, **{key: field(params) for key, field in fields.items()})
+
+    def asset(self, spec: Dict[str, Any]) -> Callable:
+        spec = dict(spec)
+        asset_type = spec.pop("type", None)
+        if asset_type not in ASSET_TYPES:
+            raise LayoutError(f"Unsupported asset type: {asset_type!r}")
+        return self.object(ASSET_TYPES[asset_type], spec)
+
+    def clip(self, spec: Dict[str, Any]):
+        if "asset" not in spec or "duration" not in spec:
+            raise LayoutError("Layout clips need an asset and a duration")
+        spec = dict(spec)
+        start = self.value(spec.pop("start", 0))
+        asset = self.asset(spec.pop("asset"))
+        fields = self.fields(spec, allowed=CLIP_FIELDS)
+
+        def build(params):
+            clip = Clip(asset=asset(params), **{key: field(params) for key, field in fields.items()})
+            return start(params), clip
+        return build
+
+    def quadrant_value(self, field: str, enum=None) -> Callable:
+        if self.quadrant is None:
+            raise LayoutError("Quadrant references are only allowed inside a grid's clip")
+        quadrant, cell = self.quadrant
+        if field == "cell":
+            if cell is None:
+                raise LayoutError("Quadrant cell references need the grid to list cells")
+            return self.value(cell, enum=enum)
+        if field not in QUADRANT_FIELDS:
+            raise LayoutError(f"Unknown quadrant field: {field!r}")
+        return _Const(getattr(quadrant, field))
+
+    def grid(self, spec: Dict[str, Any]):
+        if spec["grid"] not in GRIDS:
+            raise LayoutError(f"Unsupported grid: {spec['grid']!r}")
+        unknown = set(spec) - GRID_FIELDS
+        if unknown:
+            raise LayoutError(f"Unsupported grid field: {sorted(unknown)[0]}")
+        inset = spec.get("inset", 0.0)
+        if not isinstance(inset, (int, float)) or isinstance(inset, bool):
+            raise LayoutError("Grid inset must be a number")
+        quadrants = GRIDS[spec["grid"]](inset)
+        cells = spec.get("cells")
+        if cells is not None and (not isinstance(cells, list) or len(cells) != len(quadrants)):
+            raise LayoutError(f"Grid cells must list one value per quadrant ({len(quadrants)})")
+        if not isinstance(spec.get("clip"), dict):
+            raise LayoutError("Grids need a clip")
+
+        clips = []
+        for number, quadrant in enumerate(quadrants):
+            self.quadrant = (quadrant, cells[number] if cells is not None else None)
+            try:
+                clips.append(self.clip(spec["clip"]))
+            finally:
+                self.quadrant = None
+        return clips
+
+    def track(self, spec: Dict[str, Any]):
+        z_index = self.value(spec.get("z_index", 0))
+        clips = []
+        for clip in spec.get("clips", []):
+            if _is_grid(clip):
+                clips += self.grid(clip)
+            else:
+                clips.append(self.clip(clip))
+
+        def build(params):
+            track = Track(z_index=z_index(params))
+            for clip in clips:
+                track.add_clip(*clip(params))
+            return track
+        return build
+
+
+class CompiledLayout:
+    """A layout compiled into a reusable timeline builder"""
+
+    def __init__(self, spec: Dict[str, Any], param_names: Optional[Iterable[str]] = None):
+        if not isinstance(spec, dict) or not spec.get("tracks"):
+            raise LayoutError("Layout must define at least one track")
+        compiler = LayoutCompiler(param_names)
+        self.background = compiler.value(spec.get("background", "#000000"))
+        self.resolution = compiler.value(spec.get("resolution", "1280x720"))
+        self.tracks = [compiler.track(track) for track in spec["tracks"]]
+        self.metadata = compiler.value(spec.get("metadata", {}))
+
+    def build(self, conn, params: Dict[str, Any]) -> Timeline:
+        timeline = Timeline(conn)
+        timeline.background = self.background(params)
+        timeline.resolution = self.resolution(params)
+        for track in self.tracks:
+            timeline.add_track(track(params))
+        return timeline
+
+    def render(self, conn, params: Dict[str, Any]) -> Dict[str, Any]:
+        timeline = self.build(conn, params)
+        stream_url = timeline.generate_stream()
+        return {
+            "stream_url": stream_url,
+            "metadata": self.metadata(params),
+        }
+
+
+MAX_COMPILED_LAYOUTS = 256
+_COMPILED: Dict[str, CompiledLayout] = {}
+
+
+def layout_hash(spec: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def compile_layout(spec: Dict[str, Any], param_names: Optional[Iterable[str]] = None) -> CompiledLayout:
+    """Compile a layout, reusing the previous compilation if the spec is unchanged"""
+    key = layout_hash({"layout": spec, "params": sorted(param_names or [])})
+    compiled = _COMPILED.get(key)
+    if compiled is None:
+        compiled = CompiledLayout(spec, param_names)
+        if len(_COMPILED) >= MAX_COMPILED_LAYOUTS:
+            # Stale entries from earlier registry reloads
+            _COMPILED.clear()
+        _COMPILED[key] = compiled
+    return compiled
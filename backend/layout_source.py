@@ -0,0 +1,294 @@
+"""Python source for templates with a declarative layout.
+
+    python -m backend.layout_source --check [--template ID ...]
+    python -m backend.layout_source --write [--template ID ...]
+
+A built-in template's layout (see backend.layout) is what renders it, and the
+file at its code_path is what the editor shows and users start their own code
+from. Both come from the layout: layout_source() turns it into a plain
+videodb.editor render(conn, params) function building the same timeline.
+--write regenerates the files after a layout change; --check exits non-zero
+if any of them no longer matches its layout.
+"""
+import argparse
+import json
+import keyword
+import sys
+import textwrap
+from typing import Any, Dict, List, Set
+
+from backend.layout import (
+    ASSET_TYPES, CLIP_FIELDS, ENUM_FIELDS, GRIDS, STYLE_TYPES, LayoutError, compile_layout
+)
+from backend.template_runtime import INTERNED_TYPES
+
+# Generated lines longer than this are split, one argument per line
+LINE_LENGTH = 100
+INDENT = "    "
+HEADER = "# Built-in template, generated from its layout in registry.json by backend.layout_source\n"
+RESERVED_NAMES = {"conn", "params", "timeline", "stream_url", "quadrant", "cell"}
+# Style factories in backend.template_runtime, by the field they fill
+STYLE_FACTORIES = {key: key for key, cls in STYLE_TYPES.items() if cls in INTERNED_TYPES}
+# asset type -> (clip factory, its positional asset field, asset fields it takes)
+CLIP_FACTORIES = {
+    "video": ("video_clip", "id", {"id", "start", "volume"}),
+    "text": ("text_clip", "text", {"text", "font", "border", "shadow", "background", "alignment"}),
+}
+RUNTIME_NAMES = ["grid_2x2", *STYLE_FACTORIES.values(), *(factory for factory, _, _ in CLIP_FACTORIES.values())]
+
+
+def _is_param_ref(node: Any) -> bool:
+    return isinstance(node, dict) and "param" in node and set(node) <= {"param", "default"}
+
+
+def _is_quadrant_ref(node: Any) -> bool:
+    return isinstance(node, dict) and set(node) == {"quadrant"}
+
+
+def _literal(value: Any) -> str:
+    if isinstance(value, str):
+        return json.dumps(value)
+    return repr(value)
+
+
+class SourceWriter:
+    """Turns one layout into the body of a render() function"""
+
+    def __init__(self, layout: Dict[str, Any], defaults: Dict[str, Any] = None):
+        self.layout = layout
+        # params_schema defaults, for references without their own
+        self.defaults = defaults or {}
+        self.imports: Set[str] = {"Timeline", "Track"}
+        # name -> default of every param reference, in order of first use
+        self.params: Dict[str, Any] = {}
+        self.inline: Set[str] = set()
+        self._collect(layout)
+        # Params that can't be local variables are read where they are used
+        taken = RESERVED_NAMES | set(_import_order()) | set(RUNTIME_NAMES)
+        for name in self.params:
+            if not name.isidentifier() or keyword.iskeyword(name) or name in taken or name.startswith("track_"):
+                self.inline.add(name)
+
+    def _default(self, node: Dict[str, Any]) -> Any:
+        return node["default"] if "default" in node else self.defaults.get(node["param"])
+
+    def _collect(self, node: Any):
+        if _is_param_ref(node):
+            name, default = node["param"], self._default(node)
+            if name in self.params and self.params[name] != default:
+                self.inline.add(name)  # referenced with different defaults
+            self.params.setdefault(name, default)
+        elif isinstance(node, dict):
+            for child in node.values():
+                self._collect(child)
+        elif isinstance(node, list):
+            for child in node:
+                self._collect(child)
+
+    def _param_expression(self, node: Dict[str, Any]) -> str:
+        name, default = node["param"], self._default(node)
+        if name not in self.inline:
+            return name
+        if default is None:
+            return f"params.get({_literal(name)})"
+        return f"params.get({_literal(name)}, {_literal(default)})"
+
+    def _call(self, name: str, arguments: List[str], indent: str, offset: int = 0) -> str:
+        """name(arguments), split over lines when it doesn't fit on one after offset more characters"""
+        self.imports.add(name)
+        single = f"{name}({', '.join(arguments)})"
+        if len(indent) + offset + len(single) <= LINE_LENGTH and "\n" not in single:
+            return single
+        inner = indent + INDENT
+        return f"{name}(\n" + "".join(f"{inner}{argument},\n" for argument in arguments) + f"{indent})"
+
+    def value(self, node: Any, indent: str, enum=None) -> str:
+        if _is_quadrant_ref(node) and node["quadrant"] != "cell":
+            return f"quadrant.{node['quadrant']}"
+        if _is_param_ref(node) or _is_quadrant_ref(node):
+            expression = "cell" if _is_quadrant_ref(node) else self._param_expression(node)
+            if enum is not None:
+                self.imports.add(enum.__name__)
+                return f"{enum.__name__}({expression})"
+            return expression
+        if isinstance(node, dict):
+            inner = indent + INDENT
+            items = [f"{_literal(key)}: {self.value(child, inner)}" for key, child in node.items()]
+            single = "{" + ", ".join(items) + "}"
+            if len(indent) + len(single) <= LINE_LENGTH and "\n" not in single:
+                return single
+            return "{\n" + "".join(f"{inner}{item},\n" for item in items) + f"{indent}}}"
+        if isinstance(node, list):
+            inner = indent + INDENT
+            items = [self.value(child, inner) for child in node]
+            single = "[" + ", ".join(items) + "]"
+            if len(indent) + len(single) <= LINE_LENGTH and "\n" not in single:
+                return single
+            return "[\n" + "".join(f"{inner}{item},\n" for item in items) + f"{indent}]"
+        if enum is not None:
+            self.imports.add(enum.__name__)
+            return f"{enum.__name__}.{enum(node).name}"
+        return _literal(node)
+
+    def fields(self, spec: Dict[str, Any], indent: str) -> List[str]:
+        inner = indent + INDENT
+        arguments = []
+        for key, node in spec.items():
+            if key in STYLE_TYPES and not _is_param_ref(node) and not _is_quadrant_ref(node):
+                value = self.object(STYLE_FACTORIES.get(key, STYLE_TYPES[key].__name__), node, inner)
+            else:
+                value = self.value(node, inner, enum=ENUM_FIELDS.get(key))
+            arguments.append(f"{key}={value}")
+        return arguments
+
+    def object(self, name: str, spec: Dict[str, Any], indent: str) -> str:
+        return self._call(name, self.fields(spec, indent), indent)
+
+    def clip(self, spec: Dict[str, Any], indent: str, offset: int = 0) -> str:
+        spec = dict(spec)
+        spec.pop("start", None)
+        asset = dict(spec.pop("asset"))
+        asset_type = asset.pop("type")
+        inner = indent + INDENT
+        clip_fields = {key: node for key, node in spec.items() if key in CLIP_FIELDS}
+        if asset_type in CLIP_FACTORIES:
+            factory, first, accepted = CLIP_FACTORIES[asset_type]
+            if first in asset and set(asset) <= accepted:
+                arguments = [self.value(asset.pop(first), inner), self.value(clip_fields.pop("duration"), inner)]
+                arguments += self.fields(asset, indent) + self.fields(clip_fields, indent)
+                return self._call(factory, arguments, indent, offset)
+        arguments = [f"asset={self.object(ASSET_TYPES[asset_type].__name__, asset, inner)}"]
+        arguments += self.fields(clip_fields, indent)
+        return self._call("Clip", arguments, indent, offset)
+
+    def grid(self, track: str, spec: Dict[str, Any]) -> List[str]:
+        """A loop adding the grid's clip to track once per quadrant"""
+        inset = spec.get("inset")
+        self.imports.add("grid_2x2")
+        quadrants = f"grid_{spec['grid']}({'' if inset is None else 'inset=' + _literal(inset)})"
+        if spec.get("cells") is None:
+            loop = f"for quadrant in {quadrants}:"
+        else:
+            cells = self.value(spec["cells"], INDENT)
+            loop = f"for quadrant, cell in zip({quadrants}, {cells}):"
+            if len(INDENT + loop) > LINE_LENGTH and "\n" not in loop:
+                items = "".join(f"{INDENT * 2}{self.value(cell, INDENT * 2)},\n" for cell in spec["cells"])
+                loop = f"for quadrant, cell in zip({quadrants}, [\n{items}{INDENT}]):"
+        prefix = f"{track}.add_clip({self.value(spec['clip'].get('start', 0), INDENT * 2)}, "
+        return [loop, f"{INDENT}{prefix}{self.clip(spec['clip'], INDENT * 2, len(prefix) + 1)})"]
+
+    def body(self) -> List[str]:
+        lines = []
+        for name, default in self.params.items():
+            if name in self.inline:
+                continue
+            if default is None:
+                lines.append(f"{name} = params.get({_literal(name)})")
+            else:
+                lines.append(f"{name} = params.get({_literal(name)}, {_literal(default)})")
+        if lines:
+            lines.append("")
+
+        lines.append("timeline = Timeline(conn)")
+        lines.append(f"timeline.background = {self.value(self.layout.get('background', '#000000'), INDENT)}")
+        lines.append(f"timeline.resolution = {self.value(self.layout.get('resolution', '1280x720'), INDENT)}")
+
+        for number, track in enumerate(self.layout["tracks"], start=1):
+            lines.append("")
+            name = f"track_{number}"
+            z_index = track.get("z_index")
+            lines.append(f"{name} = Track({'' if z_index is None else 'z_index=' + self.value(z_index, INDENT)})")
+            for clip in track.get("clips", []):
+                if clip.get("grid") in GRIDS:
+                    lines += self.grid(name, clip)
+                    continue
+                prefix = f"{name}.add_clip({self.value(clip.get('start', 0), INDENT)}, "
+                lines.append(f"{prefix}{self.clip(clip, INDENT, len(prefix) + 1)})")
+            lines.append(f"timeline.add_track({name})")
+
+        lines.append("")
+        lines.append("stream_url = timeline.generate_stream()")
+        metadata = self.value(self.layout.get("metadata", {}), INDENT + INDENT)
+        lines.append("return {")
+        lines.append(f'{INDENT}"stream_url": stream_url,')
+        lines.append(f'{INDENT}"metadata": {metadata},')
+        lines.append("}")
+        return lines
+
+
+def _import_order() -> List[str]:
+    """Every videodb.editor name generated code may use: constructors, then styles, then enums"""
+    return ["Timeline", "Track", "Clip", *(cls.__name__ for cls in ASSET_TYPES.values()),
+            *(cls.__name__ for cls in STYLE_TYPES.values()), *(enum.__name__ for enum in ENUM_FIELDS.values())]
+
+
+def _import(module: str, names: List[str]) -> str:
+    wrapped = textwrap.wrap(", ".join(names), LINE_LENGTH - len(INDENT))
+    return f"from {module} import (\n" + "".join(f"{INDENT}{line}\n" for line in wrapped) + ")\n"
+
+
+def _imports(names: Set[str]) -> str:
+    source = _import("videodb.editor", [name for name in _import_order() if name in names])
+    runtime = sorted(name for name in RUNTIME_NAMES if name in names)
+    if runtime:
+        source += "\n" + _import("backend.template_runtime", runtime)
+    return source
+
+
+def _docstring(text: str) -> List[str]:
+    text = text.replace("\\", "\\\\").replace('"""', '\\"\\"\\"')
+    wrapped = textwrap.wrap(text, LINE_LENGTH - 2 * len(INDENT))
+    if len(wrapped) <= 1:
+        return [f'"""{text}"""']
+    return ['"""', *wrapped, '"""']
+
+
+def layout_source(template) -> str:
+    """The Python module equivalent to template's layout"""
+    layout = template.layout
+    if not layout:
+        raise LayoutError(f"{template.template_id} has no layout")
+    # Same validation as rendering from the layout
+    compile_layout(layout, [field["name"] for field in template.params_schema])
+
+    # Code copied from the editor may run without schema defaults applied
+    writer = SourceWriter(layout, {field["name"]: field["default"] for field in template.params_schema
+                                   if field.get("default") is not None})
+    body = writer.body()
+    lines = [HEADER + _imports(writer.imports), "", "def render(conn, params):"]
+    lines += [INDENT + line for line in _docstring(template.description)]
+    lines += [INDENT + line if line else "" for line in body]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    from backend.registry import get_registry
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--check", action="store_true", help="fail if a template file doesn't match its layout")
+    action.add_argument("--write", action="store_true", help="regenerate template files from their layouts")
+    parser.add_argument("--template", action="append", dest="templates", help="only this template id (repeatable)")
+    args = parser.parse_args()
+
+    stale = []
+    for template in get_registry().values():
+        if not template.layout or (args.templates and template.template_id not in args.templates):
+            continue
+        source = layout_source(template)
+        current = template.code_path.read_text(encoding="utf-8") if template.code_path.exists() else None
+        if source == current:
+            continue
+        if args.write:
+            template.code_path.write_text(source, encoding="utf-8")
+            print(f"{template.template_id}: wrote {template.code_path.name}")
+        else:
+            stale.append(template.template_id)
+            print(f"{template.template_id}: {template.code_path.name} doesn't match its layout")
+    if stale:
+        print("Run python -m backend.layout_source --write")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Ledger of completed uploads, used to avoid ingesting the same media twice.
+
+Entries are keyed per account (a hash of the API key) by the normalized source
+URL, or by content hash for local file uploads. Identical uploads that arrive
+while one is already in flight wait for it instead of starting their own.
+
+The file is a log of JSON lines, each `[key, record]` or `[key, null]` for a
+forgotten entry, so recording an upload appends one line. It is rewritten
+from memory once it holds twice as many lines as there are entries. At most
+UPLOAD_LEDGER_MAX_ENTRIES are kept; the oldest go first, which at worst means
+one of them is uploaded again.
+
+Several server processes can share the file. Every change takes an exclusive
+flock on `<path>.lock`, first reads whatever other processes appended, and
+then appends or compacts with the file opened just for that. A compaction
+writes a new generation id into the lock file, which tells the other
+processes to read the rewritten file from the start. Without fcntl (Windows) there is no such
+lock, and the ledger must only be used by one process.
+"""
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent import futures
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Runtime state that should survive restarts; kept out of the source tree
+DATA_DIR = Path(os.environ.get("DATA_DIR", Path(__file__).resolve().parent.parent / "data"))
+LEDGER_PATH = Path(os.environ.get("UPLOAD_LEDGER_PATH", DATA_DIR / "upload_ledger.json"))
+UPLOAD_LEDGER_MAX_ENTRIES = int(os.environ.get("UPLOAD_LEDGER_MAX_ENTRIES", "100000"))
+# Don't bother compacting logs shorter than this
+LEDGER_COMPACT_MIN_LINES = 1000
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for deduplication"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_")
+    )
+    path = parts.path or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadLedger:
+    def __init__(self, path: Path = LEDGER_PATH, max_entries: int = UPLOAD_LEDGER_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock_path = path.with_name(path.name + ".lock")
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, futures.Future] = {}
+        # Oldest upload first
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lines = 0
+        # How far into which generation of the file the entries have been read
+        self._offset = 0
+        self._generation = None
+        try:
+            with self._lock, self._synced():
+                pass
+        except OSError:
+            print(f"Ignoring unreadable upload ledger at {path}")
+
+    @contextmanager
+    def _synced(self):
+        """Hold the file lock, with the entries caught up on other processes' changes.
+
+        Called with self._lock held.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._lock_path, "a+", encoding="utf-8") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Closing the lock file releases the lock
+            lock_file.seek(0)
+            self._sync(lock_file.read())
+            yield lock_file
+
+    def _sync(self, generation: str):
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if generation != self._generation or size < self._offset:
+            # New, or compacted by another process: read it from the start
+            self._entries.clear()
+            self._lines = 0
+            self._offset = 0
+            self._generation = generation
+        if size == self._offset:
+            return
+        with self.path.open("rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                self._offset += len(line)
+                self._lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short when a process stopped
+                if isinstance(entry, dict):
+                    # A whole-file snapshot, as older versions wrote it
+                    for key, record in entry.items():
+                        self._apply(key, record)
+                elif isinstance(entry, list) and len(entry) == 2:
+                    self._apply(*entry)
+        self._trim()
+
+    def _apply(self, key: str, record: Optional[Dict[str, Any]]):
+        self._entries.pop(key, None)
+        if record is not None:
+            self._entries[key] = record
+
+    @staticmethod
+    def key(account: str, media_type: str, source: str) -> str:
+        return f"{account}:{media_type}:{source}"
+
+    def get(self, key: str):
+        """The entry as last read; changes by other processes show up with the next write"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def forget(self, key: str):
+        with self._lock, self._synced() as lock_file:
+            if key in self._entries:
+                self._log(lock_file, [(key, None)])
+
+    def forget_asset(self, account: str, asset_id: str):
+        """Drop the account's entries for an asset that no longer exists"""
+        prefix = f"{account}:"
+        with self._lock, self._synced() as lock_file:
+            self._log(lock_file, [(key, None) for key, record in self._entries.items()
+                                  if key.startswith(prefix) and record.get("asset_id") == asset_id])
+
+    def _trim(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _log(self, lock_file, changes: List[Tuple[str, Optional[Dict[str, Any]]]]):
+        """Apply changes and write them out; called inside _synced()"""
+        if not changes:
+            return
+        for key, record in changes:
+            self._apply(key, record)
+        self._trim()
+        if self._lines + len(changes) > max(LEDGER_COMPACT_MIN_LINES, 2 * len(self._entries)):
+            self._compact(lock_file)
+            return
+        with self.path.open("ab") as f:
+            for key, record in changes:
+                f.write((json.dumps([key, record]) + "\n").encode("utf-8"))
+            self._offset = f.tell()
+        self._lines += len(changes)
+
+    def _compact(self, lock_file):
+        """Rewrite the log as one line per live entry"""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            for key, record in self._entries.items():
+                f.write((json.dumps([key, record]) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            self._offset = f.tell()
+        # New generation first: a process that stops in between makes the
+        # others reread the old file, which does no harm
+        self._generation = secrets.token_hex(8)
+        lock_file.truncate(0)
+        lock_file.write(self._generation)
+        lock_file.flush()
+        os.replace(tmp_path, self.path)
+        self._lines = len(self._entries)
+
+    def upload(self, key: str, upload_fn: Callable[[], Dict[str, Any]],
+               force: bool = False) -> Tuple[Dict[str, Any], bool]:
+        """Run upload_fn() unless key was already uploaded or is uploading.
+
+        upload_fn returns the record to keep, at least {"asset_id", "name"}.
+        Returns (record, deduplicated). Blocks while an identical upload is in
+        flight, so call it off the event loop.
+        """
+        with self._lock, self._synced():
+            record = None if force else self._entries.get(key)
+            if record is not None:
+                return record, True
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = futures.Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return pending.result(), True
+
+        try:
+            record = {**upload_fn(), "uploaded_at": time.time()}
+            with self._lock, self._synced() as lock_file:
+                self._log(lock_file, [(key, record)])
+            pending.set_result(record)
+            return record, False
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+UPLOAD_LEDGER = UploadLedger()
@@ -0,0 +1,115 @@
+"""Meme sources from meme_bank.json, with search and preview URLs.
+
+The file is reloaded when it changes on disk. Each load builds the listing
+served by /api/meme-bank (with preview player info attached) and an inverted
+index for /api/meme-bank/search, which ranks matches by field, filters by
+category and pages through results with opaque cursors.
+"""
+import base64
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from backend.preview_proxy import proxy_url
+from backend.search import InvertedIndex
+
+MEME_BANK_PATH = Path(__file__).parent / "meme_bank.json"
+
+# How much a query term matching each field counts towards a meme's rank
+FIELD_WEIGHTS = {"name": 3.0, "tags": 2.0, "category": 2.0, "description": 1.0}
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode("ascii")).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """Offset encoded in a cursor; malformed cursors start from the beginning"""
+    if not cursor:
+        return 0
+    try:
+        return max(0, int(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii")))
+    except ValueError:
+        return 0
+
+
+def preview_for(meme: Dict[str, Any]):
+    """Preview player info for a meme, preferring preview_url over source_url"""
+    preview_url = meme.get("preview_url") or meme.get("source_url")
+    if not preview_url:
+        return None
+    is_hls = preview_url.endswith(".m3u8") or "manifest" in preview_url
+    return {
+        "url": proxy_url(preview_url),
+        "type": "hls" if is_hls else "mp4"
+    }
+
+
+class MemeBank:
+    """Parsed meme bank with the lookups the API needs, built once per load"""
+
+    def __init__(self, sources: List[Dict[str, Any]]):
+        self.sources = sources
+        self.by_id = {meme["id"]: meme for meme in sources}
+        self.listing = [{**meme, "preview": preview_for(meme)} for meme in sources]
+        self.index = InvertedIndex(
+            (
+                {
+                    "name": meme.get("name"),
+                    "description": meme.get("description"),
+                    "category": meme.get("category"),
+                    "tags": " ".join(meme.get("tags") or []),
+                }
+                for meme in sources
+            ),
+            FIELD_WEIGHTS,
+        )
+        self.categories = [(meme.get("category") or "").lower() for meme in sources]
+
+    def search(self, query: str = "", category: Optional[str] = None,
+               limit: int = SEARCH_DEFAULT_LIMIT, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Ranked, paginated search; every query term must match (as a word or prefix)"""
+        scores = self.index.search(query)
+
+        # Facet counts reflect the query but not the category filter, so the
+        # UI can show how many results each category would have
+        facets = Counter(self.sources[position].get("category") or "" for position in scores)
+
+        if category:
+            wanted = category.lower()
+            scores = {position: score for position, score in scores.items() if self.categories[position] == wanted}
+
+        ranked = sorted(scores, key=lambda position: (-scores[position], self.sources[position]["name"].lower()))
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        offset = decode_cursor(cursor)
+        page = ranked[offset:offset + limit]
+        next_offset = offset + len(page)
+
+        return {
+            "results": [self.listing[position] for position in page],
+            "total": len(ranked),
+            "facets": {"category": dict(facets)},
+            "next_cursor": encode_cursor(next_offset) if next_offset < len(ranked) else None,
+        }
+
+
+_meme_bank_mtime = None
+_meme_bank = MemeBank([])
+
+
+def get_meme_bank() -> MemeBank:
+    """Return the meme bank, reloading it when meme_bank.json changes on disk"""
+    global _meme_bank_mtime, _meme_bank
+    try:
+        mtime = MEME_BANK_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if mtime != _meme_bank_mtime:
+        sources = json.loads(MEME_BANK_PATH.read_text(encoding="utf-8"))["meme_sources"] if mtime else []
+        _meme_bank = MemeBank(sources)
+        _meme_bank_mtime = mtime
+    return _meme_bank
@@ -0,0 +1,89 @@
+"""Short-lived memory of known failures, answered locally instead of asking VideoDB again.
+
+Rejected API keys (keyed by their hash) and assets that are in none of an
+account's collections (keyed by account and asset id) are remembered for a
+few seconds, so clients retrying in a loop fail fast. Entries expire on their
+own and are dropped as soon as the key or asset is seen working again. For
+keys, one call every NEGATIVE_AUTH_PROBE_SECONDS is still let through to
+VideoDB (like a half-open circuit breaker), so a key that works again is
+noticed before its entry expires.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+NEGATIVE_AUTH_TTL = float(os.environ.get("NEGATIVE_AUTH_TTL", "60"))
+NEGATIVE_ASSET_TTL = float(os.environ.get("NEGATIVE_ASSET_TTL", "30"))
+NEGATIVE_AUTH_PROBE_SECONDS = float(os.environ.get("NEGATIVE_AUTH_PROBE_SECONDS", "10"))
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.environ.get("NEGATIVE_CACHE_MAX_ENTRIES", "10000"))
+
+
+class NegativeCache:
+    def __init__(self, ttl: float, max_entries: int = NEGATIVE_CACHE_MAX_ENTRIES,
+                 probe_seconds: Optional[float] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.probe_seconds = probe_seconds
+        # key -> [expires at, last time a call was let through]
+        self._entries: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.probes = 0
+
+    def _live(self, key: Hashable, now: float) -> Optional[list]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= now:
+            del self._entries[key]
+            return None
+        return entry
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._live(key, time.monotonic()) is not None
+
+    def admit(self, key: Hashable) -> bool:
+        """Whether a call for key should go ahead: no live entry, or it's time for a probe.
+
+        Calls that aren't admitted count as hits. Report the outcome of an
+        admitted call with add() or invalidate().
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is None:
+                return True
+            if self.probe_seconds is not None and now - entry[1] >= self.probe_seconds:
+                entry[1] = now
+                self.probes += 1
+                return True
+            self.hits += 1
+            return False
+
+    def add(self, key: Hashable):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = [now + self.ttl, now]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "probes": self.probes, "ttl": self.ttl}
+
+
+AUTH_FAILURES = NegativeCache(NEGATIVE_AUTH_TTL, probe_seconds=NEGATIVE_AUTH_PROBE_SECONDS)
+MISSING_ASSETS = NegativeCache(NEGATIVE_ASSET_TTL)
+
+
+def is_auth_failure(exc: BaseException) -> bool:
+    """Whether VideoDB rejected the API key"""
+    if type(exc).__name__ == "AuthenticationError":
+        return True
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 401
@@ -0,0 +1,287 @@
+"""Caching proxy for HLS preview manifests and segments.
+
+Preview URLs are rewritten to `/api/preview/<token>`, where the token is the
+origin URL plus an HMAC signature, so the proxy only fetches URLs this server
+handed out: the previews in the meme bank and template registry, and the
+playlists and segments their manifests reference. Fetched bodies live in a
+disk-backed LRU cache; segments are kept until evicted, manifests are refetched
+after PREVIEW_MANIFEST_TTL seconds. Segments are served with byte-range
+support so EXT-X-BYTERANGE playlists and seeking work from the cache.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin
+
+from starlette.concurrency import run_in_threadpool
+
+PREVIEW_PROXY_ENABLED = os.environ.get("PREVIEW_PROXY_ENABLED", "false").lower() in ("1", "true", "yes")
+PREVIEW_PROXY_PREFIX = os.environ.get("PREVIEW_PROXY_PREFIX", "/api/preview")
+# Set explicitly when several backend processes share one cache; by default
+# tokens are only valid for the lifetime of this process
+PREVIEW_PROXY_SECRET = os.environ.get("PREVIEW_PROXY_SECRET") or secrets.token_hex(32)
+PREVIEW_CACHE_DIR = Path(os.environ.get("PREVIEW_CACHE_DIR", Path(tempfile.gettempdir()) / "makememes-preview-cache"))
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get("PREVIEW_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+PREVIEW_MANIFEST_TTL = int(os.environ.get("PREVIEW_MANIFEST_TTL", "60"))
+PREVIEW_FETCH_TIMEOUT = int(os.environ.get("PREVIEW_FETCH_TIMEOUT", "15"))
+
+MANIFEST_CONTENT_TYPES = {"application/vnd.apple.mpegurl", "application/x-mpegurl", "audio/mpegurl"}
+# Playlist tags whose URI="..." attribute points at another resource
+URI_TAGS = ("#EXT-X-KEY", "#EXT-X-MAP", "#EXT-X-MEDIA", "#EXT-X-I-FRAME-STREAM-INF",
+            "#EXT-X-SESSION-KEY", "#EXT-X-PRELOAD-HINT", "#EXT-X-RENDITION-REPORT", "#EXT-X-PART")
+
+
+class PreviewProxyError(Exception):
+    def __init__(self, message: str, code: str = "preview_unavailable", status_code: int = 502):
+        self.message = message
+        self.code = code
+        self.status_code = status_code
+        super().__init__(message)
+
+
+def _sign(url: bytes) -> str:
+    digest = hmac.new(PREVIEW_PROXY_SECRET.encode("utf-8"), url, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:12]).decode("ascii").rstrip("=")
+
+
+def encode_token(url: str) -> str:
+    raw = url.encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=") + "." + _sign(raw)
+
+
+def decode_token(token: str) -> str:
+    """Origin URL for a token, or PreviewProxyError if it was not issued here"""
+    encoded, _, signature = token.partition(".")
+    try:
+        raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    except (binascii.Error, ValueError):
+        raw = b""
+    if not raw or not hmac.compare_digest(signature, _sign(raw)):
+        raise PreviewProxyError("Unknown preview URL", code="preview_not_found", status_code=404)
+    return raw.decode("utf-8")
+
+
+def proxy_url(url: Optional[str]) -> Optional[str]:
+    """Route an http(s) preview URL through the proxy when it is enabled"""
+    if not PREVIEW_PROXY_ENABLED or not url or not url.startswith(("http://", "https://")):
+        return url
+    return f"{PREVIEW_PROXY_PREFIX}/{encode_token(url)}"
+
+
+def is_manifest(url: str, content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower() in MANIFEST_CONTENT_TYPES or url.split("?")[0].endswith(".m3u8")
+
+
+def _rewrite_uri_attribute(line: str, base_url: str) -> str:
+    start = line.find('URI="')
+    if start < 0:
+        return line
+    start += len('URI="')
+    end = line.find('"', start)
+    if end < 0:
+        return line
+    target = urljoin(base_url, line[start:end])
+    return line[:start] + encode_token(target) + line[end:]
+
+
+def rewrite_manifest(body: bytes, base_url: str) -> bytes:
+    """Point every URI in an HLS playlist back at the proxy.
+
+    URIs are written as bare tokens, relative to the manifest, so they resolve
+    under whatever path the manifest itself was served from (e.g. behind a
+    reverse proxy that strips a prefix).
+    """
+    lines = []
+    for line in body.decode("utf-8").splitlines():
+        stripped = line.strip()
+        if stripped and not stripped.startswith("#"):
+            line = encode_token(urljoin(base_url, stripped))
+        elif stripped.startswith(URI_TAGS):
+            line = _rewrite_uri_attribute(line, base_url)
+        lines.append(line)
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class CachedObject:
+    __slots__ = ("key", "url", "content_type", "size", "fetched_at", "manifest")
+
+    def __init__(self, key: str, url: str, content_type: str, size: int, fetched_at: float, manifest: bool):
+        self.key = key
+        self.url = url
+        self.content_type = content_type
+        self.size = size
+        self.fetched_at = fetched_at
+        self.manifest = manifest
+
+    @property
+    def fresh(self) -> bool:
+        return not self.manifest or time.time() - self.fetched_at < PREVIEW_MANIFEST_TTL
+
+
+class PreviewCache:
+    """Disk-backed LRU of origin responses, bounded by total body size.
+
+    Each entry is `<sha256>.body` plus a `<sha256>.json` sidecar. Access order
+    is kept in memory and rebuilt from file mtimes on startup.
+    """
+
+    def __init__(self, directory: Path = PREVIEW_CACHE_DIR, max_bytes: int = PREVIEW_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedObject]" = OrderedDict()
+        self._fetching: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        found = []
+        for meta_path in self.directory.glob("*.json"):
+            body_path = meta_path.with_suffix(".body")
+            try:
+                entry = CachedObject(**json.loads(meta_path.read_text(encoding="utf-8")))
+                entry.size = body_path.stat().st_size
+                found.append((body_path.stat().st_mtime, entry))
+            except (OSError, ValueError, TypeError):
+                meta_path.unlink(missing_ok=True)
+                body_path.unlink(missing_ok=True)
+        for _, entry in sorted(found, key=lambda pair: pair[0]):
+            self._entries[entry.key] = entry
+            self.total_bytes += entry.size
+        self._evict()
+
+    def body_path(self, key: str) -> Path:
+        return self.directory / f"{key}.body"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+        self.body_path(key).unlink(missing_ok=True)
+        self._meta_path(key).unlink(missing_ok=True)
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+
+    def lookup(self, key: str) -> Optional[CachedObject]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.fresh:
+                return None
+            self._entries.move_to_end(key)
+        try:
+            # Persist recency for the LRU order rebuilt at startup
+            os.utime(self.body_path(key))
+        except FileNotFoundError:
+            with self._lock:
+                self._drop(key)
+            return None
+        return entry
+
+    def discard(self, key: str):
+        """Forget an entry whose body went missing under us"""
+        with self._lock:
+            self._drop(key)
+
+    def _fetch(self, key: str, url: str) -> CachedObject:
+        """Download url into the cache; blocking, run it off the event loop"""
+        request = urllib.request.Request(url, headers={"User-Agent": "makememes-preview-proxy"})
+        tmp_path = self.directory / f"{key}.{secrets.token_hex(4)}.tmp"
+        try:
+            with urllib.request.urlopen(request, timeout=PREVIEW_FETCH_TIMEOUT) as response, open(tmp_path, "wb") as out:
+                content_type = response.headers.get("Content-Type", "application/octet-stream")
+                # Relative URIs in a manifest resolve against where it was redirected to
+                final_url = response.geturl()
+                shutil.copyfileobj(response, out)
+        except urllib.error.HTTPError as e:
+            tmp_path.unlink(missing_ok=True)
+            if e.code == 404:
+                raise PreviewProxyError("Preview not found at origin", code="preview_not_found", status_code=404)
+            raise PreviewProxyError(f"Origin returned HTTP {e.code}")
+        except (OSError, ValueError) as e:
+            tmp_path.unlink(missing_ok=True)
+            raise PreviewProxyError(f"Could not reach preview origin: {e}")
+
+        entry = CachedObject(key, final_url, content_type, tmp_path.stat().st_size, time.time(), is_manifest(url, content_type))
+        with self._lock:
+            self._drop(key)
+            os.replace(tmp_path, self.body_path(key))
+            self._meta_path(key).write_text(
+                json.dumps({name: getattr(entry, name) for name in CachedObject.__slots__}), encoding="utf-8"
+            )
+            self._entries[key] = entry
+            self.total_bytes += entry.size
+            self._evict()
+        return entry
+
+    async def get(self, url: str) -> Tuple[CachedObject, bool]:
+        """Cached entry for url, fetching it on a miss. Returns (entry, hit).
+
+        Concurrent misses for the same URL share one origin fetch.
+        """
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        entry = self.lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return entry, True
+
+        self.misses += 1
+        pending = self._fetching.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), False
+
+        pending = self._fetching[key] = asyncio.get_running_loop().create_future()
+        try:
+            entry = await run_in_threadpool(self._fetch, key, url)
+        except Exception as e:
+            pending.set_exception(e)
+            # Waiters see the error; nobody else needs to retrieve it
+            pending.exception()
+            raise
+        else:
+            pending.set_result(entry)
+            return entry, False
+        finally:
+            if not pending.done():
+                pending.cancel()
+            self._fetching.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_cache: Optional[PreviewCache] = None
+
+
+def get_preview_cache() -> PreviewCache:
+    global _cache
+    if _cache is None:
+        _cache = PreviewCache()
+    return _cache
@@ -0,0 +1,271 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+RATE_LIMIT_PER_MINUTE = float(os.environ.get("RENDER_RATE_PER_MINUTE", "20"))
+RATE_LIMIT_BURST = float(os.environ.get("RENDER_RATE_BURST", "5"))
+RENDER_SLOTS = int(os.environ.get("RENDER_SLOTS", "4"))
+RENDER_QUEUE_LIMIT = int(os.environ.get("RENDER_QUEUE_LIMIT", "32"))
+RENDER_QUEUE_LIMIT_PER_KEY = int(os.environ.get("RENDER_QUEUE_LIMIT_PER_KEY", "4"))
+# Seconds of estimated cost forgiven per second a render has been waiting
+RENDER_AGING_RATE = float(os.environ.get("RENDER_AGING_RATE", "0.5"))
+
+# Upper bound on the number of per-key buckets kept in memory.
+MAX_TRACKED_KEYS = 10000
+
+
+async def run_job(func, *args):
+    """run_in_threadpool(func, *args), for use inside FairScheduler.slot().
+
+    Cancelling the caller (e.g. a client that went away) can't stop the
+    thread, so the job is shielded and the CancelledError carries it as
+    `pending`: the slot then stays taken until the job is done.
+    """
+    job = asyncio.ensure_future(run_in_threadpool(func, *args))
+    try:
+        return await asyncio.shield(job)
+    except asyncio.CancelledError as e:
+        e.pending = job
+        raise
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request is rejected by admission control"""
+    def __init__(self, message: str, retry_after: float):
+        self.message = message
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(message)
+
+
+def hash_api_key(api_key: str) -> str:
+    """Stable identifier for an API key that never exposes the key itself"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def try_take(self, amount: float = 1.0) -> float:
+        """Take `amount` tokens. Returns 0 on success, otherwise seconds until they're available."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-key token buckets, keyed by a hash of the API key"""
+
+    def __init__(self, per_minute: float = RATE_LIMIT_PER_MINUTE, burst: float = RATE_LIMIT_BURST,
+                 max_keys: int = MAX_TRACKED_KEYS):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, key_id: str, cost: float = 1.0):
+        """Consume tokens for key_id or raise RateLimitExceeded"""
+        bucket = self._buckets.get(key_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[key_id] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key_id)
+
+        wait = bucket.try_take(cost)
+        if wait:
+            raise RateLimitExceeded("Too many render requests. Please slow down.", retry_after=wait)
+
+
+class FairScheduler:
+    """Bounded render slots shared across API keys, quick renders first.
+
+    Each job carries an estimated cost in seconds (backend.estimates). Waiting
+    jobs are ordered by start-time fair queuing: a job's virtual finish tag is
+    max(virtual time, key's last finish) + cost / weight, so among keys the
+    cheapest job goes first (shortest job first) while a key that floods the
+    queue only pushes its own tags further out. Jobs age while they wait:
+    every second waited takes RENDER_AGING_RATE seconds off their tag, so a
+    long render isn't starved by a steady stream of short ones.
+
+    Given a limiter (backend.concurrency.AdaptiveLimiter), the number of slots
+    follows its limit, so renders scale up while VideoDB keeps up and back off
+    when it doesn't; waiting for a slot happens here, on the event loop.
+    """
+
+    def __init__(self, slots: int = RENDER_SLOTS, max_queue: int = RENDER_QUEUE_LIMIT,
+                 max_queue_per_key: int = RENDER_QUEUE_LIMIT_PER_KEY, aging_rate: float = RENDER_AGING_RATE,
+                 limiter=None):
+        self._slots = slots
+        self.limiter = limiter
+        self.max_queue = max_queue
+        self.max_queue_per_key = max_queue_per_key
+        self.aging_rate = aging_rate
+        self.active = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._queued_per_key: Dict[str, int] = {}
+        # Running jobs: ticket -> (estimated seconds, started at)
+        self._running: Dict[int, tuple] = {}
+
+    @property
+    def slots(self) -> int:
+        """Renders that may run at once"""
+        if self.limiter is not None:
+            return max(1, int(self.limiter.limit))
+        return self._slots
+
+    @property
+    def queued(self) -> int:
+        return sum(self._queued_per_key.values())
+
+    def _priority(self, finish: float, enqueued_at: float) -> float:
+        # finish - aging_rate * (now - enqueued_at), ordered the same at any `now`
+        return finish + self.aging_rate * enqueued_at
+
+    def estimated_wait(self, key_id: Optional[str] = None, cost: Optional[float] = None,
+                       weight: float = 1.0) -> float:
+        """Seconds until a job submitted now would start.
+
+        Without key_id and cost, until everything queued has started.
+        """
+        now = time.monotonic()
+        remaining = sorted(max(0.0, seconds - (now - started)) for seconds, started in self._running.values())
+        if cost is None:
+            ahead = [entry[5] for entry in self._heap if not entry[4].done()]
+        else:
+            start = max(self._virtual_time, self._last_finish.get(key_id, 0.0))
+            priority = self._priority(start + cost / max(weight, 1e-6), now)
+            ahead = [entry[5] for entry in self._heap if entry[0] <= priority and not entry[4].done()]
+
+        if len(remaining) < self.slots and not ahead:
+            return 0.0
+        # Wait for the first slot to free up, then for the work ahead to be shared out
+        first_free = remaining[len(remaining) - self.slots] if len(remaining) >= self.slots else 0.0
+        return first_free + sum(ahead) / max(self.slots, 1)
+
+    async def acquire(self, key_id: str, weight: float = 1.0, cost: float = 1.0) -> int:
+        """Wait for a slot; returns a ticket to pass to release()"""
+        ticket = next(self._seq)
+        if self.active < self.slots and not self._heap:
+            self.active += 1
+            self._running[ticket] = (cost, time.monotonic())
+            return ticket
+
+        queued = self.queued
+        if queued >= self.max_queue or self._queued_per_key.get(key_id, 0) >= self.max_queue_per_key:
+            raise RateLimitExceeded(
+                "Render queue is full. Please retry shortly.",
+                retry_after=self.estimated_wait(),
+            )
+
+        start = max(self._virtual_time, self._last_finish.get(key_id, 0.0))
+        finish = start + cost / max(weight, 1e-6)
+        self._last_finish[key_id] = finish
+
+        waiter = asyncio.get_running_loop().create_future()
+        priority = self._priority(finish, time.monotonic())
+        heapq.heappush(self._heap, (priority, ticket, start, key_id, waiter, cost))
+        self._queued_per_key[key_id] = self._queued_per_key.get(key_id, 0) + 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to us just as we were cancelled
+                self.release(ticket)
+            else:
+                self._dequeued(key_id)
+            raise
+        return ticket
+
+    def _dequeued(self, key_id: str):
+        remaining = self._queued_per_key.get(key_id, 0) - 1
+        if remaining > 0:
+            self._queued_per_key[key_id] = remaining
+        else:
+            self._queued_per_key.pop(key_id, None)
+
+    def release(self, ticket: Optional[int] = None):
+        self._running.pop(ticket, None)
+        self.active -= 1
+        self._admit()
+
+    def _admit(self):
+        """Start waiting jobs while there are free slots (more than one if the limit grew)"""
+        while self._heap and self.active < self.slots:
+            _, next_ticket, start, key_id, waiter, cost = heapq.heappop(self._heap)
+            if waiter.done():
+                continue
+            self._dequeued(key_id)
+            self._virtual_time = start
+            # Tags at or behind virtual time carry no information any more
+            self._last_finish = {k: v for k, v in self._last_finish.items() if v > start}
+            self.active += 1
+            self._running[next_ticket] = (cost, time.monotonic())
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, key_id: str, estimate, weight: float = 1.0):
+        """Run a render estimated by `estimate` (a backend.estimates.RenderEstimate)"""
+        ticket = await self.acquire(key_id, weight=weight, cost=estimate.seconds)
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            if getattr(e, "code", None) == "timeout_error":
+                # It would have taken at least this long; without it the
+                # estimate only ever learns from renders that fit the timeout
+                estimate.observe_at_least(time.monotonic() - started)
+            self._release_when_done(ticket, getattr(e, "pending", None))
+            raise
+        estimate.observe(time.monotonic() - started)
+        self.release(ticket)
+
+    def _release_when_done(self, ticket: int, pending):
+        """Release ticket once pending, work that outlived its caller, is done.
+
+        That is a render's worker thread after a timeout, or a cancelled
+        caller's threadpool job (see run_job), which may itself time out
+        and leave a worker running.
+        """
+        if pending is None or pending.done():
+            error = None if pending is None or pending.cancelled() else pending.exception()
+            inner = getattr(error, "pending", None)
+            if inner is not None and not inner.done():
+                self._release_when_done(ticket, inner)
+            else:
+                self.release(ticket)
+            return
+        loop = asyncio.get_running_loop()
+        pending.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release_when_done, ticket, pending))
@@ -1,24 +1,99 @@
+"""Template catalog loaded from templates/registry.json.
+
+Only the fields needed to list and filter templates are read up front. The
+heavier per-template data (params schema, demo inputs, layout, source assets)
+is materialized on first access, and may live in a separate `spec_path` JSON
+file next to the registry so the registry itself stays small as the catalog
+grows. Template code is read from disk on demand, except for templates with a
+layout, whose code is generated from it (backend.layout_source).
+"""
 import json
-from dataclasses import dataclass
+import threading
+from collections import Counter, defaultdict
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+
+from backend.demo_renders import DEMO_RENDERS
+from backend.preview_proxy import proxy_url
+from backend.search import InvertedIndex
 
 TEMPLATES_DIR = Path(__file__).parent / "templates"
 REGISTRY_PATH = TEMPLATES_DIR / "registry.json"
 
+# How much a query term matching each field counts towards a template's rank
+FIELD_WEIGHTS = {"name": 3.0, "tags": 2.0, "description": 1.0}
+
+# Loaded lazily, from the registry entry or its spec_path file
+SPEC_FIELDS = {
+    "params_schema": list,
+    "demo_inputs": dict,
+    "source_assets": list,
+    "layout": lambda: None,
+}
+
+# Held while a spec is materialized, so concurrent first accesses read it once
+_SPEC_LOCK = threading.Lock()
+
 
-@dataclass
 class TemplateDef:
-    template_id: str
-    name: str
-    description: str
-    tags: List[str]
-    difficulty: str
-    params_schema: List[Dict[str, Any]]
-    demo_inputs: Dict[str, Any]
-    code_path: Path
-    preview_stream_url: str = None
-    source_assets: List[Dict[str, Any]] = None
+    __slots__ = (
+        "template_id",
+        "name",
+        "description",
+        "tags",
+        "difficulty",
+        "code_path",
+        "preview_stream_url",
+        "cache_timeline",
+        "_item",
+        "_spec",
+        "_code",
+    )
+
+    def __init__(self, item: Dict[str, Any]):
+        self.template_id = item["template_id"]
+        self.name = item["name"]
+        self.description = item["description"]
+        self.tags = item.get("tags", [])
+        self.difficulty = item.get("difficulty", "basic")
+        self.code_path = TEMPLATES_DIR / item["code_path"]
+        self.preview_stream_url = item.get("preview_stream_url")
+        # Code templates whose timeline only depends on their params (backend.timeline_cache)
+        self.cache_timeline = item.get("cache_timeline", False)
+        self._item = item
+        self._spec = None
+        self._code = None
+
+    def _spec_field(self, field: str):
+        spec = self._spec
+        if spec is None:
+            with _SPEC_LOCK:
+                spec = self._spec
+                if spec is None:
+                    spec = self._item
+                    if "spec_path" in spec:
+                        spec_path = TEMPLATES_DIR / spec["spec_path"]
+                        spec = {**json.loads(spec_path.read_text(encoding="utf-8")), **spec}
+                    self._spec = spec
+                    self._item = None
+        value = spec.get(field)
+        return SPEC_FIELDS[field]() if value is None else value
+
+    @property
+    def params_schema(self) -> List[Dict[str, Any]]:
+        return self._spec_field("params_schema")
+
+    @property
+    def demo_inputs(self) -> Dict[str, Any]:
+        return self._spec_field("demo_inputs")
+
+    @property
+    def source_assets(self) -> List[Dict[str, Any]]:
+        return self._spec_field("source_assets")
+
+    @property
+    def layout(self) -> Optional[Dict[str, Any]]:
+        return self._spec_field("layout")
 
     def to_list_item(self) -> Dict[str, Any]:
         result = {
@@ -28,8 +103,10 @@ class TemplateDef:
             "tags": self.tags,
             "difficulty": self.difficulty,
         }
-        if self.preview_stream_url:
-            result["preview_stream_url"] = self.preview_stream_url
+        # A demo render of the current code wins over a hand-set preview
+        preview_stream_url = DEMO_RENDERS.stream_url(self) or self.preview_stream_url
+        if preview_stream_url:
+            result["preview_stream_url"] = proxy_url(preview_stream_url)
         return result
 
     def to_detail(self) -> Dict[str, Any]:
@@ -44,24 +121,90 @@ class TemplateDef:
         return result
 
     def read_code(self) -> str:
-        return self.code_path.read_text(encoding="utf-8")
+        """The template's Python source; for layout templates, generated from the layout"""
+        if not self.layout:
+            return self.code_path.read_text(encoding="utf-8")
+        if self._code is None:
+            # Deferred like compiled_layout(): generating imports the SDK
+            from backend.layout_source import layout_source
 
+            self._code = layout_source(self)
+        return self._code
 
-def load_registry() -> Dict[str, TemplateDef]:
-    data = json.loads(REGISTRY_PATH.read_text(encoding="utf-8"))
-    templates = {}
-    for item in data["templates"]:
-        code_path = TEMPLATES_DIR / item["code_path"]
-        templates[item["template_id"]] = TemplateDef(
-            template_id=item["template_id"],
-            name=item["name"],
-            description=item["description"],
-            tags=item.get("tags", []),
-            difficulty=item.get("difficulty", "basic"),
-            params_schema=item["params_schema"],
-            demo_inputs=item.get("demo_inputs", {}),
-            code_path=code_path,
-            preview_stream_url=item.get("preview_stream_url"),
-            source_assets=item.get("source_assets", []),
+    def compiled_layout(self):
+        # Deferred: compiling needs the VideoDB SDK, which is slow to import
+        from backend.layout import compile_layout
+
+        return compile_layout(self.layout, [field["name"] for field in self.params_schema])
+
+
+class TemplateRegistry(Dict[str, TemplateDef]):
+    """Templates by id, plus tag/difficulty indexes and full-text search"""
+
+    def __init__(self, templates: List[TemplateDef]):
+        super().__init__((template.template_id, template) for template in templates)
+        self.ordered = templates
+        self.by_tag: Dict[str, List[int]] = defaultdict(list)
+        self.by_difficulty: Dict[str, List[int]] = defaultdict(list)
+        for position, template in enumerate(templates):
+            for tag in set(template.tags):
+                self.by_tag[tag.lower()].append(position)
+            self.by_difficulty[template.difficulty.lower()].append(position)
+        self.index = InvertedIndex(
+            (
+                {"name": template.name, "description": template.description, "tags": " ".join(template.tags)}
+                for template in templates
+            ),
+            FIELD_WEIGHTS,
         )
-    return templates
+
+    def filter(self, tags: Optional[List[str]] = None, difficulty: Optional[str] = None,
+               query: Optional[str] = None) -> Dict[str, Any]:
+        """Templates having every tag and the difficulty, ranked by query.
+
+        Without a query, templates keep their registry order.
+        """
+        scores = self.index.search(query)
+        for tag in tags or []:
+            tagged = self.by_tag.get(tag.lower(), ())
+            scores = {position: scores[position] for position in tagged if position in scores}
+
+        # Difficulty facet counts ignore the difficulty filter, so the UI can
+        # show what each difficulty would return. Keys are lowercase, as the
+        # filter compares them
+        facets = Counter(self.ordered[position].difficulty.lower() for position in scores)
+
+        if difficulty:
+            scores = {
+                position: scores[position]
+                for position in self.by_difficulty.get(difficulty.lower(), ())
+                if position in scores
+            }
+
+        ranked = sorted(scores, key=lambda position: (-scores[position], position))
+        return {
+            "templates": [self.ordered[position] for position in ranked],
+            "facets": {"difficulty": dict(facets)},
+        }
+
+    def tag_counts(self) -> Dict[str, int]:
+        return {tag: len(positions) for tag, positions in sorted(self.by_tag.items())}
+
+
+def load_registry() -> TemplateRegistry:
+    data = json.loads(REGISTRY_PATH.read_text(encoding="utf-8"))
+    return TemplateRegistry([TemplateDef(item) for item in data["templates"]])
+
+
+_registry_mtime = None
+_registry = TemplateRegistry([])
+
+
+def get_registry() -> TemplateRegistry:
+    """Return the registry, reloading it when registry.json changes on disk"""
+    global _registry_mtime, _registry
+    mtime = REGISTRY_PATH.stat().st_mtime_ns
+    if mtime != _registry_mtime:
+        _registry = load_registry()
+        _registry_mtime = mtime
+    return _registry
@@ -0,0 +1,63 @@
+"""Small in-memory inverted index shared by the meme bank and template catalog."""
+import bisect
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Mapping, Optional
+
+# Prefix matches count for less than whole-word matches
+PREFIX_FACTOR = 0.5
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class InvertedIndex:
+    """Maps tokens to the documents containing them, weighted by field.
+
+    Documents are identified by their position in the sequence passed in.
+    """
+
+    def __init__(self, documents: Iterable[Mapping[str, str]], field_weights: Mapping[str, float]):
+        self.size = 0
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        for position, fields in enumerate(documents):
+            self.size += 1
+            for field, weight in field_weights.items():
+                for token in set(tokenize(fields.get(field) or "")):
+                    postings = self.postings[token]
+                    postings[position] = postings.get(position, 0.0) + weight
+        # Sorted vocabulary, so prefix lookups are a bisect plus a short scan
+        self.vocabulary = sorted(self.postings)
+
+    def match_term(self, term: str) -> Dict[int, float]:
+        """Scores for one term: whole-word matches plus discounted prefix matches"""
+        scores = dict(self.postings.get(term, {}))
+        start = bisect.bisect_left(self.vocabulary, term)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            if token == term:
+                continue
+            for position, score in self.postings[token].items():
+                scores[position] = max(scores.get(position, 0.0), score * PREFIX_FACTOR)
+        return scores
+
+    def search(self, query: Optional[str]) -> Dict[int, float]:
+        """Score every document matching all query terms; an empty query matches all"""
+        terms = tokenize(query or "")
+        if not terms:
+            return {position: 0.0 for position in range(self.size)}
+
+        scores = None
+        for term in terms:
+            matches = self.match_term(term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {position: score + matches[position] for position, score in scores.items() if position in matches}
+            if not scores:
+                return {}
+        return scores
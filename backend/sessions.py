@@ -0,0 +1,322 @@
+"""Editing sessions over WebSocket.
+
+A session keeps what /api/run-custom rebuilds on every request: an open
+VideoDB connection, the compiled render function and the last params. The
+client sends the code once, then small edits or param changes, and render
+results and errors are pushed back as they happen.
+
+Client messages (JSON):
+    {"type": "init", "api_key": "...", "template_id"?: "...", "code"?: "...", "params"?: {...}}
+    {"type": "code", "code": "..."}                                      replace the source
+    {"type": "patch", "version": 3, "edits": [{"start": 10, "end": 12, "text": "..."}]}
+    {"type": "params", "params": {...}, "replace"?: false}               merge (or replace) params
+    {"type": "run", "mode"?: "final" | "draft"}
+    {"type": "ping"}
+"code", "patch" and "params" also accept "run": "final" | "draft" to render
+straight after the update. Patch offsets are character offsets into the
+source at the given version.
+
+Server messages:
+    {"type": "ready", "session_id": "...", "version": 0}
+    {"type": "compiled", "version": 3}                                   the source parses
+    {"type": "status", "state": "queued", "run_id": 2, "estimated_wait": 4.2, "estimated_seconds": 11.5}
+    {"type": "status", "state": "rendering", "run_id": 2}
+    {"type": "result", "run_id": 2, "version": 3, "stream_url": ..., ...}
+    {"type": "error", "error": {"code": ..., "message": ..., "details"?: ...}}
+    {"type": "pong"}
+
+Edits are only syntax-checked, once typing pauses for SESSION_COMPILE_DEBOUNCE
+seconds; none of the user's code runs until a render is requested. Renders,
+including running the module to get its render function, go through the same
+rate limiter and fair schedulers as the HTTP endpoints, one at a time per
+session. Run requests that arrive while a render is in flight are coalesced
+into a single render of the latest state.
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from backend.circuit import UpstreamUnavailable
+from backend.estimates import estimate_render
+from backend.executor import (
+    TemplateExecutionError, call_with_timeout, check_syntax, compile_custom_code, create_connection,
+    run_custom_code, run_template,
+)
+from backend.ratelimit import FairScheduler, RateLimiter, RateLimitExceeded, hash_api_key, run_job
+from backend.registry import get_registry
+from backend.validator import validate_params
+
+SESSION_IDLE_TIMEOUT = int(os.environ.get("SESSION_IDLE_TIMEOUT", "600"))
+SESSION_MAX_CODE_BYTES = int(os.environ.get("SESSION_MAX_CODE_BYTES", str(200 * 1024)))
+SESSION_COMPILE_DEBOUNCE = float(os.environ.get("SESSION_COMPILE_DEBOUNCE", "0.3"))
+COMPILE_TIMEOUT = 10
+
+RENDER_MODES = ("final", "draft")
+
+# Close codes in the 4000-4999 range reserved for applications
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_IDLE = 4408
+
+logger = logging.getLogger(__name__)
+
+
+class SessionError(Exception):
+    def __init__(self, message: str, code: str = "invalid_message", **extra):
+        self.message = message
+        self.code = code
+        self.extra = extra
+        super().__init__(message)
+
+
+def apply_edits(code: str, edits: List[Dict[str, Any]]) -> str:
+    """Apply non-overlapping {start, end, text} edits, all relative to code"""
+    limit = len(code)
+    try:
+        ordered = sorted(((int(e["start"]), int(e["end"]), str(e.get("text", ""))) for e in edits), reverse=True)
+    except (KeyError, TypeError, ValueError):
+        raise SessionError("Edits need integer start and end offsets", code="invalid_edit")
+    for start, end, text in ordered:
+        if not 0 <= start <= end <= limit:
+            raise SessionError("Edit is out of range or overlaps another edit", code="invalid_edit")
+        code = code[:start] + text + code[end:]
+        limit = start
+    return code
+
+
+class EditSession:
+    def __init__(self, websocket: WebSocket, rate_limiter: RateLimiter, scheduler: FairScheduler,
+                 custom_scheduler: FairScheduler):
+        self.websocket = websocket
+        self.rate_limiter = rate_limiter
+        # Template renders and custom code renders are limited separately
+        self.scheduler = scheduler
+        self.custom_scheduler = custom_scheduler
+        self.session_id = uuid.uuid4().hex
+        self.api_key: Optional[str] = None
+        self.key_id: Optional[str] = None
+        self.conn = None
+        self.template = None
+        self.template_code: Optional[str] = None
+        self.code = ""
+        self.version = 0
+        self.render_func = None
+        self.compile_error: Optional[TemplateExecutionError] = None
+        self.params: Dict[str, Any] = {}
+        self.runs = 0
+        self.pending_mode: Optional[str] = None
+        self.wake = asyncio.Event()
+        self.check_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_custom(self) -> bool:
+        return self.template is None or self.code != self.template_code
+
+    async def send(self, message: Dict[str, Any]):
+        await self.websocket.send_text(json.dumps(message))
+
+    async def send_error(self, code: str, message: str, details: str = None, **extra):
+        error = {"code": code, "message": message, **extra}
+        if details:
+            error["details"] = details
+        await self.send({"type": "error", "error": error})
+
+    async def receive(self, timeout: float) -> Dict[str, Any]:
+        text = await asyncio.wait_for(self.websocket.receive_text(), timeout)
+        try:
+            message = json.loads(text)
+        except ValueError:
+            raise SessionError("Messages must be JSON objects")
+        if not isinstance(message, dict):
+            raise SessionError("Messages must be JSON objects")
+        return message
+
+    async def serve(self):
+        await self.websocket.accept()
+        worker = None
+        try:
+            try:
+                init = await self.receive(SESSION_IDLE_TIMEOUT)
+                await self.start(init)
+            except (SessionError, TemplateExecutionError, UpstreamUnavailable) as e:
+                await self.send_error(e.code, e.message, getattr(e, "details", None))
+                await self.websocket.close(code=CLOSE_UNAUTHORIZED)
+                return
+
+            worker = asyncio.create_task(self.render_loop())
+            while True:
+                try:
+                    await self.handle(await self.receive(SESSION_IDLE_TIMEOUT))
+                except SessionError as e:
+                    await self.send_error(e.code, e.message, **e.extra)
+        except asyncio.TimeoutError:
+            await self.websocket.close(code=CLOSE_IDLE)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if worker is not None:
+                worker.cancel()
+            if self.check_task is not None:
+                self.check_task.cancel()
+
+    async def start(self, message: Dict[str, Any]):
+        if message.get("type") != "init":
+            raise SessionError("The first message must be an init message")
+        api_key = message.get("api_key") or ""
+        if api_key.lower().startswith("bearer "):
+            api_key = api_key[7:]
+        if not api_key:
+            raise SessionError("Missing VideoDB API key", code="missing_api_key")
+        self.api_key = api_key
+        self.key_id = hash_api_key(api_key)
+
+        template_id = message.get("template_id")
+        if template_id:
+            self.template = get_registry().get(template_id)
+            if self.template is None:
+                raise SessionError("Template not found", code="template_not_found")
+            self.template_code = await run_in_threadpool(self.template.read_code)
+        elif not message.get("code"):
+            raise SessionError("Send a template_id or code to start a session")
+
+        self.set_code(message.get("code") or self.template_code)
+        self.params = dict(message.get("params") or {})
+        # Connect once; every render in the session reuses this connection
+        self.conn = await run_in_threadpool(create_connection, api_key)
+        await self.send({"type": "ready", "session_id": self.session_id, "version": self.version})
+        await self.check(delay=0)
+
+    def set_code(self, code: str):
+        if not isinstance(code, str):
+            raise SessionError("code must be a string")
+        if len(code.encode("utf-8")) > SESSION_MAX_CODE_BYTES:
+            raise SessionError(f"Code exceeds {SESSION_MAX_CODE_BYTES} bytes", code="code_too_large")
+        self.code = code
+        self.render_func = None
+        self.compile_error = None
+
+    def schedule_check(self):
+        """Syntax-check the code once edits pause, dropping checks of superseded versions"""
+        if self.check_task is not None:
+            self.check_task.cancel()
+        self.check_task = asyncio.create_task(self.check(SESSION_COMPILE_DEBOUNCE))
+
+    async def check(self, delay: float):
+        """Report syntax errors before a run, without executing any of the code"""
+        await asyncio.sleep(delay)
+        if not self.is_custom:
+            return
+        code, version = self.code, self.version
+        try:
+            await run_in_threadpool(check_syntax, code)
+        except TemplateExecutionError as e:
+            if version == self.version:
+                self.compile_error = e
+            await self.send_error(e.code, e.message, e.details, version=version)
+            return
+        await self.send({"type": "compiled", "version": version})
+
+    async def load_render_function(self, code: str, version: int):
+        """Run the module to get its render function; only called while holding a render slot"""
+        if self.render_func is not None and version == self.version:
+            return self.render_func
+        render_func = await run_job(call_with_timeout, COMPILE_TIMEOUT, compile_custom_code, code)
+        if version == self.version:
+            self.render_func = render_func
+        return render_func
+
+    async def handle(self, message: Dict[str, Any]):
+        kind = message.get("type")
+        if kind == "ping":
+            await self.send({"type": "pong"})
+            return
+        if kind == "code":
+            self.set_code(message.get("code"))
+            self.version += 1
+            self.schedule_check()
+        elif kind == "patch":
+            if message.get("version") != self.version:
+                raise SessionError("Patch is against an old version; send the full code",
+                                   code="version_mismatch", version=self.version)
+            self.set_code(apply_edits(self.code, message.get("edits") or []))
+            self.version += 1
+            self.schedule_check()
+        elif kind == "params":
+            params = message.get("params")
+            if not isinstance(params, dict):
+                raise SessionError("params must be an object")
+            self.params = dict(params) if message.get("replace") else {**self.params, **params}
+        elif kind == "run":
+            self.request_run(message.get("mode") or "final")
+            return
+        else:
+            raise SessionError(f"Unknown message type: {kind}")
+
+        if message.get("run"):
+            self.request_run(message["run"] if message["run"] in RENDER_MODES else "final")
+
+    def request_run(self, mode: str):
+        if mode not in RENDER_MODES:
+            raise SessionError(f"mode must be one of {list(RENDER_MODES)}")
+        # A final render request isn't downgraded by a later draft request
+        if self.pending_mode != "final":
+            self.pending_mode = mode
+        self.wake.set()
+
+    async def render_loop(self):
+        while True:
+            await self.wake.wait()
+            self.wake.clear()
+            mode, self.pending_mode = self.pending_mode, None
+            if mode is None:
+                continue
+            try:
+                await self.render(mode)
+            except Exception as e:
+                # Keep the session usable; the next run request starts afresh
+                logger.exception("Session %s render failed", self.session_id)
+                await self.send_error("render_error", "Render failed unexpectedly", str(e))
+
+    async def render(self, mode: str):
+        self.runs += 1
+        run_id, version, params, code = self.runs, self.version, dict(self.params), self.code
+        try:
+            if self.is_custom:
+                if self.compile_error is not None:
+                    raise self.compile_error
+                job = None
+            else:
+                params, errors = validate_params(self.template.params_schema, params)
+                if errors:
+                    await self.send_error("invalid_params", "Invalid params", run_id=run_id, errors=errors)
+                    return
+                job = (run_template, self.template, self.api_key, params, mode, self.conn)
+
+            estimate = estimate_render(None if self.is_custom else self.template, params, mode)
+            scheduler = self.custom_scheduler if self.is_custom else self.scheduler
+            self.rate_limiter.check(self.key_id)
+            await self.send({
+                "type": "status", "state": "queued", "run_id": run_id,
+                "estimated_wait": round(scheduler.estimated_wait(self.key_id, estimate.seconds), 1),
+                "estimated_seconds": round(estimate.seconds, 1),
+            })
+            async with scheduler.slot(self.key_id, estimate):
+                await self.send({"type": "status", "state": "rendering", "run_id": run_id})
+                if job is None:
+                    render_func = await self.load_render_function(code, version)
+                    job = (run_custom_code, code, self.api_key, params, mode, render_func, self.conn)
+                # A disconnect cancels this task, but not the render: the
+                # slot is held until the job finishes
+                result = await run_job(*job)
+            await self.send({"type": "result", "run_id": run_id, "version": version, **result})
+        except RateLimitExceeded as e:
+            await self.send_error("rate_limited", e.message, run_id=run_id, retry_after=e.retry_after)
+        except UpstreamUnavailable as e:
+            await self.send_error(e.code, e.message, run_id=run_id, retry_after=e.retry_after)
+        except TemplateExecutionError as e:
+            await self.send_error(e.code, e.message, e.details, run_id=run_id)
@@ -0,0 +1,94 @@
+"""Shared building blocks for template render() functions.
+
+Style objects (fonts, borders, shadows, alignments) are interned: calling a
+factory twice with the same arguments returns the same object, so a template
+that draws four labels in the same font builds that Font once per process
+rather than four times per render. Interned objects are shared between renders
+and must not be mutated. The clip factories build a fresh clip and asset on
+every call, since those carry user text and ids.
+
+The layout compiler (backend.layout) and the code generated from layouts
+(backend.layout_source) both build through this module.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from videodb.editor import (
+    Clip, VideoAsset, TextAsset, Font, Border, Shadow, Alignment, Offset,
+    Position, HorizontalAlignment, VerticalAlignment
+)
+
+# Style objects shared between renders; never mutated once built
+INTERNED_TYPES = (Font, Border, Shadow, Alignment)
+MAX_INTERNED = 1024
+
+
+@lru_cache(maxsize=MAX_INTERNED)
+def _interned(cls, key):
+    return cls(**{name: value for name, _, value in key})
+
+
+def intern(cls, **fields):
+    """cls(**fields), shared with earlier calls for the same style values.
+
+    Only INTERNED_TYPES are shared; anything else, or fields with an
+    unhashable value, is built fresh.
+    """
+    if cls not in INTERNED_TYPES:
+        return cls(**fields)
+    # Typed, so 40 and 40.0 stay apart
+    key = tuple(sorted((name, type(value), value) for name, value in fields.items()))
+    try:
+        return _interned(cls, key)
+    except TypeError:  # an unhashable value, e.g. a list
+        return cls(**fields)
+
+
+def font(family="Clear Sans", size=48, color="#FFFFFF", opacity=1.0) -> Font:
+    return intern(Font, family=family, size=size, color=color, opacity=opacity)
+
+
+def border(color="#000000", width=0.0) -> Border:
+    return intern(Border, color=color, width=width)
+
+
+def shadow(color="#000000", x=0.0, y=0.0) -> Shadow:
+    return intern(Shadow, color=color, x=x, y=y)
+
+
+def alignment(horizontal=HorizontalAlignment.center, vertical=VerticalAlignment.center) -> Alignment:
+    return intern(Alignment, horizontal=horizontal, vertical=vertical)
+
+
+def video_clip(video_id, duration, start=0, volume=1, **fields) -> Clip:
+    """A clip of video_id; fields are further Clip fields (scale, position, fit, ...)"""
+    return Clip(asset=VideoAsset(id=video_id, start=start, volume=volume), duration=duration, **fields)
+
+
+def text_clip(text, duration, font=None, border=None, shadow=None, background=None, alignment=None,
+              **fields) -> Clip:
+    """A clip of text; fields are further Clip fields (position, offset, ...)"""
+    asset = TextAsset(text=text, font=font, border=border, shadow=shadow, background=background,
+                      alignment=alignment)
+    return Clip(asset=asset, duration=duration, **fields)
+
+
+Quadrant = namedtuple("Quadrant", ["position", "alignment", "offset"])
+
+
+def grid_2x2(inset=0.0):
+    """The four quadrants of a 2x2 grid, in reading order.
+
+    Each quadrant carries the clip position, a text alignment hugging its outer
+    corner, and an offset nudging content `inset` inwards from that corner.
+    """
+    quadrants = []
+    # 0 - inset rather than -inset, so no inset doesn't become -0.0
+    for vertical, y in ((VerticalAlignment.top, inset), (VerticalAlignment.bottom, 0 - inset)):
+        for horizontal, x in ((HorizontalAlignment.left, inset), (HorizontalAlignment.right, 0 - inset)):
+            quadrants.append(Quadrant(
+                position=Position(f"{vertical.value}_{horizontal.value}"),
+                alignment=alignment(horizontal, vertical),
+                offset=Offset(x=x, y=y),
+            ))
+    return quadrants
@@ -0,0 +1,85 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend import executor
+from backend.asset_cache import MISSING, AssetMetadataCache
+from backend.concurrency import limiter
+from backend.ledger import UPLOAD_LEDGER
+
+
+class NotFound(Exception):
+    def __str__(self):
+        return "404 not found"
+
+
+class Collection:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.searched = 0
+
+    def get_video(self, asset_id):
+        self.searched += 1
+        time.sleep(self.delay)
+        raise NotFound()
+
+
+class Connection:
+    def __init__(self, collections):
+        self.collections = collections
+
+    def get_collections(self):
+        return self.collections
+
+
+def test_an_asset_in_no_collection_is_missing_and_leaves_the_ledger(monkeypatch):
+    forgotten = []
+    monkeypatch.setattr(UPLOAD_LEDGER, "forget_asset", lambda account, asset_id: forgotten.append(asset_id))
+    cache = AssetMetadataCache()
+    assert cache.lookup("acct-missing", Connection([Collection(), Collection()]), "video", "m-gone") is MISSING
+    assert forgotten == ["m-gone"]
+
+
+def test_lookup_gives_up_at_the_deadline():
+    collections = [Collection(delay=0.05) for _ in range(5)]
+    cache = AssetMetadataCache()
+    info = cache.lookup("acct-slow", Connection(collections), "video", "m-1", deadline=time.monotonic() + 0.08)
+    assert info is None
+    assert sum(collection.searched for collection in collections) < 5
+
+
+def test_lookup_stops_queueing_for_a_call_slot_at_the_deadline():
+    slots = limiter("collections")
+    taken = 0
+    while slots.try_acquire():
+        taken += 1
+    try:
+        started = time.monotonic()
+        info = AssetMetadataCache().lookup("acct-queued", Connection([Collection()]), "video", "m-1",
+                                           deadline=started + 0.1)
+        assert info is None
+        assert time.monotonic() - started < 1
+    finally:
+        for _ in range(taken):
+            slots.release()
+
+
+class SlowConnection(Connection):
+    def get_collections(self):
+        time.sleep(2)
+        return self.collections
+
+
+def test_a_render_whose_lookups_use_up_its_timeout_is_not_started(monkeypatch):
+    rendered = []
+    monkeypatch.setattr(executor, "ASSET_LOOKUP_BUDGET", 1)
+    monkeypatch.setattr(executor, "RENDER_TIMEOUT", 2)
+    monkeypatch.setattr(executor, "load_render_function", lambda template: lambda conn, params: rendered.append(1))
+    template = SimpleNamespace(template_id="slow-lookup", layout=None,
+                               params_schema=[{"name": "video_id", "type": "video_asset_id"}])
+    monkeypatch.setattr(executor.TIMELINE_CACHE, "lookup", lambda template, params: None)
+
+    with pytest.raises(executor.TimeoutError):
+        executor.run_template(template, "key-slow-lookup", {"video_id": "m-1"}, conn=SlowConnection([]))
+    assert rendered == []
@@ -0,0 +1,33 @@
+import json
+
+from backend import executor
+from backend.batch import keyed_rows, render_row
+
+
+class Template:
+    params_schema = [{"name": "text", "type": "text", "required": True}]
+
+
+def test_rows_are_keyed_by_params_not_position(tmp_path):
+    rows = tmp_path / "rows.jsonl"
+    rows.write_text("\n".join(json.dumps(row) for row in [{"text": "a"}, {"text": "b"}, {"text": "a"}]))
+    keys = [key for _, key, _, _ in keyed_rows(rows, Template.params_schema)]
+
+    rows.write_text("\n".join(json.dumps(row) for row in [{"text": "new"}, {"text": "a"}, {"text": "b"}, {"text": "a"}]))
+    moved = [key for _, key, _, _ in keyed_rows(rows, Template.params_schema)]
+    assert len(set(keys)) == 3
+    assert moved[1:] == keys
+
+
+def test_timed_out_renders_are_retried(monkeypatch):
+    attempts = []
+
+    def run_template(template, api_key, params, mode):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise executor.TimeoutError()
+        return {"stream_url": "https://stream.example/s.m3u8", "player_url": None}
+
+    monkeypatch.setattr(executor, "run_template", run_template)
+    result = render_row(Template(), "key", 1, "k:0", {"text": "a"}, None, "final", retries=2)
+    assert result["status"] == "ok" and result["attempts"] == 2
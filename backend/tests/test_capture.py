@@ -0,0 +1,29 @@
+import json
+
+from backend.capture import STRING_SHAPE, CaptureWriter, shape
+from backend.meme_bank import get_meme_bank
+
+
+def test_only_known_vocabulary_values_are_kept():
+    meme_id = get_meme_bank().sources[0]["id"]
+    shaped = shape({"meme_id": meme_id, "media_type": "video", "mode": "my secret caption", "limit": "20"})
+    assert shaped == {"meme_id": meme_id, "media_type": "video", "mode": {STRING_SHAPE: 17}, "limit": "20"}
+    assert shape({"meme_id": "someone's private id"}) == {"meme_id": {STRING_SHAPE: 20}}
+
+
+def test_params_keep_only_enum_options():
+    enums = {"resolution": ["1080x1080", "1280x720"]}
+    shaped = shape({"mode": "draft", "params": {"resolution": "1280x720", "mode": "final", "text": "hi"}}, enums=enums)
+    assert shaped == {
+        "mode": "draft",
+        "params": {"resolution": "1280x720", "mode": {STRING_SHAPE: 5}, "text": {STRING_SHAPE: 2}},
+    }
+
+
+def test_writer_appends_from_its_own_thread(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    writer = CaptureWriter(str(path))
+    for i in range(3):
+        writer.write({"n": i})
+    writer.close()
+    assert [json.loads(line)["n"] for line in path.read_text().splitlines()] == [0, 1, 2]
@@ -0,0 +1,69 @@
+import threading
+
+from backend.concurrency import ADAPTIVE_BACKOFF, AdaptiveLimiter
+
+
+def test_waits_for_a_slot_and_gives_up_after_the_timeout():
+    limiter = AdaptiveLimiter("test", initial=1)
+    assert limiter.acquire(timeout=0.1)
+    assert not limiter.acquire(timeout=0.05)
+    assert limiter.snapshot()["queue_timeouts"] == 1
+
+    threading.Timer(0.05, limiter.release).start()
+    assert limiter.acquire(timeout=1.0)
+
+
+def test_backs_off_when_upstream_is_overloaded():
+    limiter = AdaptiveLimiter("test", initial=10)
+    limiter.enter()
+    limiter.release(1.0, overloaded=True)
+    assert limiter.limit == 10 * ADAPTIVE_BACKOFF
+
+
+def test_backs_off_when_latency_climbs():
+    limiter = AdaptiveLimiter("test", initial=10)
+    for _ in range(20):
+        limiter.enter()
+        limiter.release(1.0)
+    limit = limiter.limit
+    for _ in range(5):
+        limiter.enter()
+        limiter.release(10.0)
+    assert limiter.limit < limit
+
+
+def test_grows_only_while_the_limit_is_in_use():
+    limiter = AdaptiveLimiter("test", initial=4)
+    limiter.enter()
+    limiter.release(1.0)
+    assert limiter.limit == 4
+
+    for _ in range(3):
+        limiter.enter()
+    limiter.release(1.0)
+    assert limiter.limit > 4
+
+
+def test_enter_never_waits():
+    limiter = AdaptiveLimiter("test", initial=1)
+    limiter.enter()
+    limiter.enter()
+    assert limiter.in_flight == 2
+
+
+def test_release_without_a_signal_leaves_the_limit_alone():
+    limiter = AdaptiveLimiter("test", initial=4)
+    for _ in range(3):
+        limiter.enter()
+    limiter.release()
+    assert limiter.limit == 4
+    assert limiter.in_flight == 2
+
+
+def test_calls_without_a_usable_latency_still_let_the_limit_grow():
+    limiter = AdaptiveLimiter("test", initial=2)
+    limiter.enter()
+    limiter.enter()
+    limiter.release(completed=True)
+    assert limiter.limit > 2
+    assert limiter.short_latency is None
@@ -0,0 +1,50 @@
+import time
+
+from backend.concurrency import AdaptiveLimiter
+from backend.hedging import Hedger
+
+
+def warmed_up(ratio: float) -> Hedger:
+    hedger = Hedger(percentile=0.5, min_delay=0.0, budget=1.0, min_samples=3)
+    hedger.ratios.extend([ratio] * 3)
+    return hedger
+
+
+def test_threshold_scales_with_the_submissions_estimate():
+    hedger = warmed_up(2.0)
+    assert hedger.threshold(expected=0.5) == 1.0
+    assert hedger.threshold(expected=30.0) == 60.0
+
+
+def test_hedge_takes_a_limiter_slot_until_it_finishes():
+    hedger = warmed_up(1.0)
+    slots = AdaptiveLimiter("test", initial=2)
+    calls = []
+
+    def submit():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.3)  # the primary is slow
+            return "primary"
+        time.sleep(0.1)
+        return "hedge"
+
+    assert hedger.call(submit, expected=0.05, slots=slots) == "hedge"
+    assert hedger.hedge_wins == 1
+    time.sleep(0.05)
+    assert slots.in_flight == 0
+
+
+def test_no_hedge_without_a_free_slot():
+    hedger = warmed_up(1.0)
+    slots = AdaptiveLimiter("test", initial=1)
+    slots.enter()  # the primary's own slot
+    calls = []
+
+    def submit():
+        calls.append(1)
+        time.sleep(0.1)
+        return "primary"
+
+    assert hedger.call(submit, expected=0.01, slots=slots) == "primary"
+    assert len(calls) == 1 and hedger.no_capacity == 1
@@ -0,0 +1,70 @@
+import pytest
+from videodb.editor import Font, Position
+
+from backend.layout import LayoutError, compile_layout
+from backend.template_runtime import font, grid_2x2, intern
+
+LAYOUT = {
+    "tracks": [{"clips": [{
+        "duration": 5,
+        "asset": {
+            "type": "text",
+            "text": {"param": "caption"},
+            "font": {"family": "Arial", "size": {"param": "size"}, "color": "#FFFFFF"},
+        },
+    }]}],
+}
+
+GRID = {
+    "tracks": [{"clips": [{
+        "grid": "2x2",
+        "inset": 0.02,
+        "cells": ["a", "b", "c", {"param": "caption"}],
+        "clip": {
+            "duration": 5,
+            "position": {"quadrant": "position"},
+            "offset": {"quadrant": "offset"},
+            "asset": {"type": "text", "text": {"quadrant": "cell"}, "alignment": {"quadrant": "alignment"}},
+        },
+    }]}],
+}
+
+
+def build(params):
+    timeline = compile_layout(LAYOUT, ["caption", "size"]).build(None, params)
+    return timeline.tracks[0].clips[0].clip
+
+
+def test_style_objects_are_shared_but_clips_and_assets_are_not():
+    first = build({"caption": "hello", "size": 40})
+    second = build({"caption": "hello", "size": 40})
+    assert first.asset.font is second.asset.font
+    assert first is not second and first.asset is not second.asset
+
+
+def test_equal_numbers_of_different_types_are_interned_apart():
+    assert font(size=40) is font(size=40)
+    assert type(font(size=40.0).size) is float
+
+
+def test_unhashable_values_are_built_without_interning():
+    assert intern(Font, family=["Arial"]).family == ["Arial"]
+
+
+def test_grid_repeats_its_clip_in_each_quadrant():
+    timeline = compile_layout(GRID, ["caption"]).build(None, {"caption": "d"})
+    clips = [track_clip.clip for track_clip in timeline.tracks[0].clips]
+    quadrants = grid_2x2(inset=0.02)
+    assert [clip.asset.text for clip in clips] == ["a", "b", "c", "d"]
+    assert [clip.position for clip in clips] == [Position.top_left, Position.top_right,
+                                                 Position.bottom_left, Position.bottom_right]
+    assert [clip.asset.alignment for clip in clips] == [quadrant.alignment for quadrant in quadrants]
+    assert [(clip.offset.x, clip.offset.y) for clip in clips] == [(0.02, 0.02), (-0.02, 0.02),
+                                                                  (0.02, -0.02), (-0.02, -0.02)]
+
+
+def test_quadrant_references_outside_a_grid_are_rejected():
+    layout = {"tracks": [{"clips": [{"duration": 5, "position": {"quadrant": "position"},
+                                     "asset": {"type": "text", "text": "x"}}]}]}
+    with pytest.raises(LayoutError):
+        compile_layout(layout)
@@ -0,0 +1,49 @@
+from backend.demo_renders import demo_params
+from backend.layout_source import layout_source
+from backend.registry import get_registry
+from backend.validator import validate_params
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.posted = []
+
+    def post(self, path, data=None, **kwargs):
+        self.posted.append(data)
+        return {"stream_url": "https://stream.example/test.m3u8"}
+
+
+def rendered(render, params):
+    conn = RecordingConnection()
+    result = render(conn, params)
+    return conn.posted, result["metadata"]
+
+
+def layout_templates():
+    return [template for template in get_registry().values() if template.layout]
+
+
+def test_generated_code_renders_the_same_timeline_as_the_layout():
+    for template in layout_templates():
+        namespace = {}
+        exec(compile(layout_source(template), template.template_id, "exec"), namespace)
+        params, _ = demo_params(template)
+        assert rendered(namespace["render"], params) == rendered(template.compiled_layout().render, params)
+
+
+def test_template_files_match_their_layouts():
+    for template in layout_templates():
+        assert template.code_path.read_text(encoding="utf-8") == layout_source(template), (
+            f"{template.code_path.name} is stale; run python -m backend.layout_source --write")
+        assert template.read_code() == layout_source(template)
+
+
+def test_generated_code_falls_back_to_schema_defaults():
+    for template in layout_templates():
+        namespace = {}
+        exec(compile(layout_source(template), template.template_id, "exec"), namespace)
+        required = {field["name"]: f"{field['name']}-value" for field in template.params_schema
+                    if field.get("default") is None}
+        params, errors = validate_params(template.params_schema, required)
+        assert not errors
+        assert rendered(namespace["render"], required) == rendered(template.compiled_layout().render, params)
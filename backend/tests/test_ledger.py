@@ -0,0 +1,152 @@
+import threading
+import time
+
+import pytest
+
+from backend.ledger import UploadLedger, normalize_url
+
+
+def test_normalize_url_drops_tracking_params_and_default_ports():
+    assert normalize_url("HTTPS://Example.com:443/a.mp4?utm_source=x&b=2&a=1") == "https://example.com/a.mp4?a=1&b=2"
+
+
+def test_second_upload_is_deduplicated(tmp_path):
+    ledger = UploadLedger(tmp_path / "ledger.json")
+    calls = []
+
+    def upload():
+        calls.append(1)
+        return {"asset_id": f"m-{len(calls)}", "name": "clip"}
+
+    record, deduplicated = ledger.upload("k", upload)
+    assert not deduplicated and record["asset_id"] == "m-1"
+    record, deduplicated = ledger.upload("k", upload)
+    assert deduplicated and record["asset_id"] == "m-1"
+    assert len(calls) == 1
+
+
+def test_force_uploads_again(tmp_path):
+    ledger = UploadLedger(tmp_path / "ledger.json")
+    ledger.upload("k", lambda: {"asset_id": "m-1", "name": "clip"})
+    record, deduplicated = ledger.upload("k", lambda: {"asset_id": "m-2", "name": "clip"}, force=True)
+    assert not deduplicated and record["asset_id"] == "m-2"
+    assert ledger.get("k")["asset_id"] == "m-2"
+
+
+def test_concurrent_identical_uploads_share_one(tmp_path):
+    ledger = UploadLedger(tmp_path / "ledger.json")
+    calls = []
+
+    def upload():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"asset_id": "m-1", "name": "clip"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ledger.upload("k", upload))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(deduplicated for _, deduplicated in results) == [False, True, True, True]
+
+
+def test_failed_uploads_are_not_recorded(tmp_path):
+    ledger = UploadLedger(tmp_path / "ledger.json")
+
+    def failing():
+        raise RuntimeError("upload failed")
+
+    with pytest.raises(RuntimeError):
+        ledger.upload("k", failing)
+    assert ledger.get("k") is None
+
+
+def test_entries_survive_a_restart_until_forgotten(tmp_path):
+    path = tmp_path / "ledger.json"
+    UploadLedger(path).upload("k", lambda: {"asset_id": "m-1", "name": "clip"})
+    ledger = UploadLedger(path)
+    assert ledger.get("k")["asset_id"] == "m-1"
+
+    ledger.forget("k")
+    assert UploadLedger(path).get("k") is None
+
+
+def test_forget_asset_drops_only_that_accounts_entries(tmp_path):
+    path = tmp_path / "ledger.json"
+    ledger = UploadLedger(path)
+    ledger.upload("acct:video:a", lambda: {"asset_id": "m-1", "name": "clip"})
+    ledger.upload("other:video:a", lambda: {"asset_id": "m-1", "name": "clip"})
+    ledger.upload("acct:video:b", lambda: {"asset_id": "m-2", "name": "clip"})
+
+    ledger.forget_asset("acct", "m-1")
+    reloaded = UploadLedger(path)
+    assert reloaded.get("acct:video:a") is None
+    assert reloaded.get("other:video:a")["asset_id"] == "m-1"
+    assert reloaded.get("acct:video:b")["asset_id"] == "m-2"
+
+
+def test_uploads_append_and_the_log_is_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr("backend.ledger.LEDGER_COMPACT_MIN_LINES", 4)
+    path = tmp_path / "ledger.json"
+    ledger = UploadLedger(path)
+    for i in range(4):
+        ledger.upload("k", lambda i=i: {"asset_id": f"m-{i}", "name": "clip"}, force=True)
+    assert len(path.read_text().splitlines()) == 4
+
+    ledger.upload("k", lambda: {"asset_id": "m-4", "name": "clip"}, force=True)
+    assert len(path.read_text().splitlines()) == 1
+    assert UploadLedger(path).get("k")["asset_id"] == "m-4"
+
+
+def test_oldest_entries_go_over_the_cap(tmp_path):
+    path = tmp_path / "ledger.json"
+    ledger = UploadLedger(path, max_entries=2)
+    for key in ("a", "b", "c"):
+        ledger.upload(key, lambda: {"asset_id": "m-1", "name": "clip"})
+    assert ledger.get("a") is None and ledger.get("c") is not None
+    assert UploadLedger(path, max_entries=2).get("a") is None
+
+
+def test_reads_a_whole_file_snapshot(tmp_path):
+    path = tmp_path / "ledger.json"
+    path.write_text('{"k": {"asset_id": "m-1", "name": "clip", "uploaded_at": 1}}')
+    assert UploadLedger(path).get("k")["asset_id"] == "m-1"
+
+
+def test_processes_sharing_the_file_see_each_others_uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr("backend.ledger.LEDGER_COMPACT_MIN_LINES", 4)
+    path = tmp_path / "ledger.json"
+    first, second = UploadLedger(path), UploadLedger(path)
+    first.upload("a", lambda: {"asset_id": "m-a", "name": "clip"})
+    second.upload("b", lambda: {"asset_id": "m-b", "name": "clip"})
+    # Enough rewrites of one entry that the first ledger compacts the file
+    for i in range(4):
+        first.upload("a", lambda i=i: {"asset_id": f"m-a{i}", "name": "clip"}, force=True)
+    assert len(path.read_text().splitlines()) < 6
+
+    second.upload("c", lambda: {"asset_id": "m-c", "name": "clip"})
+    record, deduplicated = second.upload("a", lambda: pytest.fail("uploaded again"))
+    assert deduplicated and record["asset_id"] == "m-a3"
+    reloaded = UploadLedger(path)
+    assert [reloaded.get(key)["asset_id"] for key in "abc"] == ["m-a3", "m-b", "m-c"]
+
+
+def test_concurrent_writers_lose_no_appends_across_compactions(tmp_path, monkeypatch):
+    monkeypatch.setattr("backend.ledger.LEDGER_COMPACT_MIN_LINES", 4)
+    path = tmp_path / "ledger.json"
+    ledgers = [UploadLedger(path) for _ in range(3)]
+
+    def write(n, ledger):
+        for i in range(30):
+            ledger.upload(f"{n}-{i}", lambda: {"asset_id": f"m-{n}-{i}", "name": "clip"})
+            ledger.forget(f"{n}-{i - 1}")
+
+    threads = [threading.Thread(target=write, args=(n, ledger)) for n, ledger in enumerate(ledgers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    reloaded = UploadLedger(path)
+    assert sorted(reloaded._entries) == ["0-29", "1-29", "2-29"]
@@ -0,0 +1,30 @@
+import time
+
+from backend.negative_cache import NegativeCache
+
+
+def test_entries_fail_fast_until_they_expire():
+    cache = NegativeCache(ttl=0.05)
+    cache.add("key")
+    assert "key" in cache
+    assert not cache.admit("key")
+    time.sleep(0.06)
+    assert "key" not in cache
+    assert cache.admit("key")
+
+
+def test_one_probe_per_interval_is_let_through():
+    cache = NegativeCache(ttl=60, probe_seconds=0.05)
+    cache.add("key")
+    assert not cache.admit("key")
+    time.sleep(0.06)
+    assert cache.admit("key")
+    assert not cache.admit("key")  # only one probe in flight per interval
+
+
+def test_a_successful_probe_clears_the_entry():
+    cache = NegativeCache(ttl=60, probe_seconds=0)
+    cache.add("key")
+    assert cache.admit("key")
+    cache.invalidate("key")
+    assert "key" not in cache
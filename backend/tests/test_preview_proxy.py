@@ -0,0 +1,151 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import app as app_module
+from backend import preview_proxy
+from backend.preview_proxy import PreviewCache, decode_token, encode_token
+
+MANIFEST = b"""#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-KEY:METHOD=AES-128,URI="key.bin"
+#EXTINF:4.0,
+seg0.ts
+#EXTINF:4.0,
+/other/seg1.ts
+#EXT-X-ENDLIST
+"""
+SEGMENT = bytes(range(256)) * 4
+
+
+class Origin(BaseHTTPRequestHandler):
+    """Serves one playlist and fixed-size segments, counting requests per path"""
+    requests = {}
+
+    def do_GET(self):
+        Origin.requests[self.path] = Origin.requests.get(self.path, 0) + 1
+        if self.path.endswith(".m3u8"):
+            body, content_type = MANIFEST, "application/vnd.apple.mpegurl"
+        elif self.path.startswith("/missing"):
+            self.send_error(404)
+            return
+        else:
+            body, content_type = SEGMENT, "video/mp2t"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def origin():
+    Origin.requests = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "PREVIEW_PROXY_ENABLED", True)
+    monkeypatch.setattr(preview_proxy, "_cache", PreviewCache(tmp_path))
+    return TestClient(app_module.app)
+
+
+def preview(url: str) -> str:
+    return f"{preview_proxy.PREVIEW_PROXY_PREFIX}/{encode_token(url)}"
+
+
+def test_a_manifest_is_rewritten_to_relative_tokens(origin, client):
+    response = client.get(preview(f"{origin}/video/index.m3u8"))
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "#EXTM3U"
+    key_line = next(line for line in lines if line.startswith("#EXT-X-KEY"))
+    key_token = key_line.split('URI="')[1].rstrip('"')
+    assert decode_token(key_token) == f"{origin}/video/key.bin"
+    segments = [line for line in lines if line and not line.startswith("#")]
+    assert [decode_token(token) for token in segments] == [f"{origin}/video/seg0.ts", f"{origin}/other/seg1.ts"]
+    # Bare tokens resolve next to the manifest, under the proxy prefix
+    assert all("/" not in token for token in segments)
+    segment = client.get(f"{preview_proxy.PREVIEW_PROXY_PREFIX}/{segments[0]}")
+    assert segment.content == SEGMENT
+
+
+def test_segments_are_fetched_once_and_then_served_from_the_cache(origin, client):
+    path = preview(f"{origin}/video/seg0.ts")
+    first = client.get(path)
+    second = client.get(path)
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert first.content == second.content == SEGMENT
+    assert Origin.requests["/video/seg0.ts"] == 1
+    assert preview_proxy.get_preview_cache().stats()["hits"] == 1
+
+
+def test_range_requests_get_partial_content(origin, client):
+    response = client.get(preview(f"{origin}/video/seg0.ts"), headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == SEGMENT[10:20]
+    assert response.headers["Content-Range"] == f"bytes 10-19/{len(SEGMENT)}"
+
+
+def test_manifests_are_refetched_after_their_ttl(origin, client, monkeypatch):
+    path = preview(f"{origin}/video/index.m3u8")
+    client.get(path)
+    assert client.get(path).headers["X-Cache"] == "HIT"
+    monkeypatch.setattr(preview_proxy, "PREVIEW_MANIFEST_TTL", 0)
+    assert client.get(path).headers["X-Cache"] == "MISS"
+    assert Origin.requests["/video/index.m3u8"] == 2
+    # Segments don't expire
+    segment = preview(f"{origin}/video/seg0.ts")
+    client.get(segment)
+    assert client.get(segment).headers["X-Cache"] == "HIT"
+
+
+def test_the_lru_evicts_the_least_recently_used_entries_by_size(origin, tmp_path):
+    cache = PreviewCache(tmp_path, max_bytes=len(SEGMENT) * 2 + 10)
+    a, b, c = (f"{origin}/video/{name}.ts" for name in "abc")
+
+    async def scenario():
+        await cache.get(a)
+        await cache.get(b)
+        assert (await cache.get(a))[1]
+        await cache.get(c)
+        return [(await cache.get(url))[1] for url in (a, c, b)]
+
+    assert asyncio.run(scenario()) == [True, True, False]
+    stats = cache.stats()
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert len(list(tmp_path.glob("*.body"))) == stats["entries"] == 2
+    # The order survives a restart, rebuilt from file mtimes
+    assert PreviewCache(tmp_path, max_bytes=cache.max_bytes).total_bytes == stats["bytes"]
+
+
+def test_tokens_not_issued_by_this_server_are_rejected(origin, client, monkeypatch):
+    token = encode_token(f"{origin}/video/seg0.ts")
+    encoded, _, signature = token.partition(".")
+    forged = encode_token(f"{origin}/video/other.ts").partition(".")[0] + "." + signature
+    for bad in (forged, encoded, "not-a-token", encoded + ".AAAA"):
+        response = client.get(f"{preview_proxy.PREVIEW_PROXY_PREFIX}/{bad}")
+        assert response.status_code == 404
+        assert response.json()["error"]["code"] == "preview_not_found"
+    # Tokens signed by an earlier process (another secret) no longer validate
+    monkeypatch.setattr(preview_proxy, "PREVIEW_PROXY_SECRET", "rotated")
+    assert client.get(f"{preview_proxy.PREVIEW_PROXY_PREFIX}/{token}").status_code == 404
+    assert Origin.requests == {}
+
+
+def test_origin_errors_are_reported(origin, client):
+    response = client.get(preview(f"{origin}/missing.ts"))
+    assert response.status_code == 404
+    assert response.json()["error"]["code"] == "preview_not_found"
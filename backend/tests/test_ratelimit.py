@@ -0,0 +1,196 @@
+import asyncio
+import threading
+from concurrent import futures
+
+import pytest
+
+from backend.concurrency import AdaptiveLimiter
+from backend.ratelimit import FairScheduler, RateLimitExceeded, run_job
+
+
+class Estimate:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.observed = []
+        self.at_least = []
+
+    def observe(self, elapsed: float):
+        self.observed.append(elapsed)
+
+    def observe_at_least(self, elapsed: float):
+        self.at_least.append(elapsed)
+
+
+class Timeout(Exception):
+    """Like executor.TimeoutError: carries the worker that is still running"""
+    code = "timeout_error"
+
+    def __init__(self, pending):
+        super().__init__("timed out")
+        self.pending = pending
+
+
+def test_runs_immediately_while_slots_are_free():
+    async def scenario():
+        scheduler = FairScheduler(slots=2)
+        first = await scheduler.acquire("a")
+        second = await scheduler.acquire("b")
+        assert scheduler.active == 2 and scheduler.queued == 0
+        scheduler.release(first)
+        scheduler.release(second)
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_quick_renders_start_first():
+    async def scenario():
+        scheduler = FairScheduler(slots=1)
+        ticket = await scheduler.acquire("a")
+        started = []
+
+        async def job(key_id, cost):
+            await scheduler.acquire(key_id, cost=cost)
+            started.append(key_id)
+
+        tasks = [asyncio.create_task(job("slow", 60.0)), asyncio.create_task(job("quick", 2.0))]
+        await asyncio.sleep(0)
+        assert scheduler.queued == 2
+        scheduler.release(ticket)
+        await asyncio.sleep(0)
+        assert started == ["quick"]
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        assert started == ["quick", "slow"]
+
+    asyncio.run(scenario())
+
+
+def test_rejects_when_a_key_queues_too_much():
+    async def scenario():
+        scheduler = FairScheduler(slots=1, max_queue_per_key=1)
+        await scheduler.acquire("a")
+        waiting = asyncio.create_task(scheduler.acquire("a"))
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimitExceeded):
+            await scheduler.acquire("a")
+        # Other keys still get in line
+        other = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        assert scheduler.queued == 2
+        waiting.cancel()
+        other.cancel()
+        await asyncio.gather(waiting, other, return_exceptions=True)
+        assert scheduler.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_slots_follow_the_limiter():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=1)
+        scheduler = FairScheduler(limiter=limiter)
+        ticket = await scheduler.acquire("a")
+        waiting = [asyncio.create_task(scheduler.acquire(key)) for key in ("b", "c")]
+        await asyncio.sleep(0)
+        assert scheduler.queued == 2
+
+        limiter.limit = 3
+        scheduler.release(ticket)
+        await asyncio.sleep(0)
+        assert all(task.done() for task in waiting)
+        assert scheduler.active == 2
+
+    asyncio.run(scenario())
+
+
+def test_slot_is_held_until_a_timed_out_worker_finishes():
+    async def scenario():
+        scheduler = FairScheduler(slots=1)
+        worker = futures.Future()
+        estimate = Estimate(5.0)
+        with pytest.raises(Timeout):
+            async with scheduler.slot("a", estimate):
+                raise Timeout(worker)
+        assert scheduler.active == 1
+        # The time until the timeout is a lower bound on the render's duration
+        assert len(estimate.at_least) == 1 and not estimate.observed
+
+        worker.set_result(None)
+        await asyncio.sleep(0)
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_successful_renders_feed_the_estimate():
+    async def scenario():
+        scheduler = FairScheduler(slots=1)
+        estimate = Estimate(5.0)
+        async with scheduler.slot("a", estimate):
+            pass
+        assert len(estimate.observed) == 1
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_slot_is_held_until_a_cancelled_callers_job_finishes():
+    async def scenario():
+        scheduler = FairScheduler(slots=1)
+        release_job = threading.Event()
+        started = threading.Event()
+
+        def render():
+            started.set()
+            release_job.wait(5)
+
+        async def session():
+            async with scheduler.slot("a", Estimate(5.0)):
+                await run_job(render)
+
+        task = asyncio.create_task(session())
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        # The client went away; its render can't be stopped
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert scheduler.active == 1
+
+        release_job.set()
+        for _ in range(100):
+            if scheduler.active == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_a_cancelled_callers_job_that_times_out_holds_the_slot_for_its_worker():
+    async def scenario():
+        scheduler = FairScheduler(slots=1)
+        worker = futures.Future()
+        release_job = threading.Event()
+
+        def render():
+            release_job.wait(5)
+            raise Timeout(worker)
+
+        async def session():
+            async with scheduler.slot("a", Estimate(5.0)):
+                await run_job(render)
+
+        task = asyncio.create_task(session())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        release_job.set()
+        await asyncio.sleep(0.1)
+        assert scheduler.active == 1
+
+        worker.set_result(None)
+        await asyncio.sleep(0.01)
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,39 @@
+import json
+import threading
+
+from backend.registry import REGISTRY_PATH, TemplateDef, TemplateRegistry
+
+
+def test_concurrent_first_spec_access_reads_it_once():
+    items = json.loads(REGISTRY_PATH.read_text(encoding="utf-8"))["templates"]
+    for item in items:
+        template = TemplateDef(dict(item))
+        start = threading.Barrier(8)
+        errors = []
+
+        def read():
+            start.wait()
+            try:
+                template.params_schema
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert template.params_schema == TemplateDef(dict(item)).params_schema
+
+
+def test_difficulty_facets_use_the_keys_the_filter_accepts():
+    registry = TemplateRegistry([
+        TemplateDef({"template_id": template_id, "name": template_id, "description": "", "code_path": "x.py",
+                     "difficulty": difficulty})
+        for template_id, difficulty in (("a", "Basic"), ("b", "basic"), ("c", "Advanced"))
+    ])
+    facets = registry.filter(difficulty="ADVANCED")["facets"]["difficulty"]
+    assert facets == {"basic": 2, "advanced": 1}
+    for difficulty, count in facets.items():
+        assert len(registry.filter(difficulty=difficulty)["templates"]) == count
@@ -0,0 +1,123 @@
+import pytest
+
+from backend.timeline_cache import TimelineCache
+
+
+class Template:
+    def __init__(self, template_id: str = "caption"):
+        self.template_id = template_id
+        self.layout = {"tracks": []}
+        self.params_schema = [
+            {"name": "video_id", "type": "video_asset_id"},
+            {"name": "text", "type": "text"},
+            {"name": "size", "type": "number"},
+        ]
+
+
+def captioned(conn, params):
+    timeline = {"video": params["video_id"], "caption": params["text"], "size": params["size"]}
+    response = conn.post("editor", data={"timeline": timeline})
+    return {"stream_url": response["stream_url"], "text": params["text"]}
+
+
+PARAMS = {"video_id": "m-1", "text": "hello", "size": 40}
+
+
+def test_capture_then_lookup_patches_ids_and_text():
+    cache = TimelineCache()
+    template = Template()
+    description, result = cache.capture(template, captioned, PARAMS)
+    assert description == {"timeline": {"video": "m-1", "caption": "hello", "size": 40}}
+    assert result["text"] == "hello"
+
+    description, result = cache.lookup(template, {**PARAMS, "video_id": "m-2", "text": "bye"})
+    assert description == {"timeline": {"video": "m-2", "caption": "bye", "size": 40}}
+    assert result["text"] == "bye"
+
+
+def test_layout_params_are_part_of_the_key():
+    cache = TimelineCache()
+    template = Template()
+    cache.capture(template, captioned, PARAMS)
+    assert cache.lookup(template, {**PARAMS, "size": 48}) is None
+
+
+def test_templates_that_transform_text_are_not_cached():
+    def shouting(conn, params):
+        return captioned(conn, {**params, "text": params["text"].upper()})
+
+    cache = TimelineCache()
+    template = Template()
+    assert cache.capture(template, shouting, PARAMS) is None
+    assert cache.capture(template, captioned, PARAMS) is None  # remembered until the template changes
+
+
+def test_templates_that_make_other_calls_are_not_cached():
+    def looks_up_collection(conn, params):
+        conn.get_collection()
+        return captioned(conn, params)
+
+    cache = TimelineCache()
+    assert cache.capture(Template(), looks_up_collection, PARAMS) is None
+
+
+def test_render_errors_propagate_without_disabling_the_cache():
+    calls = []
+
+    def flaky(conn, params):
+        calls.append(params)
+        if len(calls) == 1:
+            raise ValueError("bad input")
+        return captioned(conn, params)
+
+    cache = TimelineCache()
+    template = Template()
+    with pytest.raises(ValueError):
+        cache.capture(template, flaky, PARAMS)
+    assert cache.capture(template, flaky, PARAMS) is not None
+
+
+def test_timeouts_during_capture_propagate():
+    class Timeout(Exception):
+        code = "timeout_error"
+
+    def slow_for_placeholders(conn, params):
+        if "\ufff0" in params["text"]:  # the placeholder run
+            raise Timeout()
+        return captioned(conn, params)
+
+    cache = TimelineCache()
+    template = Template()
+    with pytest.raises(Timeout):
+        cache.capture(template, slow_for_placeholders, PARAMS)
+    assert cache.capture(template, captioned, PARAMS) is not None
+
+
+def test_code_templates_are_only_cached_when_they_opt_in(tmp_path):
+    code_path = tmp_path / "caption.py"
+    code_path.write_text("def render(conn, params): ...")
+    template = Template()
+    template.layout = None
+    template.code_path = code_path
+
+    cache = TimelineCache()
+    assert cache.capture(template, captioned, PARAMS) is None
+    template.cache_timeline = True
+    assert cache.capture(template, captioned, PARAMS) is not None
+    assert cache.lookup(template, PARAMS) is not None
+
+
+def test_submit_timeline_posts_the_prebuilt_description():
+    from backend.timeline_cache import _STREAM_PLACEHOLDER, submit_timeline
+
+    posted = []
+
+    class Connection:
+        def post(self, path, data=None, **kwargs):
+            posted.append(data)
+            return {"stream_url": "https://stream.example/s.m3u8"}
+
+    description = {"timeline": {"tracks": []}}
+    result = submit_timeline(Connection(), description, {"stream_url": _STREAM_PLACEHOLDER})
+    assert posted == [description]
+    assert result == {"stream_url": "https://stream.example/s.m3u8"}
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from backend import uploads
+from backend.uploads import UploadError, append_chunk, create_session
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path)
+
+
+async def body(*chunks, delay: float = 0.0):
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+
+def test_chunks_append_at_the_current_offset():
+    session = create_session("acct", "clip.mp4", "video", size=6)
+
+    async def scenario():
+        assert await append_chunk(session, 0, body(b"abc")) == 3
+        with pytest.raises(UploadError) as raised:
+            await append_chunk(session, 0, body(b"abc"))
+        assert raised.value.code == "offset_mismatch" and raised.value.offset == 3
+        return await append_chunk(session, 3, body(b"d", b"ef"))
+
+    assert asyncio.run(scenario()) == 6
+    assert session.part_path.read_bytes() == b"abcdef"
+
+
+def test_oversized_chunks_are_dropped():
+    session = create_session("acct", "clip.mp4", "video", size=4)
+
+    async def scenario():
+        await append_chunk(session, 0, body(b"ab"))
+        with pytest.raises(UploadError) as raised:
+            await append_chunk(session, 2, body(b"cd", b"ef"))
+        assert raised.value.code == "upload_too_large"
+
+    asyncio.run(scenario())
+    assert session.part_path.read_bytes() == b"ab"
+
+
+def test_concurrent_chunks_for_one_session_are_not_interleaved():
+    session = create_session("acct", "clip.mp4", "video")
+
+    async def scenario():
+        return await asyncio.gather(
+            append_chunk(session, 0, body(b"aa", b"aa", delay=0.01)),
+            append_chunk(session, 0, body(b"bb", b"bb", delay=0.01)),
+            return_exceptions=True,
+        )
+
+    first, second = asyncio.run(scenario())
+    assert first == 4
+    assert isinstance(second, UploadError) and second.code == "offset_mismatch"
+    assert session.part_path.read_bytes() == b"aaaa"
+
+
+def test_a_part_file_locked_by_another_worker_is_refused():
+    fcntl = pytest.importorskip("fcntl")
+    session = create_session("acct", "clip.mp4", "video")
+    with open(session.part_path, "r+b") as other_worker:
+        fcntl.flock(other_worker, fcntl.LOCK_EX)
+        with pytest.raises(UploadError) as raised:
+            asyncio.run(append_chunk(session, 0, body(b"ab")))
+    assert raised.value.code == "upload_in_progress" and raised.value.status_code == 409
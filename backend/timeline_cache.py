@@ -0,0 +1,203 @@
+"""Cache of serialized timeline descriptions per template layout.
+
+The first render of a template for a given set of layout params (everything
+except asset ids and text) runs the builder against a capturing connection
+with placeholder values for the asset and text params. The captured timeline
+JSON is stored, and later renders with the same layout params only substitute
+the real ids and text into a copy before submitting it, without running the
+builder again.
+
+Only layout templates are cached by default: their builder is generated from
+the layout, so its output depends on nothing but the params. Code templates
+can do anything between two renders and must opt in with `"cache_timeline":
+true` in their registry entry. Templates whose output can't be reproduced by
+substitution (e.g. they transform the text, or make other API calls while
+building) are detected on the first render and always run their builder.
+"""
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+PATCHABLE_TYPES = {"video_asset_id", "image_asset_id", "audio_asset_id", "text"}
+MAX_ENTRIES = 512
+
+_STREAM_PLACEHOLDER = "\ufff0stream_url\ufff1"
+_PLAYER_PLACEHOLDER = "\ufff0player_url\ufff1"
+
+
+class CaptureAborted(Exception):
+    """The template did something other than build and submit one timeline"""
+
+
+class CaptureConnection:
+    """Stands in for a VideoDB connection and records the submitted timeline"""
+
+    def __init__(self):
+        self.description = None
+
+    def post(self, path, data=None, **kwargs):
+        if self.description is not None or not isinstance(data, dict) or "timeline" not in data:
+            raise CaptureAborted(f"unexpected request to {path}")
+        self.description = data
+        return {"stream_url": _STREAM_PLACEHOLDER, "player_url": _PLAYER_PLACEHOLDER}
+
+    def __getattr__(self, name):
+        raise CaptureAborted(f"template used connection.{name}")
+
+
+def _placeholder(name: str) -> str:
+    return f"\ufff0param:{name}\ufff1"
+
+
+def _substitute(node: Any, values: Dict[str, Any]) -> Any:
+    if isinstance(node, str):
+        if "\ufff0" not in node:
+            return node
+        if node in values:
+            return values[node]
+        for placeholder, value in values.items():
+            node = node.replace(placeholder, str(value))
+        return node
+    if isinstance(node, dict):
+        return {key: _substitute(child, values) for key, child in node.items()}
+    if isinstance(node, list):
+        return [_substitute(child, values) for child in node]
+    return node
+
+
+def is_cacheable(template) -> bool:
+    """Layout templates, and code templates that opted in"""
+    return bool(template.layout) or getattr(template, "cache_timeline", False)
+
+
+def template_fingerprint(template) -> str:
+    """Changes whenever the template's layout or code changes"""
+    if template.layout:
+        source = json.dumps(template.layout, sort_keys=True)
+    else:
+        stat = template.code_path.stat()
+        source = f"{template.code_path}:{stat.st_mtime_ns}:{stat.st_size}"
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+class TimelineCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Dict[str, Any], Dict[str, Any]]]" = OrderedDict()
+        self._uncacheable = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _split_params(template, params: Dict[str, Any]):
+        patchable = {
+            field["name"] for field in template.params_schema
+            if field["type"] in PATCHABLE_TYPES and isinstance(params.get(field["name"]), str)
+        }
+        layout_params = {name: value for name, value in params.items() if name not in patchable}
+        return patchable, json.dumps(layout_params, sort_keys=True, default=str)
+
+    def _patch(self, entry, patchable, params) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        description, result = entry
+        values = {_placeholder(name): params[name] for name in patchable}
+        return _substitute(description, values), _substitute(result, values)
+
+    def lookup(self, template, params: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Return a patched (timeline description, result) for params, if cached"""
+        if not is_cacheable(template):
+            return None
+        fingerprint = template_fingerprint(template)
+        patchable, layout_key = self._split_params(template, params)
+        key = (template.template_id, fingerprint + layout_key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        return self._patch(entry, patchable, params)
+
+    def capture(self, template, render_func, params: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Run render_func offline, cache its timeline and return it patched for params.
+
+        Returns None if the template can't be served from a cached description.
+        A capture runs the builder twice, with the real params and with
+        placeholders, so the first render of each layout key builds the
+        timeline twice before it is submitted (three times if the results
+        differ and the template falls back to running its builder).
+        """
+        if not is_cacheable(template):
+            return None
+        fingerprint = template_fingerprint(template)
+        if (template.template_id, fingerprint) in self._uncacheable:
+            return None
+
+        patchable, layout_key = self._split_params(template, params)
+        placeholder_params = {**params, **{name: _placeholder(name) for name in patchable}}
+        # Errors from the real params are the render's own errors: they
+        # propagate and leave the cache as it was
+        try:
+            expected = self._run_offline(render_func, params)
+        except CaptureAborted:
+            expected = None
+        entry = None
+        if expected is not None:
+            try:
+                entry = self._run_offline(render_func, placeholder_params)
+            except Exception as e:
+                # The render's timeout (executor.TimeoutError) says nothing about the template
+                if getattr(e, "code", None) == "timeout_error":
+                    raise
+                # Builds with the real values but not the placeholders, so
+                # the template depends on what the values are
+                entry = None
+
+        patched = self._patch(entry, patchable, params) if entry else None
+        if patched is None or patched != expected:
+            with self._lock:
+                self._uncacheable.add((template.template_id, fingerprint))
+            return None
+
+        with self._lock:
+            self._entries[(template.template_id, fingerprint + layout_key)] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return patched
+
+    @staticmethod
+    def _run_offline(render_func, params):
+        conn = CaptureConnection()
+        result = render_func(conn, params)
+        if conn.description is None or not isinstance(result, dict):
+            raise CaptureAborted("template did not submit a timeline")
+        return copy.deepcopy(conn.description), copy.deepcopy(result)
+
+
+@lru_cache(maxsize=None)
+def _prebuilt_timeline_class():
+    # Deferred: the SDK is slow to import
+    from videodb.editor import Timeline
+
+    class PrebuiltTimeline(Timeline):
+        """Submits a description captured from an earlier build instead of serializing tracks"""
+
+        def __init__(self, conn, description: Dict[str, Any]):
+            super().__init__(conn)
+            self.description = description
+
+        def to_json(self) -> Dict[str, Any]:
+            return self.description
+
+    return PrebuiltTimeline
+
+
+def submit_timeline(conn, description: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    """Submit a prebuilt timeline description and fill in the template's result"""
+    timeline = _prebuilt_timeline_class()(conn, description)
+    stream_url = timeline.generate_stream()
+    return _substitute(result, {
+        _STREAM_PLACEHOLDER: stream_url,
+        _PLAYER_PLACEHOLDER: timeline.player_url,
+    })
@@ -0,0 +1,215 @@
+"""Resumable, streamed uploads of local files.
+
+An upload is a session on disk: `<id>.json` holds its metadata and `<id>.part`
+the bytes received so far, so the current offset is just the size of the part
+file and any worker can resume a session. Chunks are streamed from the request
+body straight to the part file and never held in memory as a whole.
+
+Chunks for one session are appended one at a time: within a process they wait
+for each other, and a chunk that finds the part file locked by another worker
+is refused with 409 `upload_in_progress`.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+import weakref
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+UPLOAD_DIR = Path(os.environ.get("UPLOAD_DIR", Path(tempfile.gettempdir()) / "makememes-uploads"))
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_SESSION_TTL = int(os.environ.get("UPLOAD_SESSION_TTL", "3600"))
+# POST /api/upload-from-url/bulk
+BULK_UPLOAD_MAX_ITEMS = int(os.environ.get("BULK_UPLOAD_MAX_ITEMS", "500"))
+BULK_UPLOAD_CONCURRENCY = int(os.environ.get("BULK_UPLOAD_CONCURRENCY", "4"))
+
+MEDIA_TYPES = {"video", "image", "audio"}
+
+# Held while a chunk is appended to the session, by upload id
+_SESSION_LOCKS: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+class UploadError(Exception):
+    def __init__(self, message: str, code: str = "upload_error", status_code: int = 400,
+                 offset: Optional[int] = None):
+        self.message = message
+        self.code = code
+        self.status_code = status_code
+        self.offset = offset
+        super().__init__(message)
+
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    owner: str
+    name: str
+    media_type: str
+    size: Optional[int]
+    created_at: float
+
+    @property
+    def meta_path(self) -> Path:
+        return UPLOAD_DIR / f"{self.upload_id}.json"
+
+    @property
+    def part_path(self) -> Path:
+        return UPLOAD_DIR / f"{self.upload_id}.part"
+
+    @property
+    def offset(self) -> int:
+        try:
+            return self.part_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def complete(self) -> bool:
+        return self.size is None or self.offset == self.size
+
+    def expired(self, now: float = None) -> bool:
+        return (now or time.time()) - self.created_at > UPLOAD_SESSION_TTL
+
+    def to_status(self):
+        return {
+            "upload_id": self.upload_id,
+            "name": self.name,
+            "media_type": self.media_type,
+            "size": self.size,
+            "offset": self.offset,
+            "max_size": UPLOAD_MAX_BYTES,
+        }
+
+    def discard(self):
+        self.part_path.unlink(missing_ok=True)
+        self.meta_path.unlink(missing_ok=True)
+
+
+def _sweep_expired():
+    now = time.time()
+    for meta_path in UPLOAD_DIR.glob("*.json"):
+        try:
+            session = UploadSession(**json.loads(meta_path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError):
+            continue
+        if session.expired(now):
+            session.discard()
+
+
+def create_session(owner: str, name: str, media_type: str, size: Optional[int] = None) -> UploadSession:
+    if media_type not in MEDIA_TYPES:
+        raise UploadError("Invalid media_type. Must be 'video', 'image', or 'audio'")
+    if size is not None and (size <= 0 or size > UPLOAD_MAX_BYTES):
+        raise UploadError(
+            f"File size must be between 1 and {UPLOAD_MAX_BYTES} bytes",
+            code="upload_too_large",
+            status_code=413,
+        )
+
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    _sweep_expired()
+
+    session = UploadSession(
+        upload_id=uuid.uuid4().hex,
+        owner=owner,
+        name=name,
+        media_type=media_type,
+        size=size,
+        created_at=time.time(),
+    )
+    session.part_path.touch()
+    session.meta_path.write_text(json.dumps(asdict(session)), encoding="utf-8")
+    return session
+
+
+def get_session(upload_id: str, owner: str) -> UploadSession:
+    not_found = UploadError("Upload session not found or expired", code="upload_not_found", status_code=404)
+    if not upload_id.isalnum():
+        raise not_found
+    try:
+        session = UploadSession(**json.loads((UPLOAD_DIR / f"{upload_id}.json").read_text(encoding="utf-8")))
+    except (OSError, ValueError, TypeError):
+        raise not_found
+    if session.owner != owner:
+        raise not_found
+    if session.expired():
+        session.discard()
+        raise not_found
+    return session
+
+
+def _open_part(session: UploadSession) -> BinaryIO:
+    part = open(session.part_path, "r+b")
+    if fcntl is not None:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            part.close()
+            raise UploadError("Another chunk is being uploaded to this session", code="upload_in_progress",
+                              status_code=409, offset=session.offset)
+    return part
+
+
+def _sync_part(part: BinaryIO):
+    part.flush()
+    os.fsync(part.fileno())
+
+
+async def append_chunk(session: UploadSession, offset: int, chunks: AsyncIterator[bytes],
+                       content_length: Optional[int] = None) -> int:
+    """Stream a chunk into the session at `offset`; returns the new offset"""
+    lock = _SESSION_LOCKS.get(session.upload_id)
+    if lock is None:
+        lock = _SESSION_LOCKS[session.upload_id] = asyncio.Lock()
+    async with lock:
+        part = await run_in_threadpool(_open_part, session)
+        try:
+            return await _append(session, part, offset, chunks, content_length)
+        finally:
+            # Closing the part file releases its lock
+            await run_in_threadpool(part.close)
+
+
+async def _append(session: UploadSession, part: BinaryIO, offset: int, chunks: AsyncIterator[bytes],
+                  content_length: Optional[int]) -> int:
+    current = os.fstat(part.fileno()).st_size
+    if offset != current:
+        raise UploadError(
+            f"Chunk offset {offset} does not match the uploaded size {current}",
+            code="offset_mismatch",
+            status_code=409,
+            offset=current,
+        )
+
+    limit = session.size if session.size is not None else UPLOAD_MAX_BYTES
+    if content_length is not None and current + content_length > limit:
+        raise UploadError("Upload exceeds the allowed size", code="upload_too_large", status_code=413, offset=current)
+
+    written = current
+    part.seek(current)
+    try:
+        async for chunk in chunks:
+            written += len(chunk)
+            if written > limit:
+                raise UploadError("Upload exceeds the allowed size", code="upload_too_large",
+                                  status_code=413, offset=current)
+            await run_in_threadpool(part.write, chunk)
+    except UploadError:
+        # Drop the oversized chunk so the session stays usable from `current`
+        await run_in_threadpool(part.truncate, current)
+        raise
+    # If the client disconnects mid-chunk, whatever arrived is kept and
+    # the client resumes from the offset reported by GET
+    await run_in_threadpool(_sync_part, part)
+    return written
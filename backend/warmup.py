@@ -0,0 +1,124 @@
+"""Startup warm-up, so a worker only reports ready once it can render at full speed.
+
+The VideoDB SDK, template layouts and modules, demo render hashes and the
+meme bank are all loaded lazily. warm_up() loads them up front, in the background, and records
+how long each step took; /ready reports the result.
+
+A failed step is retried every WARMUP_RETRY_SECONDS. Critical steps (the SDK
+and templates, without which nothing renders) are retried until they succeed;
+the others become a warning after WARMUP_ATTEMPTS tries, since the worker can
+serve without them and they load lazily on first use anyway.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from backend.demo_renders import DEMO_RENDERS
+from backend.executor import load_template_module
+from backend.meme_bank import get_meme_bank
+from backend.registry import get_registry
+from backend.validator import validate_params
+
+PROCESS_STARTED = time.time()
+WARMUP_ATTEMPTS = int(os.environ.get("WARMUP_ATTEMPTS", "3"))
+WARMUP_RETRY_SECONDS = float(os.environ.get("WARMUP_RETRY_SECONDS", "5"))
+
+
+class WarmupState:
+    def __init__(self):
+        self.ready = False
+        self.error = None
+        self.finished_at = None
+        self.steps: Dict[str, float] = {}
+        self.warnings = []
+        # Set on shutdown, to stop retrying
+        self.stopping = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            "ready": self.ready,
+            "steps_ms": self.steps,
+            "warnings": self.warnings,
+        }
+        if self.finished_at:
+            result["startup_ms"] = round((self.finished_at - PROCESS_STARTED) * 1000, 1)
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+WARMUP = WarmupState()
+
+
+def _import_sdk():
+    import videodb  # noqa: F401
+    import videodb.editor  # noqa: F401
+    import backend.layout  # noqa: F401
+
+
+def _load_templates():
+    for template in get_registry().values():
+        try:
+            if template.layout:
+                template.compiled_layout()
+            else:
+                load_template_module(template.code_path)
+        except Exception as e:
+            WARMUP.warnings.append(f"{template.template_id}: failed to load ({e})")
+
+
+def _check_demo_inputs():
+    for template in get_registry().values():
+        _, errors = validate_params(template.params_schema, template.demo_inputs)
+        if errors:
+            WARMUP.warnings.append(f"{template.template_id}: invalid demo_inputs ({'; '.join(errors)})")
+
+
+def _hash_demos():
+    DEMO_RENDERS.warm(get_registry().values())
+
+
+# (name, step, critical)
+STEPS = [
+    ("sdk", _import_sdk, True),
+    ("templates", _load_templates, True),
+    ("validators", _check_demo_inputs, False),
+    ("demo_hashes", _hash_demos, False),
+    ("meme_bank", get_meme_bank, False),
+]
+
+
+def _run_step(name: str, step, critical: bool) -> bool:
+    """Run step until it succeeds or may be skipped; False if shutdown interrupted it"""
+    attempt = 0
+    while True:
+        attempt += 1
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Warm-up step {name} failed (attempt {attempt}): {e}")
+            if not critical and attempt >= WARMUP_ATTEMPTS:
+                WARMUP.warnings.append(f"{name}: skipped after {attempt} failed attempts ({e})")
+                WARMUP.error = None
+                return True
+            WARMUP.error = f"{name}: {e}"
+            if WARMUP.stopping.wait(WARMUP_RETRY_SECONDS):
+                return False
+            continue
+        WARMUP.error = None
+        WARMUP.steps[name] = round((time.perf_counter() - started) * 1000, 1)
+        return True
+
+
+def warm_up():
+    for name, step, critical in STEPS:
+        if not _run_step(name, step, critical):
+            return
+
+    WARMUP.finished_at = time.time()
+    WARMUP.ready = True
+    for warning in WARMUP.warnings:
+        print(f"Warm-up warning: {warning}")
+    print(f"Warm-up finished in {sum(WARMUP.steps.values()):.0f}ms: {WARMUP.steps}")
@@ -1,11 +1,31 @@
 'use client';
 
+import { useState, useEffect } from 'react';
 import Link from 'next/link';
 import Header from '@/components/Header';
 import MemeBank from '@/components/MemeBank';
 import { apiClient } from '@/lib/api';
+import type { BootstrapData } from '@/types';
 
 export default function MemeBankPage() {
+  const [bootstrap, setBootstrap] = useState<BootstrapData | null>(null);
+  const [loading, setLoading] = useState(true);
+
+  useEffect(() => {
+    loadMemeBank();
+  }, []);
+
+  // Sources and, with a key, their availability in one request
+  const loadMemeBank = async () => {
+    try {
+      setBootstrap(await apiClient.bootstrap(['meme_bank', 'availability']));
+    } catch (error) {
+      console.error('Failed to load meme bank:', error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleApiKeyChange = (key: string) => {
     apiClient.setApiKey(key);
   };
@@ -48,7 +68,14 @@ export default function MemeBankPage() {
         </div>
 
         {/* Meme Bank Component */}
-        <MemeBank />
+        {loading ? (
+          <p className="text-gray-600">Loading meme bank...</p>
+        ) : (
+          <MemeBank
+            initialSources={bootstrap?.memeSources}
+            initialAvailability={bootstrap?.availability}
+          />
+        )}
       </main>
     </div>
   );
@@ -17,8 +17,9 @@ export default function HomePage() {
 
   const loadTemplates = async () => {
     try {
-      const data = await apiClient.listTemplates();
-      setTemplates(data);
+      // Only the public section: the grid shouldn't wait on VideoDB
+      const data = await apiClient.bootstrap(['templates']);
+      setTemplates(data.templates);
     } catch (error) {
       console.error('Failed to load templates:', error);
     } finally {
@@ -1,15 +1,16 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useRouter, useParams } from 'next/navigation';
 import Link from 'next/link';
-import type { Template, RunResult, ApiError } from '@/types';
+import type { Template, RunResult, RenderMode, RenderStatus, ApiError } from '@/types';
 import Header from '@/components/Header';
 import CodeEditor from '@/components/CodeEditor';
 import VideoPlayer from '@/components/VideoPlayer';
 import AssetBrowser from '@/components/AssetBrowser';
 import SourceAssets from '@/components/SourceAssets';
 import { apiClient } from '@/lib/api';
+import { EditSession, SessionUnavailable } from '@/lib/editSession';
 
 export default function TemplatePage() {
   const router = useRouter();
@@ -21,12 +22,18 @@ export default function TemplatePage() {
   const [formParams, setFormParams] = useState<Record<string, any>>({});
   const [result, setResult] = useState<RunResult | null>(null);
   const [error, setError] = useState<string | null>(null);
-  const [loading, setLoading] = useState(false);
+  const [loading, setLoading] = useState<RenderMode | null>(null);
+  const [renderStatus, setRenderStatus] = useState<RenderStatus | null>(null);
   const [isCustomCode, setIsCustomCode] = useState(false);
   const [fetchingTemplate, setFetchingTemplate] = useState(true);
+  const sessionRef = useRef<EditSession | null>(null);
 
   useEffect(() => {
     loadTemplate();
+    return () => {
+      sessionRef.current?.close();
+      sessionRef.current = null;
+    };
   }, [templateId]);
 
   const loadTemplate = async () => {
@@ -50,22 +57,51 @@ export default function TemplatePage() {
 
   const handleRun = async (e: React.FormEvent) => {
     e.preventDefault();
-    setLoading(true);
+    await runRender('final');
+  };
+
+  const runRender = async (mode: RenderMode) => {
+    setLoading(mode);
     setError(null);
     setResult(null);
+    setRenderStatus(null);
 
     try {
       if (!apiClient.getApiKey()) {
         throw new Error('Please enter your VideoDB API key in the header first');
       }
 
-      const isCustom = template ? code !== template.code : false;
+      const apiKey = apiClient.getApiKey()!;
+      let data: RunResult | null = null;
+
+      // Prefer the editing session; it keeps the connection and compiled code warm
+      if (typeof WebSocket !== 'undefined') {
+        if (!sessionRef.current || sessionRef.current.apiKey !== apiKey) {
+          sessionRef.current?.close();
+          sessionRef.current = new EditSession(apiKey, templateId);
+        }
+        try {
+          // "rendering" carries no estimate; keep the one from "queued"
+          data = await sessionRef.current.run(code, formParams, mode, (status) =>
+            setRenderStatus((previous) => ({ ...previous, ...status })));
+        } catch (err) {
+          if (!(err instanceof SessionUnavailable)) throw err;
+          sessionRef.current.close();
+          sessionRef.current = null;
+        }
+      }
 
-      let data: RunResult;
-      if (isCustom) {
-        data = await apiClient.runCustomCode(code, formParams);
-      } else {
-        data = await apiClient.runTemplate(templateId, formParams);
+      if (!data) {
+        const isCustom = template ? code !== template.code : false;
+        if (isCustom) {
+          data = await apiClient.runCustomCode(code, formParams, mode);
+        } else {
+          // Only informative: the run goes ahead if the estimate fails
+          apiClient.estimateRun(templateId, formParams, mode)
+            .then((estimate) => setRenderStatus({ state: 'queued', ...estimate }))
+            .catch(() => {});
+          data = await apiClient.runTemplate(templateId, formParams, mode);
+        }
       }
 
       setResult(data);
@@ -73,15 +109,26 @@ export default function TemplatePage() {
       const apiError = err as ApiError;
       setError(`${apiError.message}${apiError.details ? `\n\nDetails: ${apiError.details}` : ''}`);
     } finally {
-      setLoading(false);
+      setLoading(null);
+      setRenderStatus(null);
+    }
+  };
+
+  const describeStatus = (status: RenderStatus | null) => {
+    const seconds = status?.estimated_seconds ? ` (about ${Math.ceil(status.estimated_seconds)}s)` : '';
+    if (status?.state === 'queued' && status.estimated_wait) {
+      return `Queued, starting in about ${Math.ceil(status.estimated_wait)}s${seconds}...`;
     }
+    return `Generating video stream${seconds}...`;
   };
 
   const handleLoadAssets = async () => {
     if (!apiClient.getApiKey()) {
       throw new Error('Please enter your VideoDB API key first');
     }
-    return apiClient.listAssets();
+    // Revalidated by ETag; /api/assets surfaces the error if VideoDB couldn't be reached
+    const { assets } = await apiClient.bootstrap(['assets']);
+    return assets ?? apiClient.listAssets();
   };
 
   const handleApiKeyChange = (key: string) => {
@@ -236,10 +283,19 @@ export default function TemplatePage() {
               <div className="flex gap-3 pt-3">
                 <button
                   type="submit"
-                  disabled={loading}
+                  disabled={loading !== null}
                   className="px-6 py-2 bg-accent text-white rounded-lg hover:bg-orange-700 disabled:opacity-50 font-medium"
                 >
-                  {loading ? 'Running...' : isCustomCode ? 'Run Custom Code' : 'Run Template'}
+                  {loading === 'final' ? 'Running...' : isCustomCode ? 'Run Custom Code' : 'Run Template'}
+                </button>
+                <button
+                  type="button"
+                  onClick={() => runRender('draft')}
+                  disabled={loading !== null}
+                  title="Short, low-resolution render for checking placement"
+                  className="px-6 py-2 border border-gray-300 text-gray-700 rounded-lg hover:bg-gray-50 disabled:opacity-50 font-medium"
+                >
+                  {loading === 'draft' ? 'Drafting...' : 'Quick Draft'}
                 </button>
               </div>
             </form>
@@ -275,7 +331,7 @@ export default function TemplatePage() {
 
             {loading && (
               <div className="p-6 text-center bg-gray-50 rounded-lg border border-dashed border-gray-300">
-                <p className="text-gray-600">Generating video stream...</p>
+                <p className="text-gray-600">{describeStatus(renderStatus)}</p>
               </div>
             )}
 
@@ -285,6 +341,12 @@ export default function TemplatePage() {
               </div>
             )}
 
+            {result?.mode === 'draft' && result.draft && (
+              <p className="mb-2 text-xs text-gray-500">
+                Draft preview: first {result.draft.max_duration}s at {result.draft.max_height}p. Run the template for the full render.
+              </p>
+            )}
+
             {result && <VideoPlayer streamUrl={result.stream_url} />}
 
             {!loading && !error && !result && (
@@ -1,7 +1,8 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { apiClient } from '@/lib/api';
+import type { MemeAvailability } from '@/types';
 import VideoPlayer from './VideoPlayer';
 
 interface MemeSource {
@@ -19,47 +20,101 @@ interface MemeSource {
   } | null;
 }
 
+const PAGE_SIZE = 20;
+
 interface MemeWithStatus extends MemeSource {
   assetId?: string;
   assetName?: string;
   status: 'unknown' | 'available' | 'missing';
 }
 
-export default function MemeBank() {
+interface MemeBankProps {
+  // From /api/bootstrap: the full listing and, with an API key, availability
+  initialSources?: MemeSource[];
+  initialAvailability?: MemeAvailability;
+}
+
+// The unfiltered listing paged locally, in the order an empty search returns it
+function listingPage(sources: MemeSource[], cursor: string | null) {
+  const ordered = [...sources].sort((a, b) => a.name.toLowerCase().localeCompare(b.name.toLowerCase()));
+  const offset = cursor ? Number(cursor) : 0;
+  const category: Record<string, number> = {};
+  for (const source of sources) {
+    category[source.category || ''] = (category[source.category || ''] || 0) + 1;
+  }
+  return {
+    results: ordered.slice(offset, offset + PAGE_SIZE),
+    total: ordered.length,
+    facets: { category },
+    next_cursor: offset + PAGE_SIZE < ordered.length ? String(offset + PAGE_SIZE) : null,
+  };
+}
+
+export default function MemeBank({ initialSources, initialAvailability }: MemeBankProps) {
   const [memes, setMemes] = useState<MemeWithStatus[]>([]);
   const [loading, setLoading] = useState(false);
   const [syncing, setSyncing] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [copiedId, setCopiedId] = useState<string | null>(null);
   const [previewMeme, setPreviewMeme] = useState<MemeWithStatus | null>(null);
+  const [query, setQuery] = useState('');
+  const [category, setCategory] = useState<string | null>(null);
+  const [categoryCounts, setCategoryCounts] = useState<Record<string, number>>({});
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const availabilityRef = useRef<MemeAvailability | null>(initialAvailability ?? null);
 
-  // Load meme sources from backend on mount
+  const withStatus = (meme: MemeSource): MemeWithStatus => {
+    const availability = availabilityRef.current;
+    if (!availability) {
+      return { ...meme, status: 'unknown' };
+    }
+    return {
+      ...meme,
+      status: availability[meme.id]?.available ? 'available' : 'missing',
+      assetId: availability[meme.id]?.asset_id || undefined,
+      assetName: availability[meme.id]?.asset_name || undefined,
+    };
+  };
+
+  // Search the meme bank server-side, debounced while typing
   useEffect(() => {
-    loadMemeSources();
-  }, []);
+    const timer = setTimeout(() => loadMemeSources(), query ? 250 : 0);
+    return () => clearTimeout(timer);
+  }, [query, category]);
 
-  const loadMemeSources = async () => {
+  const loadMemeSources = async (cursor: string | null = null) => {
     try {
-      const sources = await apiClient.listMemeSources();
-      setMemes(sources.map(m => ({ ...m, status: 'unknown' as const })));
+      // The bootstrap listing covers the unfiltered view; searches go to the server
+      const page = initialSources && !query && !category
+        ? listingPage(initialSources, cursor)
+        : await apiClient.searchMemeSources({ q: query, category: category || undefined, limit: PAGE_SIZE, cursor });
+      const results = page.results.map(withStatus);
+      setMemes(prev => (cursor ? [...prev, ...results] : results));
+      setCategoryCounts(page.facets.category);
+      setTotal(page.total);
+      setNextCursor(page.next_cursor);
     } catch (err: any) {
       setError(err.message || 'Failed to load meme sources');
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    await loadMemeSources(nextCursor);
+    setLoadingMore(false);
+  };
+
   const checkMemeAvailability = async () => {
     setLoading(true);
     setError(null);
     try {
-      const availability = await apiClient.checkMemeAvailability();
+      availabilityRef.current = await apiClient.checkMemeAvailability();
 
       // Update meme statuses based on backend check
-      setMemes(prev => prev.map(meme => ({
-        ...meme,
-        status: availability[meme.id]?.available ? 'available' : 'missing',
-        assetId: availability[meme.id]?.asset_id || undefined,
-        assetName: availability[meme.id]?.asset_name || undefined,
-      })));
+      setMemes(prev => prev.map(withStatus));
     } catch (err: any) {
       setError(err.message || 'Failed to check meme availability');
     } finally {
@@ -133,6 +188,34 @@ export default function MemeBank() {
         </div>
       )}
 
+      {/* Search and category filters */}
+      <div className="mb-4 space-y-2">
+        <input
+          type="search"
+          value={query}
+          onChange={e => setQuery(e.target.value)}
+          placeholder="Search memes by name, tag or description..."
+          className="w-full px-3 py-2 border border-purple-200 rounded-lg text-sm focus:outline-none focus:ring-2 focus:ring-purple-400"
+        />
+        <div className="flex gap-1 flex-wrap">
+          <button
+            onClick={() => setCategory(null)}
+            className={`text-xs px-2 py-1 rounded ${category === null ? 'bg-purple-600 text-white' : 'bg-purple-100 text-purple-700'}`}
+          >
+            All
+          </button>
+          {Object.entries(categoryCounts).map(([name, count]) => (
+            <button
+              key={name}
+              onClick={() => setCategory(name)}
+              className={`text-xs px-2 py-1 rounded ${category === name ? 'bg-purple-600 text-white' : 'bg-purple-100 text-purple-700'}`}
+            >
+              {name} ({count})
+            </button>
+          ))}
+        </div>
+      </div>
+
       {/* Meme Grid */}
       <div className="grid grid-cols-1 md:grid-cols-2 gap-3 max-h-96 overflow-y-auto">
         {memes.map(meme => (
@@ -229,6 +312,18 @@ export default function MemeBank() {
         ))}
       </div>
 
+      {nextCursor && (
+        <div className="mt-3 text-center">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="px-4 py-1.5 text-sm text-purple-700 border border-purple-300 rounded-lg hover:bg-purple-100 disabled:opacity-50 transition-colors"
+          >
+            {loadingMore ? 'Loading...' : `Load more (${memes.length} of ${total})`}
+          </button>
+        </div>
+      )}
+
       {memes.length === 0 && (
         <div className="text-center py-8 text-gray-500">
           No memes found in the bank
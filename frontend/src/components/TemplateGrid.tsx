@@ -4,6 +4,7 @@ import { useRouter } from 'next/navigation';
 import { useEffect, useRef, useState } from 'react';
 import Hls from 'hls.js';
 import type { Template } from '@/types';
+import { resolveMediaUrl } from '@/lib/api';
 
 interface TemplateGridProps {
   templates: Template[];
@@ -77,11 +78,11 @@ function VideoPreview({
         }
       });
 
-      hls.loadSource(streamUrl);
+      hls.loadSource(resolveMediaUrl(streamUrl));
       hls.attachMedia(video);
     } else if (video.canPlayType('application/vnd.apple.mpegurl')) {
       console.log('VideoPreview: Using native HLS support');
-      video.src = streamUrl;
+      video.src = resolveMediaUrl(streamUrl);
       setLoading(false);
       video.play().catch((err) => {
         console.log('VideoPreview: Autoplay prevented:', err.message);
@@ -2,6 +2,7 @@
 
 import { useEffect, useRef } from 'react';
 import Hls from 'hls.js';
+import { resolveMediaUrl } from '@/lib/api';
 
 interface VideoPlayerProps {
   streamUrl: string;
@@ -41,7 +42,7 @@ export default function VideoPlayer({
       hlsRef.current = hls;
 
       // Attach media
-      hls.loadSource(streamUrl);
+      hls.loadSource(resolveMediaUrl(streamUrl));
       hls.attachMedia(video);
 
       // Handle events
@@ -75,7 +76,7 @@ export default function VideoPlayer({
       });
     } else if (video.canPlayType('application/vnd.apple.mpegurl')) {
       // For browsers that natively support HLS (Safari)
-      video.src = streamUrl;
+      video.src = resolveMediaUrl(streamUrl);
     } else {
       console.error('HLS is not supported in this browser');
     }
@@ -1,8 +1,19 @@
 import axios from 'axios';
-import type { Template, RunResult, AssetsResponse, ApiError } from '@/types';
+import type { Template, RunResult, RunEstimate, BulkUploadItem, BulkUploadResult, BootstrapData, BootstrapSection, BootstrapSectionName, RenderMode, AssetsResponse, ApiError } from '@/types';
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || '';
 
+// Proxied previews come back as paths on the backend
+export function resolveMediaUrl(url: string): string {
+  return url.startsWith('/') ? `${API_BASE_URL}${url}` : url;
+}
+
+// WebSocket endpoints live next to the HTTP API
+export function apiWebSocketUrl(path: string): string {
+  const base = API_BASE_URL || window.location.origin;
+  return `${base.replace(/^http/, 'ws')}${path}`;
+}
+
 const api = axios.create({
   baseURL: API_BASE_URL,
   headers: {
@@ -12,8 +23,14 @@ const api = axios.create({
 
 export class ApiClient {
   private apiKey: string | null = null;
+  // Last /api/bootstrap sections, revalidated by ETag
+  private bootstrapSections: Record<string, { etag: string; data: any }> = {};
 
   setApiKey(key: string) {
+    if (key !== this.apiKey) {
+      delete this.bootstrapSections.assets;
+      delete this.bootstrapSections.availability;
+    }
     this.apiKey = key;
   }
 
@@ -25,8 +42,36 @@ export class ApiClient {
     return this.apiKey ? { 'x-videodb-key': this.apiKey } : {};
   }
 
-  async listTemplates(): Promise<Template[]> {
-    const response = await api.get<{ templates: Template[] }>('/api/templates');
+  // Templates, meme sources and (with a key) assets and meme availability in one request.
+  // Ask only for the sections a page shows, so pages without VideoDB data don't wait on it.
+  async bootstrap(sections?: BootstrapSectionName[]): Promise<BootstrapData> {
+    const known = Object.values(this.bootstrapSections).map((section) => section.etag);
+    const response = await api.get<Record<string, BootstrapSection<any>>>('/api/bootstrap', {
+      params: sections ? { sections: sections.join(',') } : {},
+      headers: { ...this.getHeaders(), ...(known.length ? { 'If-None-Match': known.join(', ') } : {}) },
+    });
+
+    const data: Record<string, any> = {};
+    for (const [name, section] of Object.entries(response.data)) {
+      if (section.error) continue;
+      if (!section.not_modified) {
+        this.bootstrapSections[name] = { etag: section.etag!, data: section.data };
+      }
+      data[name] = this.bootstrapSections[name]?.data;
+    }
+    return {
+      templates: data.templates?.templates ?? [],
+      memeSources: data.meme_bank?.meme_sources ?? [],
+      assets: data.assets,
+      availability: data.availability?.availability,
+    };
+  }
+
+  async listTemplates(filters: { tag?: string[]; difficulty?: string; q?: string } = {}): Promise<Template[]> {
+    const response = await api.get<{ templates: Template[] }>('/api/templates', {
+      params: filters,
+      paramsSerializer: { indexes: null },
+    });
     return response.data.templates;
   }
 
@@ -35,11 +80,27 @@ export class ApiClient {
     return response.data;
   }
 
-  async runTemplate(templateId: string, params: Record<string, any>): Promise<RunResult> {
+  async runTemplate(templateId: string, params: Record<string, any>, mode: RenderMode = 'final'): Promise<RunResult> {
     try {
       const response = await api.post<RunResult>(
         `/api/run/${templateId}`,
-        { params },
+        { params, mode },
+        { headers: this.getHeaders() }
+      );
+      return response.data;
+    } catch (error: any) {
+      if (error.response?.data?.error) {
+        throw error.response.data.error as ApiError;
+      }
+      throw new Error(error.message || 'Unknown error occurred');
+    }
+  }
+
+  async estimateRun(templateId: string, params: Record<string, any>, mode: RenderMode = 'final'): Promise<RunEstimate> {
+    try {
+      const response = await api.post<RunEstimate>(
+        `/api/run/${templateId}/estimate`,
+        { params, mode },
         { headers: this.getHeaders() }
       );
       return response.data;
@@ -51,11 +112,11 @@ export class ApiClient {
     }
   }
 
-  async runCustomCode(code: string, params: Record<string, any>): Promise<RunResult> {
+  async runCustomCode(code: string, params: Record<string, any>, mode: RenderMode = 'final'): Promise<RunResult> {
     try {
       const response = await api.post<RunResult>(
         '/api/run-custom',
-        { code, params },
+        { code, params, mode },
         { headers: this.getHeaders() }
       );
       return response.data;
@@ -97,6 +158,43 @@ export class ApiClient {
     }
   }
 
+  // Streams one result per item to onResult as uploads finish
+  async bulkUploadFromUrl(
+    items: BulkUploadItem[],
+    onResult: (result: BulkUploadResult) => void
+  ): Promise<{ total: number; succeeded: number; failed: number }> {
+    const response = await fetch(`${API_BASE_URL}/api/upload-from-url/bulk`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', ...this.getHeaders() },
+      body: JSON.stringify({ items }),
+    });
+    if (!response.ok || !response.body) {
+      const body = await response.json().catch(() => null);
+      throw (body?.error as ApiError) || new Error(`Bulk upload failed (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    let summary = { total: items.length, succeeded: 0, failed: 0 };
+    for (;;) {
+      const { done, value } = await reader.read();
+      buffered += decoder.decode(value, { stream: !done });
+      const lines = buffered.split('\n');
+      buffered = done ? '' : lines.pop() || '';
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const message = JSON.parse(line);
+        if (message.summary) {
+          summary = message.summary;
+        } else {
+          onResult(message as BulkUploadResult);
+        }
+      }
+      if (done) return summary;
+    }
+  }
+
   async listMemeSources(): Promise<any[]> {
     try {
       const response = await api.get<{ meme_sources: any[] }>('/api/meme-bank');
@@ -109,6 +207,30 @@ export class ApiClient {
     }
   }
 
+  async searchMemeSources(params: { q?: string; category?: string; limit?: number; cursor?: string | null } = {}): Promise<{
+    results: any[];
+    total: number;
+    facets: { category: Record<string, number> };
+    next_cursor: string | null;
+  }> {
+    try {
+      const response = await api.get('/api/meme-bank/search', {
+        params: {
+          q: params.q || undefined,
+          category: params.category || undefined,
+          limit: params.limit,
+          cursor: params.cursor || undefined,
+        },
+      });
+      return response.data;
+    } catch (error: any) {
+      if (error.response?.data?.error) {
+        throw error.response.data.error as ApiError;
+      }
+      throw new Error(error.message || 'Failed to search meme sources');
+    }
+  }
+
   async checkMemeAvailability(): Promise<Record<string, { available: boolean; asset_id: string | null; asset_name: string | null }>> {
     try {
       const response = await api.get<{ availability: Record<string, any> }>(
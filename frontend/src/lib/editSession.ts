@@ -0,0 +1,116 @@
+import type { RunResult, RenderMode, RenderStatus, ApiError } from '@/types';
+import { apiWebSocketUrl } from './api';
+
+// Thrown when the session itself is unusable, so callers can fall back to HTTP
+export class SessionUnavailable extends Error {}
+
+type Pending = {
+  resolve: (result: RunResult) => void;
+  reject: (error: unknown) => void;
+  onStatus?: (status: RenderStatus) => void;
+};
+
+// Smallest single edit turning `before` into `after`
+function diff(before: string, after: string) {
+  let start = 0;
+  while (start < before.length && start < after.length && before[start] === after[start]) start++;
+  let end = 0;
+  while (
+    end < before.length - start &&
+    end < after.length - start &&
+    before[before.length - 1 - end] === after[after.length - 1 - end]
+  ) end++;
+  return { start, end: before.length - end, text: after.slice(start, after.length - end) };
+}
+
+/**
+ * Editing session over /api/sessions. The backend keeps the connection,
+ * compiled code and params warm, so each run only sends what changed.
+ */
+export class EditSession {
+  private ws: WebSocket | null = null;
+  private ready: Promise<void> | null = null;
+  private code = '';
+  private params: Record<string, any> = {};
+  private version = 0;
+  private pending: Pending | null = null;
+
+  constructor(readonly apiKey: string, private templateId: string) {}
+
+  private open(code: string, params: Record<string, any>): Promise<void> {
+    return new Promise((resolve, reject) => {
+      const ws = new WebSocket(apiWebSocketUrl('/api/sessions'));
+      this.ws = ws;
+      ws.onopen = () => {
+        ws.send(JSON.stringify({ type: 'init', api_key: this.apiKey, template_id: this.templateId, code, params }));
+      };
+      ws.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'ready') {
+          this.code = code;
+          this.params = params;
+          this.version = message.version;
+          resolve();
+        } else if (message.type === 'status') {
+          this.pending?.onStatus?.(message as RenderStatus);
+        } else if (message.type === 'result') {
+          this.pending?.resolve(message as RunResult);
+          this.pending = null;
+        } else if (message.type === 'error') {
+          const error = message.error as ApiError & { run_id?: number };
+          if (!this.pending) {
+            reject(new SessionUnavailable(error.message));
+          } else if (error.code === 'version_mismatch') {
+            this.pending.reject(new SessionUnavailable(error.message));
+            this.pending = null;
+          } else if (error.run_id !== undefined || error.code === 'invalid_message') {
+            this.pending.reject(error);
+            this.pending = null;
+          }
+        }
+      };
+      ws.onerror = () => reject(new SessionUnavailable('Could not open editing session'));
+      ws.onclose = () => {
+        this.ws = null;
+        this.ready = null;
+        this.pending?.reject(new SessionUnavailable('Editing session closed'));
+        this.pending = null;
+      };
+    });
+  }
+
+  async run(
+    code: string,
+    params: Record<string, any>,
+    mode: RenderMode,
+    onStatus?: (status: RenderStatus) => void,
+  ): Promise<RunResult> {
+    if (!this.ready) {
+      this.ready = this.open(code, params);
+    }
+    await this.ready;
+    if (this.pending) {
+      throw new SessionUnavailable('A render is already running');
+    }
+
+    const ws = this.ws!;
+    const result = new Promise<RunResult>((resolve, reject) => {
+      this.pending = { resolve, reject, onStatus };
+    });
+    if (code !== this.code) {
+      ws.send(JSON.stringify({ type: 'patch', version: this.version, edits: [diff(this.code, code)] }));
+      this.code = code;
+      this.version += 1;
+    }
+    if (JSON.stringify(params) !== JSON.stringify(this.params)) {
+      ws.send(JSON.stringify({ type: 'params', params, replace: true }));
+      this.params = params;
+    }
+    ws.send(JSON.stringify({ type: 'run', mode }));
+    return result;
+  }
+
+  close() {
+    this.ws?.close();
+  }
+}
@@ -26,10 +26,46 @@ export interface ParamSchema {
   options?: string[];
 }
 
+export type RenderMode = 'final' | 'draft';
+
 export interface RunResult {
   stream_url: string;
   player_url: string;
   metadata: Record<string, any>;
+  mode?: RenderMode;
+  draft?: { max_duration: number; max_height: number };
+}
+
+export interface RunEstimate {
+  estimated_seconds: number;
+  estimated_wait: number;
+  queued: number;
+  active: number;
+}
+
+// Progress of a render, from the editing session's status messages or an estimate
+export interface RenderStatus {
+  state: 'queued' | 'rendering';
+  estimated_wait?: number;
+  estimated_seconds?: number;
+}
+
+export interface BulkUploadItem {
+  url: string;
+  name: string;
+  media_type?: 'video' | 'image' | 'audio';
+  force?: boolean;
+}
+
+export interface BulkUploadResult {
+  index: number;
+  url: string;
+  name: string;
+  media_type: string;
+  status: 'ok' | 'error';
+  asset_id?: string;
+  deduplicated?: boolean;
+  error?: ApiError;
 }
 
 export interface ApiError {
@@ -49,3 +85,22 @@ export interface AssetsResponse {
   images: Asset[];
   audio: Asset[];
 }
+
+export type MemeAvailability = Record<string, { available: boolean; asset_id: string | null; asset_name: string | null }>;
+
+export interface BootstrapSection<T> {
+  etag?: string;
+  data?: T;
+  not_modified?: boolean;
+  error?: ApiError;
+}
+
+export type BootstrapSectionName = 'templates' | 'meme_bank' | 'assets' | 'availability';
+
+export interface BootstrapData {
+  templates: Template[];
+  memeSources: any[];
+  // Only with an API key; undefined if VideoDB couldn't be reached
+  assets?: AssetsResponse;
+  availability?: MemeAvailability;
+}